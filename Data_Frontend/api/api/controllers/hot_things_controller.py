@@ -1,15 +1,37 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from flask import jsonify, request
+from flask import jsonify, request, send_file
 import threading
 
 from api.services.hot_things_service import clearAllTablesService, deleteHotThingService, getHotThingsService, getLvByIdService, getEmotionsByIdService, \
     searchByKeywordService, getMapDataByIdService, getWordCloudByIdService, getPlatformMetricsByIdService, \
     getTrendDataByIdService, getTypicalPostsByIdService, getHeatDataByIdService, getTypicalRadarDataByIdService, \
-    getPopulationCompositonByIdService, getPopulationDataByPopIdService, addHotThingService
+    getPopulationCompositonByIdService, getPopulationDataByPopIdService, addHotThingService, addHotThingsService, getEventDetailByIdService, \
+    EVENT_DETAIL_FIELDS, LIST_SORT_KEYS, listHotThingsService, decode_list_cursor, getWordCloudFileService
+from api.services.map_service import getNationalMapDataService
+from api.services.search_service import searchHotThingsService
+from config import Config
 from api.utils.obtain_external_services import callAlgorithm
 
 
+# GET 读接口的查询参数中需转为整数的参数，以及可重复给出的列表参数（如 fields=lv&fields=heat）
+_INT_QUERY_PARAMS = ("id", "limit", "page", "page_size")
+_LIST_QUERY_PARAMS = ("fields",)
+
+
+def _request_data():
+    """读接口参数：POST 取 JSON 请求体，GET 取查询参数（与 JSON 请求体同名，如 ?id=1）"""
+    if request.method != "GET":
+        return request.get_json(silent=True) or {}
+    data = {}
+    for key, values in request.args.lists():
+        value = values if key in _LIST_QUERY_PARAMS else values[-1]
+        if key in _INT_QUERY_PARAMS and isinstance(value, str) and value.isdigit():
+            value = int(value)
+        data[key] = value
+    return data
+
+
 def addHotThingByCrawler():
     """
     添加爬虫数据到数据库
@@ -32,85 +54,190 @@ def getHotThings():
     return jsonify({"data": result, "message": "success"})
 
 
+def _parse_list_date(value, end=False):
+    """解析 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS；只给日期作为截止时间时包含当天"""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+        if end and fmt == "%Y-%m-%d":
+            parsed += timedelta(days=1)
+        return parsed
+    raise ValueError(f"Invalid date: {value}, should be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+
+
+def listHotThings():
+    """
+    事件分页列表：sort 为 date 或 heat（均倒序），cursor 为上一页返回的 next_cursor，
+    可按 warning_lv、source、date_from、date_to 过滤
+    """
+    data = _request_data()
+    sort = data.get("sort", "date")
+    if sort not in LIST_SORT_KEYS:
+        return jsonify({"message": f"sort should be one of: {', '.join(LIST_SORT_KEYS)}"}), 400
+    try:
+        limit = int(data.get("limit", 20))
+        cursor_token = data.get("cursor")
+        if cursor_token:
+            decode_list_cursor(cursor_token, sort)
+        date_from = _parse_list_date(data["date_from"]) if data.get("date_from") else None
+        date_to = _parse_list_date(data["date_to"], end=True) if data.get("date_to") else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    result = listHotThingsService(sort, cursor_token, limit, data.get("warning_lv"), data.get("source"),
+                                  date_from, date_to)
+    if not result["items"]:
+        return jsonify({"data": result, "message": "no data"})
+    return jsonify({"data": result, "message": "success"})
+
+
 def getLvById():
-    result = getLvByIdService(request.get_json().get("id"))
+    result = getLvByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getEmotionsById():
-    result = getEmotionsByIdService(request.get_json().get("id"))
+    result = getEmotionsByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def searchByKeyword():
-    result = searchByKeywordService(request.get_json().get("keyword"))
+    result = searchByKeywordService(_request_data().get("keyword"))
     if not result:
         return jsonify({"message": "no data", "code": 0})
     return jsonify({"data": result, "message": "success"})
 
 
+def searchHotThings():
+    """
+    关键词检索：按标题与典型帖子标题的相关度结合热度排序，page 从 1 开始，page_size 最大 50
+    """
+    data = _request_data()
+    keyword = data.get("keyword")
+    if not keyword or not isinstance(keyword, str):
+        return jsonify({"message": "keyword should be a non-empty string"}), 400
+    try:
+        page = int(data.get("page", 1))
+        page_size = int(data.get("page_size", 10))
+    except (TypeError, ValueError):
+        return jsonify({"message": "page and page_size should be integers"}), 400
+    result = searchHotThingsService(keyword, page, page_size)
+    if not result["items"]:
+        return jsonify({"data": result, "message": "no data", "code": 0})
+    return jsonify({"data": result, "message": "success"})
+
+
 def getMapDataById():
-    result = getMapDataByIdService(request.get_json().get("id"))
+    result = getMapDataByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
+def getNationalMapData():
+    """
+    全国热点地图：各省份在时间窗口内的加权热度（value）、事件数与热度和，
+    date_from / date_to 为 YYYY-MM-DD（均包含当天），缺省为最近 30 天
+    """
+    data = _request_data()
+    try:
+        date_from = _parse_list_date(data["date_from"]).date() if data.get("date_from") else None
+        date_to = _parse_list_date(data["date_to"]).date() if data.get("date_to") else None
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if date_from and date_to and date_from > date_to:
+        return jsonify({"message": "date_from should not be later than date_to"}), 400
+    result = getNationalMapDataService(date_from, date_to)
+    if not result["provinces"]:
+        return jsonify({"data": result, "message": "no data"})
+    return jsonify({"data": result, "message": "success"})
+
+
 def getWordCloudById():
-    result = getWordCloudByIdService(request.get_json().get("id"))
+    result = getWordCloudByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
+def getWordCloudImage(id):
+    """
+    词云图片（GET，可直接用作 <img src>）：带 ETag / Last-Modified，命中 If-None-Match 时返回 304。
+    清空数据表后事件 id 会被重新使用，响应为 no-cache，浏览器每次使用前都凭 ETag 重新验证
+    """
+    path = getWordCloudFileService(id)
+    if path is None:
+        return jsonify({"message": "no data"}), 404
+    return send_file(path, conditional=True, etag=True, max_age=0)
+
+
 def getPlatformMetricsById():
-    result = getPlatformMetricsByIdService(request.get_json().get("id"))
+    result = getPlatformMetricsByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getTrendDataById():
-    result = getTrendDataByIdService(request.get_json().get("id"))
+    result = getTrendDataByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getTypicalPostsById():
-    result = getTypicalPostsByIdService(request.get_json().get("id"))
+    result = getTypicalPostsByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getHeatDataById():
-    result = getHeatDataByIdService(request.get_json().get("id"))
+    result = getHeatDataByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getTypicalRadarDataById():
-    result = getTypicalRadarDataByIdService(request.get_json().get("id"))
+    result = getTypicalRadarDataByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getPopulationCompositonById():
-    result = getPopulationCompositonByIdService(request.get_json().get("id"))
+    result = getPopulationCompositonByIdService(_request_data().get("id"))
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
 
 
 def getPopulationDataByPopId():
-    result = getPopulationDataByPopIdService(request.get_json().get("id"))
+    result = getPopulationDataByPopIdService(_request_data().get("id"))
+    if not result:
+        return jsonify({"message": "no data"})
+    return jsonify({"data": result, "message": "success"})
+
+
+def getEventDetailById():
+    """
+    事件详情聚合接口：一次返回各组件数据，fields 可选（如 ["lv", "heat"]），缺省时返回全部
+    """
+    data = _request_data()
+    fields = data.get("fields")
+    if fields is not None:
+        if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+            return jsonify({"message": "fields should be a list of strings"}), 400
+        unknown = [f for f in fields if f not in EVENT_DETAIL_FIELDS]
+        if unknown:
+            return jsonify({"message": f"Unknown fields: {', '.join(unknown)}"}), 400
+    result = getEventDetailByIdService(data.get("id"), fields)
     if not result:
         return jsonify({"message": "no data"})
     return jsonify({"data": result, "message": "success"})
@@ -283,11 +410,10 @@ def validate_map(data):
     return True, ""
 
 
-def addHotThing():
-    data = request.get_json()
-
-    if not data:
-        return jsonify({"message": "No data provided"}), 400
+def validate_event(data):
+    """校验单个事件的全部数据，返回 (是否合法, 错误信息)"""
+    if not isinstance(data, dict):
+        return False, "event should be an object"
 
     # Validate each section
     validators = [
@@ -302,20 +428,64 @@ def addHotThing():
 
     for field, validator in validators:
         if field not in data:
-            return jsonify({"message": f"Missing required section: {field}"}), 400
+            return False, f"Missing required section: {field}"
 
         is_valid, error_msg = validator(data[field])
         if not is_valid:
-            return jsonify({"message": error_msg}), 400
+            return False, error_msg
 
     if 'word_cloud' in data and not isinstance(data['word_cloud'], str):
-        return jsonify({"message": "word_cloud should be a string"}), 400
+        return False, "word_cloud should be a string"
+
+    return True, ""
+
+
+def addHotThing():
+    """添加事件：请求体可以是单个事件，也可以是事件列表（在一个事务内批量写入）"""
+    data = request.get_json()
+
+    if not data:
+        return jsonify({"message": "No data provided"}), 400
+
+    if isinstance(data, list):
+        return _add_events(data)
+
+    is_valid, error_msg = validate_event(data)
+    if not is_valid:
+        return jsonify({"message": error_msg}), 400
 
     result = addHotThingService(data)
-    if not result:
+    if not result or not result.get("success"):
         return jsonify({"message": "insert fail"}), 400
     return jsonify({"message": "insert success"}), 201
 
+def _add_events(events):
+    """校验全部事件后在一个事务内写入；任一事件不合法时整批不写入，并返回每个不合法事件的错误"""
+    errors = []
+    for index, event in enumerate(events):
+        is_valid, error_msg = validate_event(event)
+        if not is_valid:
+            errors.append({"index": index, "message": error_msg})
+    if errors:
+        return jsonify({"message": f"{len(errors)} invalid events", "errors": errors}), 400
+
+    result = addHotThingsService(events)
+    if not result or not result.get("success"):
+        return jsonify({"message": "insert fail", "error": (result or {}).get("error")}), 400
+    return jsonify({"message": "insert success", "thing_ids": result["thing_ids"]}), 201
+
+
+def addHotThings():
+    """
+    批量添加事件：请求体为事件列表，或 {"events": [...]}
+    """
+    data = request.get_json()
+    events = data.get("events") if isinstance(data, dict) else data
+    if not events or not isinstance(events, list):
+        return jsonify({"message": "events should be a non-empty list"}), 400
+    return _add_events(events)
+
+
 def delHotThingById():
     result = deleteHotThingService(request.get_json().get("id"))
     if not result:
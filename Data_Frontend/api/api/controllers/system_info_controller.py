@@ -1,8 +1,18 @@
 from flask import jsonify
 
+from api.database import get_pool
 from api.services.system_info_service import getSysInfoService
+from api.utils.cache import cache_stats
 def getSysInfo():
     result = getSysInfoService()
     if not result:
         return jsonify({"message": "no data"})
-    return jsonify({"data": result,"message": "success"})
\ No newline at end of file
+    return jsonify({"data": result,"message": "success"})
+
+
+def getDbPoolStats():
+    return jsonify({"data": get_pool().stats(), "message": "success"})
+
+
+def getCacheStats():
+    return jsonify({"data": cache_stats(), "message": "success"})
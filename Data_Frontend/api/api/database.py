@@ -3,32 +3,172 @@ import pymysql
 from contextlib import contextmanager
 from config import config
 import logging
+import os
+import threading
+import time
 
 # 获取logger实例
 logger = logging.getLogger(__name__)
 
+
+class PoolTimeout(Exception):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """
+    线程安全的MySQL连接池：连接按需创建，最多 size 个；借出前对空闲较久的连接做 ping 检查，
+    超过最长存活时间或检查失败的连接直接关闭并重建。
+    """
+
+    def __init__(self, current_config):
+        self.connect_kwargs = dict(
+            host=current_config.MYSQL_HOST,
+            user=current_config.MYSQL_USER,
+            password=current_config.MYSQL_PASSWORD,
+            database=current_config.MYSQL_DB,
+            autocommit=False
+        )
+        self.size = max(1, current_config.MYSQL_POOL_SIZE)
+        self.timeout = current_config.MYSQL_POOL_TIMEOUT
+        self.max_lifetime = current_config.MYSQL_POOL_MAX_LIFETIME
+        self.ping_idle = current_config.MYSQL_POOL_PING_IDLE
+        self._cond = threading.Condition()
+        # 空闲连接栈：[(conn, 创建时间, 最近归还时间)]，后进先出以便复用最热的连接
+        self._idle = []
+        self._in_use = 0
+        # 统计信息
+        self.checkouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _connect(self):
+        conn = pymysql.connect(**self.connect_kwargs)
+        with self._cond:
+            self.created += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        with self._cond:
+            self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _alive(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if now - returned_at < self.ping_idle:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """借出一个连接，返回 (conn, 创建时间)；池满时最多等待 timeout 秒"""
+        started = time.monotonic()
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"等待数据库连接超时（{self.timeout}s，连接池大小 {self.size}）")
+                self._cond.wait(remaining)
+            item = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            waited = time.monotonic() - started
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+        try:
+            if item is not None:
+                conn, created_at, returned_at = item
+                if self._alive(conn, created_at, returned_at):
+                    return conn, created_at
+                self._discard(conn)
+            return self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def release(self, conn, created_at, broken=False):
+        """归还连接；出错的连接不再复用（可能残留会话状态或已断开）"""
+        if broken:
+            self._discard(conn)
+            self._release_slot()
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._in_use -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "discarded": self.discarded,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """按进程惰性创建连接池（gunicorn 等 fork 出的子进程不能共用父进程的连接）"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # 生产环境将如下参数由development改为production
+                _pool = ConnectionPool(config['development']())
+                _pool_pid = os.getpid()
+    return _pool
+
+
 @contextmanager
 def db_connection():
-    # 生产环境将如下参数由development改为production
-    current_config = config['development']()
-    """自动根据当前环境选择配置的上下文管理器"""
-    conn = pymysql.connect(
-        host=current_config.MYSQL_HOST,
-        user=current_config.MYSQL_USER,
-        password=current_config.MYSQL_PASSWORD,
-        database=current_config.MYSQL_DB,
-        autocommit=False
-    )
+    """从连接池借出连接的上下文管理器，正常退出时提交，出错时回滚并丢弃该连接"""
+    pool = get_pool()
+    conn, created_at = pool.acquire()
+    broken = False
+    cursor = None
     try:
         cursor = conn.cursor()
         yield cursor
         conn.commit()
     except Exception as e:
-        conn.rollback()
+        broken = True
+        try:
+            conn.rollback()
+        except Exception:
+            pass
         print(f"数据库操作出错: {str(e)}")
         # 将错误信息写入日志
         logger.error(f"数据库操作出错: {str(e)}", exc_info=True)
         raise e
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        if cursor is not None:
+            cursor.close()
+        pool.release(conn, created_at, broken=broken)
@@ -1,28 +1,39 @@
 from flask import Blueprint
 
-from api.controllers.hot_things_controller import getHotThings, getLvById, getEmotionsById, searchByKeyword, \
-    getMapDataById, getWordCloudById, getPlatformMetricsById, getTrendDataById, getTypicalPostsById, getHeatDataById, \
-    getTypicalRadarDataById, getPopulationCompositonById, getPopulationDataByPopId, addHotThing, addHotThingByCrawler, delHotThingById, clearAllTables
-from api.controllers.system_info_controller import getSysInfo
+from api.controllers.hot_things_controller import getHotThings, listHotThings, getLvById, getEmotionsById, searchByKeyword, searchHotThings, \
+    getMapDataById, getNationalMapData, getWordCloudById, getWordCloudImage, getPlatformMetricsById, getTrendDataById, getTypicalPostsById, getHeatDataById, \
+    getTypicalRadarDataById, getPopulationCompositonById, getPopulationDataByPopId, addHotThing, addHotThings, addHotThingByCrawler, delHotThingById, clearAllTables, \
+    getEventDetailById
+from api.controllers.system_info_controller import getSysInfo, getDbPoolStats, getCacheStats
 
 # 创建主API蓝图
 api_bp = Blueprint('api', __name__)
 
-api_bp.route('/getHotThings', methods=['POST'])(getHotThings)
-api_bp.route('/getSysInfo', methods=['POST'])(getSysInfo)
-api_bp.route('/getLvById', methods=['POST'])(getLvById)
-api_bp.route('/getEmotionsById', methods=['POST'])(getEmotionsById)
-api_bp.route('/searchByKeyword', methods=['POST'])(searchByKeyword)
-api_bp.route('/getMapDataById', methods=['POST'])(getMapDataById)
-api_bp.route('/getWordCloudById', methods=['POST'])(getWordCloudById)
-api_bp.route('/getPlatformMetricsById', methods=['POST'])(getPlatformMetricsById)
-api_bp.route('/getTrendDataById', methods=['POST'])(getTrendDataById)
-api_bp.route('/getTypicalPostsById', methods=['POST'])(getTypicalPostsById)
-api_bp.route('/getHeatDataById', methods=['POST'])(getHeatDataById)
-api_bp.route('/getTypicalRadarDataById', methods=['POST'])(getTypicalRadarDataById)
-api_bp.route('/getPopulationCompositonById', methods=['POST'])(getPopulationCompositonById)
-api_bp.route('/getPopulationDataByPopId', methods=['POST'])(getPopulationDataByPopId)
+# 读接口同时支持 GET（参数放在查询字符串中）：浏览器与代理会对 GET 响应自动带上 If-None-Match 协商，POST 则需要客户端自行处理
+
+api_bp.route('/getHotThings', methods=['GET', 'POST'])(getHotThings)
+api_bp.route('/listHotThings', methods=['GET', 'POST'])(listHotThings)
+api_bp.route('/getSysInfo', methods=['GET', 'POST'])(getSysInfo)
+api_bp.route('/getDbPoolStats', methods=['POST'])(getDbPoolStats)
+api_bp.route('/getCacheStats', methods=['POST'])(getCacheStats)
+api_bp.route('/getLvById', methods=['GET', 'POST'])(getLvById)
+api_bp.route('/getEmotionsById', methods=['GET', 'POST'])(getEmotionsById)
+api_bp.route('/searchByKeyword', methods=['GET', 'POST'])(searchByKeyword)
+api_bp.route('/searchHotThings', methods=['GET', 'POST'])(searchHotThings)
+api_bp.route('/getMapDataById', methods=['GET', 'POST'])(getMapDataById)
+api_bp.route('/getNationalMapData', methods=['GET', 'POST'])(getNationalMapData)
+api_bp.route('/getWordCloudById', methods=['GET', 'POST'])(getWordCloudById)
+api_bp.route('/wordCloud/<int:id>', methods=['GET'])(getWordCloudImage)
+api_bp.route('/getPlatformMetricsById', methods=['GET', 'POST'])(getPlatformMetricsById)
+api_bp.route('/getTrendDataById', methods=['GET', 'POST'])(getTrendDataById)
+api_bp.route('/getTypicalPostsById', methods=['GET', 'POST'])(getTypicalPostsById)
+api_bp.route('/getHeatDataById', methods=['GET', 'POST'])(getHeatDataById)
+api_bp.route('/getTypicalRadarDataById', methods=['GET', 'POST'])(getTypicalRadarDataById)
+api_bp.route('/getPopulationCompositonById', methods=['GET', 'POST'])(getPopulationCompositonById)
+api_bp.route('/getPopulationDataByPopId', methods=['GET', 'POST'])(getPopulationDataByPopId)
+api_bp.route('/getEventDetailById', methods=['GET', 'POST'])(getEventDetailById)
 api_bp.route('/addHotThing', methods=['POST'])(addHotThing)
+api_bp.route('/addHotThings', methods=['POST'])(addHotThings)
 api_bp.route('/addHotThingByCrawler', methods=['POST'])(addHotThingByCrawler)
 api_bp.route('/delHotThingById', methods=['POST'])(delHotThingById)
 api_bp.route('/clearAllTables', methods=['POST'])(clearAllTables)
\ No newline at end of file
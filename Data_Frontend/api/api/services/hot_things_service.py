@@ -1,8 +1,17 @@
 from api.database import db_connection
+from api.services.map_service import apply_province_aggregates, province_aggregates_available
+from api.services.search_service import searchHotThingsService
+from api.utils.cache import cached, invalidate_cache
+from api.utils.word_cloud_store import clear_word_clouds, delete_word_cloud, save_word_cloud, word_cloud_path
+from datetime import datetime
+from decimal import Decimal
 import base64
+import json
+import logging
 
 
 # 获取热点事件
+@cached
 def getHotThingsService():
     with db_connection() as cursor:
         cursor.execute("SELECT id, title, url, source, date, heat from hot_things order by id desc limit 4 ")
@@ -23,390 +32,665 @@ def getHotThingsService():
     return result
 
 
+# 分页列表的排序方式：排序列及游标中该列取值的还原方式
+LIST_SORT_KEYS = {
+    "date": ("date", lambda v: datetime.strptime(v, "%Y-%m-%d %H:%M:%S")),
+    "heat": ("heat", Decimal),
+}
+MAX_LIST_LIMIT = 100
+
+logger = logging.getLogger(__name__)
+
+
+def encode_list_cursor(sort_value, id):
+    """把本页最后一条记录的 (排序值, id) 编码为不透明游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.strftime("%Y-%m-%d %H:%M:%S")
+    raw = json.dumps([str(sort_value), id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_list_cursor(cursor_token, sort):
+    """还原游标，格式不正确时抛出 ValueError"""
+    try:
+        sort_value, id = json.loads(base64.urlsafe_b64decode(cursor_token.encode("ascii")))
+        return LIST_SORT_KEYS[sort][1](sort_value), int(id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+@cached
+def listHotThingsService(sort="date", cursor_token=None, limit=20, warning_lv=None, source=None,
+                         date_from=None, date_to=None):
+    """
+    按 (排序列, id) 倒序做键集分页：下一页条件为 (col < v) OR (col = v AND id < last_id)，
+    配合 migrations/002_hot_things_list_indexes.sql 中的联合索引，翻到多深都只扫描 limit 行。
+    返回 {"items", "next_cursor"}，next_cursor 为 None 表示没有更多数据。
+    """
+    column = LIST_SORT_KEYS[sort][0]
+    limit = max(1, min(int(limit), MAX_LIST_LIMIT))
+    conditions, params = [], []
+    if warning_lv is not None:
+        conditions.append("warning_lv = %s")
+        params.append(warning_lv)
+    if source is not None:
+        conditions.append("source = %s")
+        params.append(source)
+    if date_from is not None:
+        conditions.append("date >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("date < %s")
+        params.append(date_to)
+    if cursor_token:
+        last_value, last_id = decode_list_cursor(cursor_token, sort)
+        conditions.append(f"({column} < %s OR ({column} = %s AND id < %s))")
+        params.extend([last_value, last_value, last_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with db_connection() as cursor:
+        cursor.execute(
+            f"SELECT id, title, url, source, date, heat, warning_lv, {column} FROM hot_things {where} "
+            f"ORDER BY {column} DESC, id DESC LIMIT %s",
+            tuple(params) + (limit + 1,))
+        data = cursor.fetchall()
+    items = []
+    for row in data[:limit]:
+        items.append({
+            "id": row[0],
+            "title": row[1],
+            "url": row[2],
+            "source": row[3],
+            "datatime": row[4].strftime("%Y-%m-%d %H:%M:%S"),
+            "heat": float(row[5]),  # 确保heat是浮点数
+            "warning_lv": row[6]
+        })
+    next_cursor = None
+    if len(data) > limit:
+        last = data[limit - 1]
+        next_cursor = encode_list_cursor(last[7], last[0])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _format_lv(data):
+    if not data or not data[0]:
+        return None
+    return {
+        "warning_lv": data[0]
+    }
+
+
+@cached
 def getLvByIdService(id):
     with db_connection() as cursor:
         cursor.execute("SELECT warning_lv from hot_things where id = %s", (id,))
-        data = cursor.fetchone()
-        result = None
-        if not data[0]:
-            return result
-        result = {
-            "warning_lv": data[0]
-        }
+        result = _format_lv(cursor.fetchone())
     return result
 
 
+def _format_emotions(data):
+    """data 为 users_emotion 的 (things_id, positive, negative, like, ..., surprise)"""
+    if not data or not data[0]:
+        return None
+    return {
+        "emotionData":
+            {
+                "positive": data[1],
+                "negative": data[2],
+            }
+        ,
+        "multiEmotionData":
+            {
+                "like": data[3],
+                "happiness": data[4],
+                "sadness": data[5],
+                "anger": data[6],
+                "disgust": data[7],
+                "fear": data[8],
+                "surprise": data[9]
+            }
+
+    }
+
+
+@cached
 def getEmotionsByIdService(id):
     with db_connection() as cursor:
         cursor.execute("SELECT * from users_emotion where things_id = %s", (id,))
-        data = cursor.fetchone()
-        result = None
-        if not data[0]:
-            return result
-        result = {
-            "emotionData":
-                {
-                    "positive": data[1],
-                    "negative": data[2],
-                }
-            ,
-            "multiEmotionData":
-                {
-                    "like": data[3],
-                    "happiness": data[4],
-                    "sadness": data[5],
-                    "anger": data[6],
-                    "disgust": data[7],
-                    "fear": data[8],
-                    "surprise": data[9]
-                }
-
-        }
+        result = _format_emotions(cursor.fetchone())
     return result
 
 
 def searchByKeywordService(keyword):
-    with db_connection() as cursor:
-        cursor.execute("SELECT id,title,source,date,heat FROM hot_things WHERE title LIKE %s order by id desc limit 5",
-                       (f"%{keyword}%",))
-        data = cursor.fetchall()
-        result = []
-        if not data:
-            return result
-        for row in data:
-            item = {
-                "id": row[0],
-                "title": row[1],
-                "source": row[2],
-                "datatime": row[3].strftime("%Y-%m-%d %H:%M:%S"),
-                "heat": float(row[4])  # 确保heat是浮点数
-            }
-            result.append(item)
+    """搜索框联想：取检索结果第一页的前 5 条，字段与原接口一致"""
+    result = []
+    for item in searchHotThingsService(keyword, 1, 5)["items"]:
+        result.append({
+            "id": item["id"],
+            "title": item["title"],
+            "source": item["source"],
+            "datatime": item["datatime"],
+            "heat": item["heat"]
+        })
+    return result
+
+
+def _fetch_map_data(cursor, id):
+    cursor.execute(
+        "SELECT p.name AS province_name, tp.color FROM provinces p JOIN thing_provinces tp ON p.pid = tp.province_pid WHERE tp.thing_id = %s",
+        (id,))
+    data = cursor.fetchall()
+    result = []
+    if not data:
+        return result
+    for row in data:
+        item = {
+            "name": row[0],
+            "itemStyle": {"areaColor": row[1]}
+        }
+        result.append(item)
     return result
 
 
+@cached
 def getMapDataByIdService(id):
     with db_connection() as cursor:
-        cursor.execute(
-            "SELECT p.name AS province_name, tp.color FROM provinces p JOIN thing_provinces tp ON p.pid = tp.province_pid WHERE tp.thing_id = %s",
-            (id,))
-        data = cursor.fetchall()
-        result = []
-        if not data:
-            return result
-        for row in data:
-            item = {
-                "name": row[0],
-                "itemStyle": {"areaColor": row[1]}
-            }
-            result.append(item)
+        result = _fetch_map_data(cursor, id)
     return result
 
 
+def _fetch_word_cloud(cursor, id):
+    cursor.execute("SELECT img from word_cloud where thing_id = %s", (id,))
+    data = cursor.fetchone()
+
+    if not data or not data[0]:
+        return None
+    # Encode the binary data as base64 string
+    return {
+        "img": data[0].decode('utf-8')
+    }
+
+
+@cached
 def getWordCloudByIdService(id):
+    with db_connection() as cursor:
+        result = _fetch_word_cloud(cursor, id)
+    return result
+
+
+def getWordCloudFileService(id):
+    """
+    词云图片文件路径：入库时已写入文件；早于该功能入库的事件首次访问时从数据库解码后补写文件。
+    没有词云时返回 None。
+    """
+    path = word_cloud_path(id)
+    if path is not None:
+        return path
     with db_connection() as cursor:
         cursor.execute("SELECT img from word_cloud where thing_id = %s", (id,))
         data = cursor.fetchone()
+    if not data or not data[0]:
+        return None
+    return save_word_cloud(id, data[0])
 
-        if not data or not data[0]:
-            return None
-        # Encode the binary data as base64 string
-        result = {
-            "img": data[0].decode('utf-8')
-        }
-    return result
+
+def _format_platform_metrics(data):
+    if not data or not data[0]:
+        return None
+    return {
+        "total_posts": data[0],
+        "total_users": data[1],
+        "total_interactions": data[2],
+        "posts_with_location": data[3]
+    }
 
 
+@cached
 def getPlatformMetricsByIdService(id):
     with db_connection() as cursor:
         cursor.execute(
             "SELECT total_posts, ​​total_users, total_interactions,posts_with_location from hot_things where id = %s",
             (id,))
-        data = cursor.fetchone()
-        result = None
-        if not data[0]:
-            return result
-        result = {
-            "total_posts": data[0],
-            "total_users": data[1],
-            "total_interactions": data[2],
-            "posts_with_location": data[3]
-        }
+        result = _format_platform_metrics(cursor.fetchone())
     return result
 
 
+def _fetch_trend_data(cursor, id):
+    cursor.execute("SELECT sort,value from trend where thing_id = %s order by sort", (id,))
+    data = cursor.fetchall()
+    if not data:
+        return None
+    data_dict = {sort: value for sort, value in data}
+    result = []
+    for i in range(7):
+        result.append(data_dict.get(i, 0))
+    return result
+
+
+@cached
 def getTrendDataByIdService(id):
     with db_connection() as cursor:
-        cursor.execute("SELECT sort,value from trend where thing_id = %s order by sort", (id,))
-        data = cursor.fetchall()
-        result = None
-        if not data:
-            return result
-        data_dict = {sort: value for sort, value in data}
-        result = []
-        for i in range(7):
-            result.append(data_dict.get(i, 0))
+        result = _fetch_trend_data(cursor, id)
+    return result
+
+
+def _fetch_typical_posts(cursor, id):
+    cursor.execute(
+        "SELECT id, title, url, source, datetime, heat from typical_posts where thing_id = %s order by id desc limit 10 ",
+        (id,))
+    data = cursor.fetchall()
+    result = []
+    if data is None:
+        return result
+    for row in data:
+        item = {
+            "id": row[0],
+            "title": row[1],
+            "url": row[2],
+            "source": row[3],
+            "datatime": row[4].strftime("%Y-%m-%d %H:%M:%S"),
+            "heat": float(row[5])  # 确保heat是浮点数
+        }
+        result.append(item)
     return result
 
 
+@cached
 def getTypicalPostsByIdService(id):
     with db_connection() as cursor:
-        cursor.execute(
-            "SELECT id, title, url, source, datetime, heat from typical_posts where thing_id = %s order by id desc limit 10 ",
-            (id,))
-        data = cursor.fetchall()
-        result = []
-        if data is None:
-            return result
-        for row in data:
-            item = {
-                "id": row[0],
-                "title": row[1],
-                "url": row[2],
-                "source": row[3],
-                "datatime": row[4].strftime("%Y-%m-%d %H:%M:%S"),
-                "heat": float(row[5])  # 确保heat是浮点数
-            }
-            result.append(item)
+        result = _fetch_typical_posts(cursor, id)
     return result
 
 
+def _format_heat(data):
+    if not data:
+        return None
+    return {
+        "forward_count": data[0],
+        "comment_count": data[1],
+        "like_count": data[2],
+        "composite_hot_score": data[3],
+        "base_hot_value": data[4],
+        "media_hot_value": data[5],
+        "interaction_hot_value": data[6]
+    }
+
+
+@cached
 def getHeatDataByIdService(id):
     with db_connection() as cursor:
         cursor.execute(
             "SELECT forward_count,comment_count, like_count,composite_hot_score,base_hot_value, media_hot_value,interaction_hot_value  from heat where thing_id = %s",
             (id,))
-        data = cursor.fetchone()
-        result = None
-        if not data:
-            return result
-        result = {
-            "forward_count": data[0],
-            "comment_count": data[1],
-            "like_count": data[2],
-            "composite_hot_score": data[3],
-            "base_hot_value": data[4],
-            "media_hot_value": data[5],
-            "interaction_hot_value": data[6]
-        }
+        result = _format_heat(cursor.fetchone())
     return result
 
 
+def _fetch_typical_radar_data(cursor, id):
+    cursor.execute(
+        "SELECT p.title , r.autonomy,r.stimulus,r.fraternity,r.friendliness,r.compliance,r.tradition,r.security,r.authority,r.achievement,r.hedonism,p.id FROM typical_posts p JOIN typical_radar r ON p.id = r.typical_id WHERE p.thing_id = %s order by p.id desc limit 3",
+        (id,))
+    data = cursor.fetchall()
+    result = {
+        "titles": [],
+        "values": []
+    }
+    if not data:
+        return result
+
+    for row in data:
+        result["titles"].append(row[0])
+        result["values"].append([
+            row[1],  # autonomy
+            row[2],  # stimulus
+            row[3],  # fraternity
+            row[4],  # friendliness
+            row[5],  # compliance
+            row[6],  # tradition
+            row[7],  # security
+            row[8],  # authority
+            row[9],  # achievement
+            row[10]  # hedonism
+        ])
+    return result
+
+
+@cached
 def getTypicalRadarDataByIdService(id):
     with db_connection() as cursor:
-        cursor.execute(
-            "SELECT p.title , r.autonomy,r.stimulus,r.fraternity,r.friendliness,r.compliance,r.tradition,r.security,r.authority,r.achievement,r.hedonism,p.id FROM typical_posts p JOIN typical_radar r ON p.id = r.typical_id WHERE p.thing_id = %s order by p.id desc limit 3",
-            (id,))
-        data = cursor.fetchall()
-        result = {
-            "titles": [],
-            "values": []
-        }
-        if not data:
-            return result
+        result = _fetch_typical_radar_data(cursor, id)
+    return result
 
-        for row in data:
-            result["titles"].append(row[0])
-            result["values"].append([
-                row[1],  # autonomy
-                row[2],  # stimulus
-                row[3],  # fraternity
-                row[4],  # friendliness
-                row[5],  # compliance
-                row[6],  # tradition
-                row[7],  # security
-                row[8],  # authority
-                row[9],  # achievement
-                row[10]  # hedonism
-            ])
+
+def _fetch_population_composition(cursor, id):
+    cursor.execute(
+        "SELECT id,name,value  from population_composition where thing_id = %s",
+        (id,))
+    data = cursor.fetchall()
+    result = []
+    if not data:
+        return None
+    for row in data:
+        item = {
+            "id": row[0],
+            "name": row[1],
+            "value": row[2]
+        }
+        result.append(item)
     return result
 
 
+@cached
 def getPopulationCompositonByIdService(id):
     with db_connection() as cursor:
-        cursor.execute(
-            "SELECT id,name,value  from population_composition where thing_id = %s",
-            (id,))
-        data = cursor.fetchall()
-        result = []
-        if not data:
-            return None
-        for row in data:
-            item = {
-                "id": row[0],
-                "name": row[1],
-                "value": row[2]
-            }
-            result.append(item)
+        result = _fetch_population_composition(cursor, id)
     return result
 
 
+def _fetch_population_data(cursor, pop_ids):
+    """一次查询多个人群的取值，返回 {population_id: [{"name", "value"}, ...]}"""
+    result = {}
+    if not pop_ids:
+        return result
+    placeholders = ", ".join(["%s"] * len(pop_ids))
+    cursor.execute(
+        f"SELECT population_id,label,value  from population_values where population_id IN ({placeholders})",
+        tuple(pop_ids))
+    for row in cursor.fetchall():
+        result.setdefault(row[0], []).append({
+            "name": row[1],
+            "value": row[2]
+        })
+    return result
+
+
+@cached
 def getPopulationDataByPopIdService(id):
+    with db_connection() as cursor:
+        data = _fetch_population_data(cursor, [id])
+        result = next(iter(data.values()), None)
+    return result
+
+
+# 事件详情可选的组成部分，与各 get*ById 接口返回的 data 一致
+EVENT_DETAIL_FIELDS = (
+    "lv", "emotions", "map", "word_cloud", "platform_metrics", "trend",
+    "typical_posts", "heat", "typical_radar", "population_composition"
+)
+
+
+@cached
+def getEventDetailByIdService(id, fields=None):
+    """
+    在同一个数据库连接上一次取回事件详情页所需的全部数据。
+    hot_things、users_emotion、heat 三张一对一的表合并为一条 LEFT JOIN 查询；
+    人群构成连同各人群取值一起返回（population_data，按人群 id 分组），前端无需再逐个调用 getPopulationDataByPopId。
+    fields 为需要的组成部分列表（默认全部），可用于跳过词云等较大的数据。
+    """
+    fields = set(fields or EVENT_DETAIL_FIELDS)
     with db_connection() as cursor:
         cursor.execute(
-            "SELECT label,value  from population_values where population_id = %s",
+            """
+            SELECT h.warning_lv, h.total_posts, h.​​total_users, h.total_interactions, h.posts_with_location,
+                   e.things_id, e.positive, e.negative, e.`like`, e.happiness, e.sadness, e.anger, e.disgust,
+                   e.fear, e.surprise,
+                   t.forward_count, t.comment_count, t.like_count, t.composite_hot_score, t.base_hot_value,
+                   t.media_hot_value, t.interaction_hot_value
+            FROM hot_things h
+            LEFT JOIN users_emotion e ON e.things_id = h.id
+            LEFT JOIN heat t ON t.thing_id = h.id
+            WHERE h.id = %s
+            """,
             (id,))
-        data = cursor.fetchall()
-        result = []
-        if not data:
+        row = cursor.fetchone()
+        if row is None:
             return None
-        for row in data:
-            item = {
-                "name": row[0],
-                "value": row[1]
-            }
-            result.append(item)
+
+        result = {}
+        if "lv" in fields:
+            result["lv"] = _format_lv(row[0:1])
+        if "platform_metrics" in fields:
+            result["platform_metrics"] = _format_platform_metrics(row[1:5])
+        if "emotions" in fields:
+            result["emotions"] = _format_emotions(row[5:15])
+        if "heat" in fields:
+            result["heat"] = _format_heat(row[15:22] if row[15] is not None else None)
+        if "map" in fields:
+            result["map"] = _fetch_map_data(cursor, id)
+        if "word_cloud" in fields:
+            result["word_cloud"] = _fetch_word_cloud(cursor, id)
+        if "trend" in fields:
+            result["trend"] = _fetch_trend_data(cursor, id)
+        if "typical_posts" in fields:
+            result["typical_posts"] = _fetch_typical_posts(cursor, id)
+        if "typical_radar" in fields:
+            result["typical_radar"] = _fetch_typical_radar_data(cursor, id)
+        if "population_composition" in fields:
+            composition = _fetch_population_composition(cursor, id)
+            result["population_composition"] = composition
+            result["population_data"] = _fetch_population_data(
+                cursor, [item["id"] for item in composition or []])
     return result
 
 
-def addHotThingService(data):
-    try:
-        with db_connection() as cursor:
-            # 开始事务
-            cursor.execute("START TRANSACTION")
+def _select_child_ids(cursor, table, parent_column, parent_ids):
+    """
+    取回刚插入的子表行 id，按父 id 分组并保持插入顺序。
+    父记录都是本事务内新建的，其下的子表行即为本次插入的全部行。
+    """
+    placeholders = ", ".join(["%s"] * len(parent_ids))
+    cursor.execute(
+        f"SELECT {parent_column}, id FROM {table} WHERE {parent_column} IN ({placeholders}) ORDER BY id",
+        tuple(parent_ids))
+    grouped = {}
+    for parent_id, child_id in cursor.fetchall():
+        grouped.setdefault(parent_id, []).append(child_id)
+    return grouped
 
-            # 1. 插入hot_things表
-            cursor.execute(
-                """
-                INSERT INTO hot_things (title, url, source, date, heat, warning_lv, total_posts, ​​total_users,
-                                        total_interactions, posts_with_location)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    data["hot_thing"]["title"],
-                    data["hot_thing"]["url"],
-                    data["hot_thing"]["source"],
-                    data["hot_thing"]["date"],
-                    data["hot_thing"]["heat"],
-                    data["hot_thing"]["warning_lv"],
-                    data["hot_thing"]["total_posts"],
-                    data["hot_thing"]["total_users"],
-                    data["hot_thing"]["total_interactions"],
-                    data["hot_thing"]["posts_with_location"]
-                )
+
+def _insert_hot_things(cursor, events):
+    """
+    批量写入多个事件：主表逐个插入取得 id，各子表按表合并为一次 executemany（多行 VALUES）。
+    典型帖子与人群构成的 id 插入后一次查询取回，再批量写入雷达图与人群取值。
+    """
+    # 1. 插入hot_things表
+    thing_ids = []
+    for data in events:
+        cursor.execute(
+            """
+            INSERT INTO hot_things (title, url, source, date, heat, warning_lv, total_posts, ​​total_users,
+                                    total_interactions, posts_with_location)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                data["hot_thing"]["title"],
+                data["hot_thing"]["url"],
+                data["hot_thing"]["source"],
+                data["hot_thing"]["date"],
+                data["hot_thing"]["heat"],
+                data["hot_thing"]["warning_lv"],
+                data["hot_thing"]["total_posts"],
+                data["hot_thing"]["total_users"],
+                data["hot_thing"]["total_interactions"],
+                data["hot_thing"]["posts_with_location"]
             )
-            thing_id = cursor.lastrowid
-
-            # 2. 插入users_emotion表
-            cursor.execute(
-                """
-                INSERT INTO users_emotion (things_id, positive, negative, `like`, happiness, sadness, anger, disgust,
-                                           fear, surprise)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    thing_id,
-                    data["user_emotion"]["positive"],
-                    data["user_emotion"]["negative"],
-                    data["user_emotion"]["like"],
-                    data["user_emotion"]["happiness"],
-                    data["user_emotion"]["sadness"],
-                    data["user_emotion"]["anger"],
-                    data["user_emotion"]["disgust"],
-                    data["user_emotion"]["fear"],
-                    data["user_emotion"]["surprise"]
-                )
+        )
+        thing_ids.append(cursor.lastrowid)
+    pairs = list(zip(thing_ids, events))
+
+    # 2. 插入users_emotion表
+    cursor.executemany(
+        """
+        INSERT INTO users_emotion (things_id, positive, negative, `like`, happiness, sadness, anger, disgust,
+                                   fear, surprise)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        [
+            (
+                thing_id,
+                data["user_emotion"]["positive"],
+                data["user_emotion"]["negative"],
+                data["user_emotion"]["like"],
+                data["user_emotion"]["happiness"],
+                data["user_emotion"]["sadness"],
+                data["user_emotion"]["anger"],
+                data["user_emotion"]["disgust"],
+                data["user_emotion"]["fear"],
+                data["user_emotion"]["surprise"]
             )
-
-            # 3. 插入heat表
-            cursor.execute(
-                """
-                INSERT INTO heat (thing_id, forward_count, comment_count, like_count, composite_hot_score,
-                                  base_hot_value, media_hot_value, interaction_hot_value)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    thing_id,
-                    data["heat"]["forward_count"],
-                    data["heat"]["comment_count"],
-                    data["heat"]["like_count"],
-                    data["heat"]["composite_hot_score"],
-                    data["heat"]["base_hot_value"],
-                    data["heat"]["media_hot_value"],
-                    data["heat"]["interaction_hot_value"]
-                )
+            for thing_id, data in pairs
+        ]
+    )
+
+    # 3. 插入heat表
+    cursor.executemany(
+        """
+        INSERT INTO heat (thing_id, forward_count, comment_count, like_count, composite_hot_score,
+                          base_hot_value, media_hot_value, interaction_hot_value)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        [
+            (
+                thing_id,
+                data["heat"]["forward_count"],
+                data["heat"]["comment_count"],
+                data["heat"]["like_count"],
+                data["heat"]["composite_hot_score"],
+                data["heat"]["base_hot_value"],
+                data["heat"]["media_hot_value"],
+                data["heat"]["interaction_hot_value"]
+            )
+            for thing_id, data in pairs
+        ]
+    )
+
+    # 4. 插入trend表
+    trend_rows = [
+        (thing_id, sort + 1, value)
+        for thing_id, data in pairs
+        for sort, value in enumerate(data["trend"])
+    ]
+    if trend_rows:
+        cursor.executemany("INSERT INTO trend (thing_id, sort, value) VALUES (%s, %s, %s)", trend_rows)
+
+    # 5. 插入typical_posts表，再按帖子顺序写入typical_radar表
+    post_rows = [
+        (thing_id, post["title"], post["url"], post["source"], post["datetime"], post["heat"])
+        for thing_id, data in pairs
+        for post in data["typical_posts"]
+    ]
+    if post_rows:
+        cursor.executemany(
+            """
+            INSERT INTO typical_posts (thing_id, title, url, source, datetime, heat)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            post_rows
+        )
+        post_ids = _select_child_ids(cursor, "typical_posts", "thing_id", thing_ids)
+        radar_rows = []
+        for thing_id, data in pairs:
+            for post_id, post in zip(post_ids.get(thing_id, []), data["typical_posts"]):
+                radar_rows.append((
+                    post_id,
+                    post["autonomy"],
+                    post["stimulus"],
+                    post["fraternity"],
+                    post["friendliness"],
+                    post["compliance"],
+                    post["tradition"],
+                    post["security"],
+                    post["authority"],
+                    post["achievement"],
+                    post["hedonism"]
+                ))
+        cursor.executemany(
+            """
+            INSERT INTO typical_radar (typical_id, autonomy, stimulus, fraternity, friendliness, compliance,
+                                       tradition, security, authority, achievement, hedonism)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            radar_rows
+        )
+
+    # 6. 插入population_composition表，再写入population_values表
+    comp_rows = [
+        (thing_id, comp["name"], comp["value"])
+        for thing_id, data in pairs
+        for comp in data["population_composition"]
+    ]
+    if comp_rows:
+        cursor.executemany(
+            "INSERT INTO population_composition (thing_id, name, value) VALUES (%s, %s, %s)",
+            comp_rows
+        )
+        pop_ids = _select_child_ids(cursor, "population_composition", "thing_id", thing_ids)
+        value_rows = [
+            (pop_id, value["label"], value["value"])
+            for thing_id, data in pairs
+            for pop_id, comp in zip(pop_ids.get(thing_id, []), data["population_composition"])
+            for value in comp["population_values"]
+        ]
+        if value_rows:
+            cursor.executemany(
+                "INSERT INTO population_values (population_id, label, value) VALUES (%s, %s, %s)",
+                value_rows
             )
 
-            # 4. 插入trend表
-            for sort, value in enumerate(data["trend"]):
-                cursor.execute(
-                    "INSERT INTO trend (thing_id, sort, value) VALUES (%s, %s, %s)",
-                    (thing_id, sort + 1, value)
-                )
-
-            # 5. 插入typical_posts表
-            for post in data["typical_posts"]:
-                cursor.execute(
-                    """
-                    INSERT INTO typical_posts (thing_id, title, url, source, datetime, heat)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        thing_id,
-                        post["title"],
-                        post["url"],
-                        post["source"],
-                        post["datetime"],
-                        post["heat"]
-                    )
-                )
-                post_id = cursor.lastrowid
-
-                # 插入typical_radar表
-                cursor.execute(
-                    """
-                    INSERT INTO typical_radar (typical_id, autonomy, stimulus, fraternity, friendliness, compliance,
-                                               tradition, security, authority, achievement, hedonism)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        post_id,
-                        post["autonomy"],
-                        post["stimulus"],
-                        post["fraternity"],
-                        post["friendliness"],
-                        post["compliance"],
-                        post["tradition"],
-                        post["security"],
-                        post["authority"],
-                        post["achievement"],
-                        post["hedonism"]
-                    )
-                )
-
-            # 6. 插入population_composition表
-            for comp in data["population_composition"]:
-                cursor.execute(
-                    "INSERT INTO population_composition (thing_id, name, value) VALUES (%s, %s, %s)",
-                    (thing_id, comp["name"], comp["value"])
-                )
-                pop_id = cursor.lastrowid
-
-                # 插入population_values表
-                for value in comp["population_values"]:
-                    cursor.execute(
-                        "INSERT INTO population_values (population_id, label, value) VALUES (%s, %s, %s)",
-                        (pop_id, value["label"], value["value"])
-                    )
-
-            # 7. 插入thing_provinces表
-            for province in data["map"]:
-                cursor.execute(
-                    "INSERT INTO thing_provinces (thing_id, province_pid, color) VALUES (%s, %s, %s)",
-                    (thing_id, province["province_pid"], province["color"])
-                )
-
-            # 8. 插入word_cloud表
-            if "word_cloud" in data and data["word_cloud"]:
-                cursor.execute(
-                    "INSERT INTO word_cloud (thing_id, img) VALUES (%s, %s)",
-                    (thing_id, data["word_cloud"])
-                )
-
+    # 7. 插入thing_provinces表，并累加到省份热度汇总表
+    if province_aggregates_available(cursor):
+        # 已执行 003 迁移：同时保存省份占比，供全国地图按占比加权
+        province_rows = [
+            (thing_id, province["province_pid"], province["color"], province.get("ratio"))
+            for thing_id, data in pairs
+            for province in data["map"]
+        ]
+        province_sql = "INSERT INTO thing_provinces (thing_id, province_pid, color, ratio) VALUES (%s, %s, %s, %s)"
+    else:
+        province_rows = [
+            (thing_id, province["province_pid"], province["color"])
+            for thing_id, data in pairs
+            for province in data["map"]
+        ]
+        province_sql = "INSERT INTO thing_provinces (thing_id, province_pid, color) VALUES (%s, %s, %s)"
+    if province_rows:
+        cursor.executemany(province_sql, province_rows)
+        apply_province_aggregates(cursor, thing_ids, 1)
+
+    # 8. 插入word_cloud表
+    cloud_rows = [
+        (thing_id, data["word_cloud"])
+        for thing_id, data in pairs
+        if "word_cloud" in data and data["word_cloud"]
+    ]
+    if cloud_rows:
+        cursor.executemany("INSERT INTO word_cloud (thing_id, img) VALUES (%s, %s)", cloud_rows)
+
+    return thing_ids
+
+
+def addHotThingsService(events):
+    """在一个事务内批量写入多个事件，返回各事件的 thing_id（与输入顺序一致）"""
+    if not events:
+        return {"success": True, "thing_ids": []}
+    try:
+        with db_connection() as cursor:
+            # 开始事务
+            cursor.execute("START TRANSACTION")
+            thing_ids = _insert_hot_things(cursor, events)
             # 提交事务
             cursor.execute("COMMIT")
+            invalidate_cache()
 
-            return {"success": True, "thing_id": thing_id}
+        # 词云另存为图片文件，供 /api/wordCloud/<id> 直接返回；写文件失败不影响入库结果
+        for thing_id, data in zip(thing_ids, events):
+            if data.get("word_cloud"):
+                try:
+                    save_word_cloud(thing_id, data["word_cloud"])
+                except OSError as e:
+                    logger.error(f"保存事件 {thing_id} 的词云图片失败: {str(e)}")
+
+        return {"success": True, "thing_ids": thing_ids}
 
     except Exception as e:
         # 发生错误时返回错误信息
@@ -414,6 +698,13 @@ def addHotThingService(data):
         return {"success": False, "error": str(e)}
 
 
+def addHotThingService(data):
+    result = addHotThingsService([data])
+    if not result["success"]:
+        return result
+    return {"success": True, "thing_id": result["thing_ids"][0]}
+
+
 def deleteHotThingService(id):
     try:
         with db_connection() as cursor:
@@ -421,6 +712,8 @@ def deleteHotThingService(id):
             
             # 按依赖顺序删除从表记录：从叶子表开始，避免外键冲突
             cursor.execute("DELETE FROM word_cloud WHERE thing_id = %s", (id,))
+            # 先从省份热度汇总表中扣减该事件，再删除省份明细
+            apply_province_aggregates(cursor, [id], -1)
             cursor.execute("DELETE FROM thing_provinces WHERE thing_id = %s", (id,))
             # 使用子查询删除population_values，因为它依赖population_composition
             cursor.execute("DELETE FROM population_values WHERE population_id IN (SELECT id FROM population_composition WHERE thing_id = %s)", (id,))
@@ -434,6 +727,8 @@ def deleteHotThingService(id):
             cursor.execute("DELETE FROM hot_things WHERE id = %s", (id,))
             
             cursor.execute("COMMIT")  # 提交事务
+            invalidate_cache()
+            delete_word_cloud(id)
             return {"success": True, "message": "热点事件删除成功"}
     except Exception as e:
         # 错误时回滚事务（db_connection上下文管理器可能自动处理，但显式回滚更安全）
@@ -487,6 +782,8 @@ def clearAllTablesService():
             
             # 提交事务
             cursor.execute("COMMIT")
+            invalidate_cache()
+            clear_word_clouds()
             
             return {
                 "success": True, 
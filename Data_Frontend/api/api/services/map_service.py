@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+from api.database import db_connection
+from api.utils.cache import cached
+
+# 省份权重：有占比（thing_provinces.ratio）时用占比；只有颜色的行（迁移前或未重启的后台写入）
+# 按算法服务 get_color_by_ratio 的分档取占比区间中点，与 migrations/003 的回填规则一致
+PROVINCE_WEIGHT_SQL = (
+    "COALESCE(tp.ratio, CASE tp.color WHEN '#BBDEFB' THEN 0.025 WHEN '#64B5F6' THEN 0.075 "
+    "WHEN '#2196F3' THEN 0.125 WHEN '#1976D2' THEN 0.175 WHEN '#0D47A1' THEN 0.2 ELSE 0 END)"
+)
+DEFAULT_WINDOW_DAYS = 30
+
+# 是否已执行 migrations/003_province_heat_daily.sql（按进程缓存，执行迁移后需重启后台）
+_aggregates_available = None
+
+
+def province_aggregates_available(cursor):
+    global _aggregates_available
+    if _aggregates_available is None:
+        cursor.execute(
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'province_heat_daily'")
+        _aggregates_available = cursor.fetchone()[0] > 0
+    return _aggregates_available
+
+
+def apply_province_aggregates(cursor, thing_ids, sign=1):
+    """
+    把事件的省份分布累加（sign=1，入库后调用）或扣减（sign=-1，删除 thing_provinces 前调用）到
+    province_heat_daily（按省份 + 事件日期汇总的事件数、热度和、按占比加权的热度），与写入在同一事务内。
+    """
+    if not thing_ids or not province_aggregates_available(cursor):
+        return
+    placeholders = ", ".join(["%s"] * len(thing_ids))
+    cursor.execute(
+        f"""
+        INSERT INTO province_heat_daily (province_pid, day, event_count, heat_sum, weighted_heat)
+        SELECT * FROM (
+            SELECT tp.province_pid, DATE(h.date) AS day, %s * COUNT(*) AS event_count,
+                   %s * SUM(h.heat) AS heat_sum, %s * SUM(h.heat * {PROVINCE_WEIGHT_SQL}) AS weighted_heat
+            FROM thing_provinces tp JOIN hot_things h ON h.id = tp.thing_id
+            WHERE tp.thing_id IN ({placeholders}) AND {PROVINCE_WEIGHT_SQL} > 0
+            GROUP BY tp.province_pid, DATE(h.date)
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            event_count = province_heat_daily.event_count + delta.event_count,
+            heat_sum = province_heat_daily.heat_sum + delta.heat_sum,
+            weighted_heat = province_heat_daily.weighted_heat + delta.weighted_heat
+        """,
+        (sign, sign, sign) + tuple(thing_ids))
+    if sign < 0:
+        cursor.execute("DELETE FROM province_heat_daily WHERE event_count <= 0")
+
+
+def getNationalMapDataService(date_from=None, date_to=None):
+    """
+    全国各省份在 [date_from, date_to] 内的事件数、热度和与加权热度（默认最近 30 天）。
+    缺省窗口在进入查询缓存前按当天日期确定，跨过零点后不会继续返回前一天的窗口。
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    return _national_map_data(date_from, date_to)
+
+
+@cached
+def _national_map_data(date_from, date_to):
+    """已建汇总表时只读取 省份数 × 天数 行；未建时回退为在明细表上实时 GROUP BY"""
+    with db_connection() as cursor:
+        if province_aggregates_available(cursor):
+            cursor.execute(
+                """
+                SELECT p.name, SUM(a.event_count), SUM(a.heat_sum), SUM(a.weighted_heat)
+                FROM province_heat_daily a JOIN provinces p ON p.pid = a.province_pid
+                WHERE a.day BETWEEN %s AND %s
+                GROUP BY p.pid, p.name
+                """,
+                (date_from, date_to))
+        else:
+            cursor.execute(
+                f"""
+                SELECT p.name, COUNT(*), SUM(h.heat), SUM(h.heat * {PROVINCE_WEIGHT_SQL})
+                FROM thing_provinces tp
+                JOIN hot_things h ON h.id = tp.thing_id
+                JOIN provinces p ON p.pid = tp.province_pid
+                WHERE h.date >= %s AND h.date < %s AND {PROVINCE_WEIGHT_SQL} > 0
+                GROUP BY p.pid, p.name
+                """,
+                (date_from, date_to + timedelta(days=1)))
+        data = cursor.fetchall()
+    provinces = []
+    for row in data:
+        provinces.append({
+            "name": row[0],
+            "value": round(float(row[3] or 0), 4),
+            "event_count": int(row[1] or 0),
+            "heat": round(float(row[2] or 0), 4)
+        })
+    provinces.sort(key=lambda item: item["value"], reverse=True)
+    return {
+        "date_from": date_from.strftime("%Y-%m-%d"),
+        "date_to": date_to.strftime("%Y-%m-%d"),
+        "provinces": provinces
+    }
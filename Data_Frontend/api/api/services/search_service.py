@@ -0,0 +1,134 @@
+import logging
+import math
+
+import pymysql
+
+from api.database import db_connection
+from api.utils.cache import cached
+
+logger = logging.getLogger(__name__)
+
+# 与 MySQL 的 ngram_token_size 一致；短于该长度的关键词无法走全文索引，改用 LIKE
+NGRAM_TOKEN_SIZE = 2
+# 排序分 = 标题相关度 + POST_WEIGHT * 典型帖子相关度 + HEAT_WEIGHT * ln(1 + 热度)
+POST_WEIGHT = 0.5
+HEAT_WEIGHT = 0.1
+# 每路全文检索最多取回的候选数，保证高频词的检索耗时不随表增长
+MAX_CANDIDATES = 1000
+MAX_PAGE_SIZE = 50
+
+# MySQL 报 1191（找不到匹配的 FULLTEXT 索引）后不再尝试全文检索，见 migrations/001_fulltext_search.sql
+_fulltext_available = True
+
+
+def _format_item(row, score, matched_posts):
+    return {
+        "id": row[0],
+        "title": row[1],
+        "source": row[2],
+        "datatime": row[3].strftime("%Y-%m-%d %H:%M:%S"),
+        "heat": float(row[4]),  # 确保heat是浮点数
+        "score": round(score, 4),
+        "matched_posts": matched_posts
+    }
+
+
+def _fulltext_search(cursor, keyword, page, page_size):
+    """全文检索：事件标题与典型帖子标题各取相关度最高的候选，按事件合并后结合热度排序"""
+    cursor.execute(
+        """
+        SELECT thing_id, SUM(score) AS score FROM (
+            (SELECT id AS thing_id, MATCH(title) AGAINST (%s) AS score
+             FROM hot_things WHERE MATCH(title) AGAINST (%s)
+             ORDER BY score DESC LIMIT %s)
+            UNION ALL
+            (SELECT thing_id, %s * MATCH(title) AGAINST (%s) AS score
+             FROM typical_posts WHERE MATCH(title) AGAINST (%s)
+             ORDER BY score DESC LIMIT %s)
+        ) m
+        GROUP BY thing_id
+        """,
+        (keyword, keyword, MAX_CANDIDATES, POST_WEIGHT, keyword, keyword, MAX_CANDIDATES))
+    relevance = {thing_id: float(score) for thing_id, score in cursor.fetchall()}
+    if not relevance:
+        return 0, []
+
+    placeholders = ", ".join(["%s"] * len(relevance))
+    cursor.execute(
+        f"SELECT id, title, source, date, heat FROM hot_things WHERE id IN ({placeholders})",
+        tuple(relevance))
+    rows = cursor.fetchall()
+    ranked = sorted(
+        ((relevance[row[0]] + HEAT_WEIGHT * math.log1p(max(float(row[4] or 0), 0.0)), row) for row in rows),
+        key=lambda item: (item[0], item[1][0]),
+        reverse=True)
+    page_rows = ranked[(page - 1) * page_size: page * page_size]
+    if not page_rows:
+        return len(ranked), []
+
+    # 本页事件中命中关键词的典型帖子标题
+    page_ids = [row[0] for _, row in page_rows]
+    placeholders = ", ".join(["%s"] * len(page_ids))
+    cursor.execute(
+        f"SELECT thing_id, title FROM typical_posts WHERE thing_id IN ({placeholders}) AND MATCH(title) AGAINST (%s)",
+        tuple(page_ids) + (keyword,))
+    matched = {}
+    for thing_id, title in cursor.fetchall():
+        matched.setdefault(thing_id, []).append(title)
+    return len(ranked), [_format_item(row, score, matched.get(row[0], [])) for score, row in page_rows]
+
+
+def _like_search(cursor, keyword, page, page_size):
+    """未建全文索引或关键词过短时的回退：标题 LIKE 匹配，按热度排序"""
+    pattern = f"%{keyword}%"
+    cursor.execute(
+        """
+        SELECT id, title, source, date, heat FROM hot_things WHERE title LIKE %s
+        UNION
+        SELECT h.id, h.title, h.source, h.date, h.heat FROM hot_things h
+        JOIN typical_posts p ON p.thing_id = h.id WHERE p.title LIKE %s
+        ORDER BY heat DESC, id DESC
+        LIMIT %s OFFSET %s
+        """,
+        (pattern, pattern, page_size + 1, (page - 1) * page_size))
+    rows = cursor.fetchall()
+    total = (page - 1) * page_size + len(rows)
+    items = [_format_item(row, 0.0, []) for row in rows[:page_size]]
+    return total, items
+
+
+@cached
+def searchHotThingsService(keyword, page=1, page_size=10):
+    """
+    关键词检索事件：返回 {"items", "page", "page_size", "total", "has_more"}。
+    全文检索时 total 为候选集内的命中数（最多约 2 * MAX_CANDIDATES）；LIKE 回退时 total 只保证 has_more 正确。
+    """
+    global _fulltext_available
+    page = max(1, int(page))
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    keyword = (keyword or "").strip()
+    if not keyword:
+        return {"items": [], "page": page, "page_size": page_size, "total": 0, "has_more": False}
+
+    total, items = None, None
+    if _fulltext_available and len(keyword) >= NGRAM_TOKEN_SIZE:
+        try:
+            with db_connection() as cursor:
+                total, items = _fulltext_search(cursor, keyword, page, page_size)
+        except pymysql.err.MySQLError as e:
+            if e.args and e.args[0] == 1191:
+                logger.warning("未找到全文索引，关键词检索回退为 LIKE，请执行 migrations/001_fulltext_search.sql")
+                _fulltext_available = False
+            else:
+                raise
+    if items is None:
+        with db_connection() as cursor:
+            total, items = _like_search(cursor, keyword, page, page_size)
+
+    return {
+        "items": items,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "has_more": total > page * page_size
+    }
@@ -1,5 +1,7 @@
 from api.database import db_connection
+from api.utils.cache import cached
 
+@cached
 def getSysInfoService():
     with db_connection() as cursor:
         cursor.execute("SELECT * from system_info limit 1")
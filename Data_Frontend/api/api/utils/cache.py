@@ -0,0 +1,180 @@
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    进程内的 TTL + LRU 缓存：超过 ttl 秒的条目视为过期，条目数超过 max_entries 时淘汰最久未使用的。
+    若配置了 generation_file，则在每次读取时比对该文件的修改时间，
+    其他进程（如 gunicorn 的其他 worker）写入数据后更新该文件，本进程随即清空缓存。
+    """
+
+    def __init__(self, ttl, max_entries, generation_file=None):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.generation_file = generation_file
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation_mtime = None
+        self._version = "0"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._sync_generation()
+
+    def _sync_generation(self):
+        """共享代数文件有变化时清空本地缓存（调用方需持有锁或处于初始化阶段）"""
+        if not self.generation_file:
+            return
+        try:
+            mtime = os.stat(self.generation_file).st_mtime_ns
+        except OSError:
+            # 文件尚未创建：记为 0，之后任一进程首次写入时也能触发清空
+            if self._generation_mtime is None:
+                self._generation_mtime = 0
+            return
+        if mtime == self._generation_mtime:
+            return
+        try:
+            with open(self.generation_file, "r", encoding="utf-8") as f:
+                self._version = f.read().strip() or self._version
+        except OSError:
+            return
+        if self._generation_mtime is not None:
+            self._entries.clear()
+            self.invalidations += 1
+        self._generation_mtime = mtime
+
+    def get(self, key):
+        with self._lock:
+            self._sync_generation()
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return _MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version=None):
+        """
+        写入缓存；给出 version 时只有数据版本仍为该值才写入。
+        查询期间若有写入（本进程或其他进程）使缓存失效，查询结果可能是写入前的旧数据，不应再放入缓存。
+        """
+        with self._lock:
+            if version is not None:
+                self._sync_generation()
+                if version != self._version:
+                    return False
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self):
+        """数据写入后调用：清空本进程缓存，并更新共享代数文件通知其他进程"""
+        version = f"{time.time_ns()}-{os.getpid()}"
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            self._version = version
+            if self.generation_file:
+                try:
+                    tmp_path = f"{self.generation_file}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(version)
+                    os.replace(tmp_path, self.generation_file)
+                    self._generation_mtime = os.stat(self.generation_file).st_mtime_ns
+                except OSError as e:
+                    logger.error(f"更新缓存代数文件失败: {str(e)}")
+
+    def version(self):
+        """当前数据版本：每次写入（任意进程）后都会变化"""
+        with self._lock:
+            self._sync_generation()
+            return self._version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "generation_file": self.generation_file,
+            }
+
+
+def _default_generation_file():
+    return os.path.join(tempfile.gettempdir(), "sentiment_api_cache.generation")
+
+
+query_cache = None
+if Config.API_CACHE_ENABLED:
+    query_cache = TTLCache(
+        ttl=Config.API_CACHE_TTL,
+        max_entries=Config.API_CACHE_MAX_ENTRIES,
+        generation_file=Config.API_CACHE_GENERATION_FILE or _default_generation_file(),
+    )
+
+
+def cached(func):
+    """读接口的缓存装饰器：以函数名与参数为键；未启用缓存时直接调用"""
+    @functools.wraps(func)
+    def wrapper(*args):
+        if query_cache is None:
+            return func(*args)
+        key = (func.__name__,) + tuple(
+            tuple(a) if isinstance(a, list) else a for a in args
+        )
+        value = query_cache.get(key)
+        if value is _MISSING:
+            # 先记下数据版本再查询：查询期间发生写入时版本已变化，结果不写入缓存
+            version = query_cache.version()
+            value = func(*args)
+            query_cache.put(key, value, version=version)
+        return value
+    return wrapper
+
+
+def invalidate_cache():
+    if query_cache is not None:
+        query_cache.invalidate()
+
+
+def data_version():
+    return query_cache.version() if query_cache is not None else "0"
+
+
+def cache_stats():
+    if query_cache is None:
+        return {"enabled": False}
+    return query_cache.stats()
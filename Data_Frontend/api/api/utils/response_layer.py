@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+from datetime import date
+
+from flask import request
+
+from api.utils.cache import data_version
+
+# brotli 为可选依赖，未安装时只做 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 写接口、统计接口，以及数据不经本服务写入（因而不会更新数据版本）的接口不参与 ETag 协商：
+# system_info 表由外部维护，入库/删除/清空都不会改变它
+NON_CACHEABLE_ENDPOINTS = {
+    "api.addHotThing",
+    "api.addHotThings",
+    "api.addHotThingByCrawler",
+    "api.delHotThingById",
+    "api.clearAllTables",
+    "api.getDbPoolStats",
+    "api.getCacheStats",
+    "api.getSysInfo",
+}
+
+# 响应随当天日期变化的接口（缺省时间窗口为截至今天的最近若干天），ETag 中加入当天日期
+DATE_DEPENDENT_ENDPOINTS = {
+    "api.getNationalMapData",
+}
+
+
+def _request_etag():
+    """
+    强 ETag = 请求路径 + 请求体（含事件 id 等参数）+ 数据版本（按日期取窗口的接口再加当天日期）的摘要。
+    数据只在入库/删除/清空时变化，而这些写操作都会更新数据版本，
+    因此无需执行查询即可判断客户端手中的数据是否仍然有效。
+    """
+    h = hashlib.sha1()
+    h.update(request.path.encode("utf-8"))
+    h.update(b"\0")
+    h.update(request.query_string)
+    h.update(b"\0")
+    h.update(request.get_data(cache=True))
+    h.update(b"\0")
+    h.update(data_version().encode("utf-8"))
+    if request.endpoint in DATE_DEPENDENT_ENDPOINTS:
+        h.update(b"\0")
+        h.update(date.today().isoformat().encode("utf-8"))
+    return h.hexdigest()
+
+
+def _client_etags():
+    """If-None-Match 中的 ETag（去掉压缩编码后缀，同一数据的不同编码视为同一版本）"""
+    etags = set()
+    for value in request.headers.get("If-None-Match", "").split(","):
+        value = value.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        value = value.strip('"')
+        if value:
+            etags.add(value.split("-", 1)[0])
+    return etags
+
+
+def _choose_encoding():
+    accepted = {
+        part.split(";", 1)[0].strip().lower()
+        for part in request.headers.get("Accept-Encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def register_response_layer(app):
+    """为 /api/* 的JSON响应添加 ETag（命中时返回 304）与 gzip/brotli 压缩"""
+    etag_enabled = app.config.get("API_ETAG_ENABLED", True)
+    compress_enabled = app.config.get("API_COMPRESS_ENABLED", True)
+    min_bytes = app.config.get("API_COMPRESS_MIN_BYTES", 1024)
+    level = app.config.get("API_COMPRESS_LEVEL", 6)
+
+    def _cacheable():
+        return etag_enabled and request.endpoint is not None and request.endpoint.startswith("api.") \
+            and request.endpoint not in NON_CACHEABLE_ENDPOINTS
+
+    @app.before_request
+    def check_etag():
+        if not _cacheable() or "If-None-Match" not in request.headers:
+            return None
+        etag = _request_etag()
+        if etag in _client_etags():
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        return None
+
+    @app.after_request
+    def finalize_response(response):
+        # send_file 等文件响应自带 ETag，且不适合在内存中压缩
+        if response.direct_passthrough or response.status_code != 200 or response.mimetype != "application/json":
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = None
+        if compress_enabled and "Content-Encoding" not in response.headers:
+            encoding = _choose_encoding()
+            data = response.get_data()
+            if encoding is not None and len(data) >= min_bytes:
+                if encoding == "br":
+                    response.set_data(brotli.compress(data, quality=min(level, 11)))
+                else:
+                    response.set_data(gzip.compress(data, compresslevel=min(max(level, 1), 9)))
+                response.headers["Content-Encoding"] = encoding
+            else:
+                encoding = None
+
+        # 不同压缩编码的响应体不同，强 ETag 需带上编码后缀
+        if _cacheable():
+            etag = _request_etag()
+            response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+            if request.method == "GET":
+                # 浏览器可以缓存 GET 响应，但每次使用前都要凭 ETag 重新验证（数据未变化时得到 304）
+                response.cache_control.no_cache = True
+                response.cache_control.private = True
+        return response
@@ -0,0 +1,75 @@
+import base64
+import binascii
+import glob
+import logging
+import os
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 图片文件头 -> 扩展名
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+    (b"RIFF", "webp"),
+)
+IMAGE_EXTENSIONS = ("png", "jpg", "gif", "webp")
+
+
+def decode_word_cloud(encoded):
+    """把算法服务给出的 base64 词云（可带 data:image/...;base64, 前缀）解码为 (图片字节, 扩展名)"""
+    if isinstance(encoded, bytes):
+        encoded = encoded.decode("utf-8")
+    if encoded.startswith("data:") and "," in encoded:
+        encoded = encoded.split(",", 1)[1]
+    try:
+        raw = base64.b64decode(encoded, validate=False)
+    except (binascii.Error, ValueError):
+        return None, None
+    for signature, ext in _IMAGE_SIGNATURES:
+        if raw.startswith(signature):
+            return raw, ext
+    return None, None
+
+
+def word_cloud_path(thing_id):
+    """返回已保存的词云文件路径，不存在时返回 None"""
+    for ext in IMAGE_EXTENSIONS:
+        path = os.path.join(Config.WORD_CLOUD_DIR, f"{int(thing_id)}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def save_word_cloud(thing_id, encoded):
+    """解码并写入 WORD_CLOUD_DIR/<thing_id>.<ext>（先写临时文件再替换），返回文件路径；无法解码时返回 None"""
+    raw, ext = decode_word_cloud(encoded)
+    if raw is None:
+        logger.warning(f"事件 {thing_id} 的词云不是可识别的 base64 图片，未写入文件")
+        return None
+    os.makedirs(Config.WORD_CLOUD_DIR, exist_ok=True)
+    path = os.path.join(Config.WORD_CLOUD_DIR, f"{int(thing_id)}.{ext}")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    return path
+
+
+def delete_word_cloud(thing_id):
+    for ext in IMAGE_EXTENSIONS:
+        try:
+            os.remove(os.path.join(Config.WORD_CLOUD_DIR, f"{int(thing_id)}.{ext}"))
+        except FileNotFoundError:
+            pass
+
+
+def clear_word_clouds():
+    for ext in IMAGE_EXTENSIONS:
+        for path in glob.glob(os.path.join(Config.WORD_CLOUD_DIR, f"*.{ext}")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,6 +1,7 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from api.routes import api_bp
+from api.utils.response_layer import register_response_layer
 from config import Config
 import logging
 from logging.handlers import RotatingFileHandler
@@ -21,8 +22,11 @@ def create_app(config_class=Config):
     # 注册错误处理
     register_error_handlers(app)
 
+    # 响应压缩与 ETag
+    register_response_layer(app)
+
     # 启用CORS
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=["ETag"])
 
     return app
 
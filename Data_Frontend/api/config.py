@@ -3,6 +3,24 @@ import os
 class Config:
     # 基础配置（所有环境共享）
     DEBUG = False
+    # MySQL连接池：池大小、等待空闲连接的超时（秒）、连接最长存活时间（秒）、
+    # 空闲超过多少秒后借出前需要ping检查（0 表示每次借出都检查）
+    MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '10'))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '10'))
+    MYSQL_POOL_MAX_LIFETIME = float(os.getenv('MYSQL_POOL_MAX_LIFETIME', '3600'))
+    MYSQL_POOL_PING_IDLE = float(os.getenv('MYSQL_POOL_PING_IDLE', '0'))
+    # 读接口查询缓存：有效期（秒）、最大条目数；代数文件用于多进程间同步失效（默认放在系统临时目录）
+    API_CACHE_ENABLED = os.getenv('API_CACHE_ENABLED', '1') == '1'
+    API_CACHE_TTL = float(os.getenv('API_CACHE_TTL', '300'))
+    API_CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', '2048'))
+    API_CACHE_GENERATION_FILE = os.getenv('API_CACHE_GENERATION_FILE')
+    # 词云图片目录（nginx 可直接从该目录提供 /api/wordCloud/<id>）
+    WORD_CLOUD_DIR = os.getenv('WORD_CLOUD_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'word_clouds'))
+    # /api/* 响应的 ETag 协商与压缩（响应体不小于 API_COMPRESS_MIN_BYTES 字节时压缩，客户端支持时优先 brotli）
+    API_ETAG_ENABLED = os.getenv('API_ETAG_ENABLED', '1') == '1'
+    API_COMPRESS_ENABLED = os.getenv('API_COMPRESS_ENABLED', '1') == '1'
+    API_COMPRESS_MIN_BYTES = int(os.getenv('API_COMPRESS_MIN_BYTES', '1024'))
+    API_COMPRESS_LEVEL = int(os.getenv('API_COMPRESS_LEVEL', '6'))
 
 # 开发环境配置
 class DevelopmentConfig(Config):
@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils import cache  # noqa: E402
+
+
+def _use_cache(monkeypatch, tmp_path):
+    query_cache = cache.TTLCache(ttl=60, max_entries=16, generation_file=str(tmp_path / "generation"))
+    monkeypatch.setattr(cache, "query_cache", query_cache)
+    return query_cache
+
+
+def test_result_is_not_cached_when_a_write_lands_during_the_query(monkeypatch, tmp_path):
+    _use_cache(monkeypatch, tmp_path)
+    rows = ["old"]
+    query_started = threading.Event()
+    write_done = threading.Event()
+
+    @cache.cached
+    def list_rows():
+        # 读到写入前的数据后，等写入方完成写入与失效，再返回旧结果
+        snapshot = list(rows)
+        query_started.set()
+        write_done.wait(5)
+        return snapshot
+
+    def write():
+        query_started.wait(5)
+        rows.append("new")
+        cache.invalidate_cache()
+        write_done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    assert list_rows() == ["old"]
+    writer.join()
+
+    # 查询期间的旧结果没有进入缓存，下一次读取看到写入后的数据
+    assert list_rows() == ["old", "new"]
+
+
+def test_result_is_cached_without_concurrent_writes(monkeypatch, tmp_path):
+    query_cache = _use_cache(monkeypatch, tmp_path)
+    calls = []
+
+    @cache.cached
+    def lookup(key):
+        calls.append(key)
+        return key * 2
+
+    assert lookup(3) == 6
+    assert lookup(3) == 6
+    assert calls == [3]
+    assert query_cache.stats()["hits"] == 1
+
+
+def test_put_is_skipped_after_another_process_invalidates(monkeypatch, tmp_path):
+    query_cache = _use_cache(monkeypatch, tmp_path)
+    version = query_cache.version()
+    # 另一个 worker 写入后更新共享代数文件
+    other = cache.TTLCache(ttl=60, max_entries=16, generation_file=query_cache.generation_file)
+    other.invalidate()
+
+    assert query_cache.put("key", "stale", version=version) is False
+    assert query_cache.get("key") is cache._MISSING
@@ -0,0 +1,100 @@
+import gzip
+import os
+import sys
+from datetime import date
+
+from flask import Blueprint, Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils import cache, response_layer  # noqa: E402
+
+
+class _FakeDate(date):
+    today_value = date(2025, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.today_value
+
+
+def _make_app(monkeypatch, tmp_path, min_bytes=1024):
+    query_cache = cache.TTLCache(ttl=60, max_entries=16, generation_file=str(tmp_path / "generation"))
+    monkeypatch.setattr(cache, "query_cache", query_cache)
+    calls = []
+    bp = Blueprint("api", __name__)
+
+    def getLvById():
+        calls.append("getLvById")
+        return jsonify({"data": "x" * 2000, "message": "success"})
+
+    def getNationalMapData():
+        calls.append("getNationalMapData")
+        return jsonify({"data": {"provinces": []}, "message": "no data"})
+
+    def getSysInfo():
+        calls.append("getSysInfo")
+        return jsonify({"data": {"monitored_total": 1}, "message": "success"})
+
+    bp.route("/getLvById", methods=["GET", "POST"])(getLvById)
+    bp.route("/getNationalMapData", methods=["GET", "POST"])(getNationalMapData)
+    bp.route("/getSysInfo", methods=["GET", "POST"])(getSysInfo)
+    app = Flask(__name__)
+    app.config["API_COMPRESS_MIN_BYTES"] = min_bytes
+    app.register_blueprint(bp, url_prefix="/api")
+    response_layer.register_response_layer(app)
+    return app.test_client(), calls, query_cache
+
+
+def test_get_revalidates_with_304_until_data_changes(monkeypatch, tmp_path):
+    client, calls, query_cache = _make_app(monkeypatch, tmp_path)
+    first = client.get("/api/getLvById?id=1")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    second = client.get("/api/getLvById?id=1", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert calls == ["getLvById"]
+
+    # 其他参数或写入后（数据版本变化）ETag 不再匹配
+    assert client.get("/api/getLvById?id=2", headers={"If-None-Match": etag}).status_code == 200
+    query_cache.invalidate()
+    assert client.get("/api/getLvById?id=1", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_compressed_response_shares_etag_with_plain_response(monkeypatch, tmp_path):
+    client, calls, _ = _make_app(monkeypatch, tmp_path)
+    compressed = client.get("/api/getLvById?id=1", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert b'"message":"success"' in gzip.decompress(compressed.data).replace(b" ", b"")
+    assert compressed.headers["ETag"].strip('"').endswith("-gzip")
+
+    # 带编码后缀的 ETag 同样命中未压缩的版本
+    revalidated = client.get("/api/getLvById?id=1", headers={"If-None-Match": compressed.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_small_responses_are_not_compressed(monkeypatch, tmp_path):
+    client, _, _ = _make_app(monkeypatch, tmp_path, min_bytes=10 ** 6)
+    response = client.get("/api/getLvById?id=1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_map_etag_changes_with_the_date(monkeypatch, tmp_path):
+    client, calls, _ = _make_app(monkeypatch, tmp_path)
+    monkeypatch.setattr(response_layer, "date", _FakeDate)
+    etag = client.get("/api/getNationalMapData").headers["ETag"]
+    assert client.get("/api/getNationalMapData", headers={"If-None-Match": etag}).status_code == 304
+
+    # 跨过零点后缺省的 30 天窗口变化，不能再返回 304
+    monkeypatch.setattr(_FakeDate, "today_value", date(2025, 3, 2))
+    assert client.get("/api/getNationalMapData", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_sys_info_is_not_etagged(monkeypatch, tmp_path):
+    client, calls, _ = _make_app(monkeypatch, tmp_path)
+    response = client.get("/api/getSysInfo")
+    assert "ETag" not in response.headers
+    assert client.get("/api/getSysInfo", headers={"If-None-Match": "*"}).status_code == 200
+    assert calls == ["getSysInfo", "getSysInfo"]
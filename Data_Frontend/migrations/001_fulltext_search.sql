@@ -0,0 +1,12 @@
+-- 事件标题与典型帖子标题的全文索引（ngram 分词，支持中文）
+-- ngram 分词长度由 MySQL 启动参数 ngram_token_size 决定（默认 2），修改后需重建索引
+-- 执行前请先 USE 对应数据库；大表建索引耗时较长，建议在低峰期执行
+
+ALTER TABLE hot_things
+    ADD FULLTEXT INDEX ft_hot_things_title (title) WITH PARSER ngram;
+
+ALTER TABLE typical_posts
+    ADD FULLTEXT INDEX ft_typical_posts_title (title) WITH PARSER ngram;
+
+-- typical_posts 按事件取帖子时使用（如已存在外键索引可跳过）
+-- ALTER TABLE typical_posts ADD INDEX idx_typical_posts_thing (thing_id);
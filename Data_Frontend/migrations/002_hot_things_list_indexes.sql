@@ -0,0 +1,9 @@
+-- 事件分页列表（POST /api/listHotThings）的键集分页索引
+-- 排序为 (date, id) 或 (heat, id) 倒序；按预警等级、来源过滤时使用带前缀列的联合索引
+-- 执行前请先 USE 对应数据库
+
+ALTER TABLE hot_things
+    ADD INDEX idx_hot_things_date_id (date, id),
+    ADD INDEX idx_hot_things_heat_id (heat, id),
+    ADD INDEX idx_hot_things_lv_date_id (warning_lv, date, id),
+    ADD INDEX idx_hot_things_source_date_id (source, date, id);
@@ -0,0 +1,43 @@
+-- 全国热点地图（POST /api/getNationalMapData）的省份热度预聚合
+-- thing_provinces.ratio：事件在该省份的帖子占比（算法服务的地域分布）；旧数据只有颜色，
+--   按算法服务 get_color_by_ratio 的分档取该档占比区间的中点回填（灰色 #E0E0E0 为 0，最深一档 >= 0.2 取 0.2）
+-- province_heat_daily：按 省份 + 事件日期 汇总的事件数、热度和、按占比加权的热度，由后台入库/删除事件时增量维护
+-- 执行前请先 USE 对应数据库
+
+ALTER TABLE thing_provinces
+    ADD COLUMN ratio DOUBLE NULL;
+
+-- 回填旧数据的占比（已执行过本迁移的库可跳过上面的 ALTER，单独执行本语句及下方的汇总回填）
+UPDATE thing_provinces
+SET ratio = CASE color
+    WHEN '#BBDEFB' THEN 0.025
+    WHEN '#64B5F6' THEN 0.075
+    WHEN '#2196F3' THEN 0.125
+    WHEN '#1976D2' THEN 0.175
+    WHEN '#0D47A1' THEN 0.2
+    ELSE 0
+END
+WHERE ratio IS NULL;
+
+CREATE TABLE IF NOT EXISTS province_heat_daily (
+    province_pid INT NOT NULL,
+    day DATE NOT NULL,
+    event_count INT NOT NULL DEFAULT 0,
+    heat_sum DOUBLE NOT NULL DEFAULT 0,
+    weighted_heat DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (province_pid, day),
+    INDEX idx_province_heat_daily_day (day)
+);
+
+-- 回填已有事件
+INSERT INTO province_heat_daily (province_pid, day, event_count, heat_sum, weighted_heat)
+SELECT tp.province_pid, DATE(h.date), COUNT(*), SUM(h.heat),
+       SUM(h.heat * tp.ratio)
+FROM thing_provinces tp
+JOIN hot_things h ON h.id = tp.thing_id
+WHERE tp.ratio > 0
+GROUP BY tp.province_pid, DATE(h.date)
+ON DUPLICATE KEY UPDATE
+    event_count = VALUES(event_count),
+    heat_sum = VALUES(heat_sum),
+    weighted_heat = VALUES(weighted_heat);
@@ -0,0 +1,78 @@
+import threading
+
+# (序列长度上限, 基准批大小)：越长的帖子 padding 后显存占用越大，批应越小；None 表示无上限
+DEFAULT_LENGTH_BUCKETS = ((64, 32), (128, 16), (256, 8), (None, 4))
+
+
+def is_out_of_memory(exc):
+    """CUDA/CPU 显存或内存不足（torch.cuda.OutOfMemoryError 也是 RuntimeError 的子类）"""
+    return isinstance(exc, (RuntimeError, MemoryError)) and (
+        isinstance(exc, MemoryError) or "out of memory" in str(exc).lower()
+    )
+
+
+def _percentile(values, q):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class AdaptiveBatchSizer:
+    """
+    按序列长度分桶选择批大小，并用实测吞吐（帖子/秒）在相邻批大小间择优。
+    某个批大小出现 OOM 后，该桶的上限降为其一半，后续请求不会再尝试更大的批。
+    """
+
+    def __init__(self, buckets=DEFAULT_LENGTH_BUCKETS, max_batch_size=64, length_quantile=0.9):
+        self.buckets = buckets
+        self.max_batch_size = max_batch_size
+        self.length_quantile = length_quantile
+        self._lock = threading.Lock()
+        # 桶下标 -> OOM 后的批大小上限
+        self._ceilings = {}
+        # (桶下标, 批大小) -> 吞吐滑动平均
+        self._throughput = {}
+
+    def bucket_for(self, lengths):
+        """以长度分位数（默认 P90）确定事件所属的长度桶"""
+        length = _percentile(lengths, self.length_quantile)
+        for index, (limit, _) in enumerate(self.buckets):
+            if limit is None or length <= limit:
+                return index
+        return len(self.buckets) - 1
+
+    def choose(self, bucket):
+        base = self.buckets[bucket][1]
+        with self._lock:
+            ceiling = min(self._ceilings.get(bucket, self.max_batch_size), self.max_batch_size)
+            candidates = sorted({max(1, min(size, ceiling)) for size in (base // 2, base, base * 2)})
+            # 先试探尚未测量过的批大小，之后选吞吐最高的
+            for size in candidates:
+                if (bucket, size) not in self._throughput:
+                    return size
+            return max(candidates, key=lambda size: self._throughput[(bucket, size)])
+
+    def record(self, bucket, batch_size, posts, seconds):
+        if posts <= 0 or seconds <= 0:
+            return
+        rate = posts / seconds
+        with self._lock:
+            previous = self._throughput.get((bucket, batch_size))
+            self._throughput[(bucket, batch_size)] = rate if previous is None else 0.7 * previous + 0.3 * rate
+
+    def record_oom(self, bucket, batch_size):
+        """记录 OOM 并返回下一次重试的批大小（最小为 1）"""
+        smaller = max(1, batch_size // 2)
+        with self._lock:
+            self._ceilings[bucket] = min(self._ceilings.get(bucket, self.max_batch_size), smaller)
+            self._throughput = {k: v for k, v in self._throughput.items() if not (k[0] == bucket and k[1] > smaller)}
+        return smaller
+
+    def stats(self):
+        with self._lock:
+            return {
+                "buckets": [{"max_length": limit, "base_batch_size": size} for limit, size in self.buckets],
+                "ceilings": {str(k): v for k, v in self._ceilings.items()},
+                "throughput": {f"{b}:{s}": round(v, 2) for (b, s), v in self._throughput.items()},
+            }
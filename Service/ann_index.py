@@ -0,0 +1,155 @@
+import numpy as np
+
+# 可选的近似最近邻后端（均为 CPU 版本），未安装时回退到分块精确检索
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+except ImportError:
+    connected_components = None
+
+# 分块精确检索时每块的查询数，控制内存占用约为 block * n * 4 字节
+_EXACT_BLOCK = 2048
+
+
+def available_backends():
+    backends = ["exact"]
+    if faiss is not None:
+        backends.insert(0, "faiss")
+    if hnswlib is not None:
+        backends.insert(0, "hnsw")
+    return backends
+
+
+def _normalize(features):
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+
+
+def _knn_hnsw(features, k, ef, m, threads):
+    n, dim = features.shape
+    index = hnswlib.Index(space="ip", dim=dim)
+    index.init_index(max_elements=n, ef_construction=max(ef, k), M=m)
+    index.set_num_threads(threads)
+    index.add_items(features, np.arange(n))
+    index.set_ef(max(ef, k))
+    labels, distances = index.knn_query(features, k=k)
+    # ip 空间的距离为 1 - 内积
+    return labels.astype(np.int64), 1.0 - distances
+
+
+def _knn_faiss(features, k, nlist, nprobe):
+    n, dim = features.shape
+    nlist = max(1, min(nlist, n // 39))
+    quantizer = faiss.IndexFlatIP(dim)
+    index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    index.train(features)
+    index.add(features)
+    index.nprobe = min(nprobe, nlist)
+    sims, labels = index.search(features, k)
+    return labels.astype(np.int64), sims
+
+
+def _knn_exact(features, k):
+    n = features.shape[0]
+    labels = np.empty((n, k), dtype=np.int64)
+    sims = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, _EXACT_BLOCK):
+        block = features[start:start + _EXACT_BLOCK] @ features.T
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        labels[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        sims[start:start + len(block)] = np.take_along_axis(top_sims, order, axis=1)
+    return labels, sims
+
+
+def knn(features, k=10, backend="auto", ef=64, m=16, nlist=1024, nprobe=16, threads=-1):
+    """
+    对归一化后的特征做 k 近邻检索（余弦相似度），返回 (邻居下标, 相似度)，形状均为 (n, k)。
+    backend: auto / hnsw / faiss / exact；auto 依次尝试 hnsw、faiss，都不可用时精确检索。
+    """
+    features = _normalize(features)
+    k = max(1, min(k, features.shape[0]))
+    if backend == "auto":
+        backend = available_backends()[0]
+    if backend == "hnsw":
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed")
+        return _knn_hnsw(features, k, ef, m, threads)
+    if backend == "faiss":
+        if faiss is None:
+            raise RuntimeError("faiss is not installed")
+        return _knn_faiss(features, k, nlist, nprobe)
+    if backend == "exact":
+        return _knn_exact(features, k)
+    raise ValueError(f"unknown ann backend: {backend}")
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _components(n, src, dst):
+    if connected_components is not None:
+        graph = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+        return connected_components(graph, directed=False)[1]
+    # 未安装 scipy 时使用并查集
+    parent = np.arange(n)
+    for i, j in zip(src, dst):
+        ri, rj = _find(parent, i), _find(parent, j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([_find(parent, i) for i in range(n)])
+
+
+def cluster_by_knn(neighbors, sims, threshold, min_size=1):
+    """
+    把相似度不低于 threshold 的近邻对连成边，取连通分量作为簇。
+    小于 min_size 的簇视为噪声，标签为 -1；其余簇按大小降序编号。
+    """
+    n = neighbors.shape[0]
+    rows, cols = np.nonzero(sims >= threshold)
+    dst = neighbors[rows, cols]
+    valid = (dst >= 0) & (dst != rows)
+    roots = _components(n, rows[valid], dst[valid])
+    unique, inverse, counts = np.unique(roots, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    rank = np.full(len(unique), -1)
+    next_label = 0
+    for idx in order:
+        if counts[idx] >= min_size:
+            rank[idx] = next_label
+            next_label += 1
+    return rank[inverse]
+
+
+def cluster_metrics(features, labels):
+    """簇数、噪声帖子数，以及帖子与所属簇质心的平均余弦相似度（簇内紧密度）"""
+    features = _normalize(features)
+    clustered = labels >= 0
+    n_clusters = int(labels.max()) + 1 if clustered.any() else 0
+    cohesion = 0.0
+    if n_clusters:
+        sums = np.zeros((n_clusters, features.shape[1]), dtype=np.float32)
+        np.add.at(sums, labels[clustered], features[clustered])
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        cohesion = float(np.mean(np.sum(features[clustered] * centroids[labels[clustered]], axis=1)))
+    return {
+        "n_posts": int(len(labels)),
+        "n_clusters": n_clusters,
+        "noise_posts": int((~clustered).sum()),
+        "mean_cohesion": round(cohesion, 4),
+    }
@@ -0,0 +1,39 @@
+import os
+import sys
+
+# 基础信息统计子进程：static_analyize_api 在每个子进程中单独导入并初始化一次，
+# 统计与词云渲染占用的 CPU/GIL 不影响主进程中的价值观模型推理与请求处理
+
+_api = None
+
+
+def _init_api(work_dir):
+    global _api
+    if _api is None:
+        # 与主进程一致：切换到 human_value_predict 目录，保证模块内部的相对路径正确
+        if os.path.exists(work_dir):
+            os.chdir(work_dir)
+        if work_dir not in sys.path:
+            sys.path.append(work_dir)
+        import static_analyize_api
+        static_analyize_api.init()
+        _api = static_analyize_api
+        print(f"[BaseinfoWorker] pid={os.getpid()} static_analyize_api initialized.", flush=True)
+    return _api
+
+
+def init_worker(work_dir, ready_queue=None):
+    """进程池 initializer：子进程启动时即导入并初始化，第一个请求无需等待模型/词典加载；完成后上报 pid"""
+    _init_api(work_dir)
+    if ready_queue is not None:
+        ready_queue.put(os.getpid())
+
+
+def ping():
+    """空任务，用于在服务启动时把进程池的子进程全部拉起"""
+    return os.getpid()
+
+
+def forward_file(work_dir, csv_file_path):
+    """在子进程中运行 static_analyize_api.forward_file（首次调用时初始化）"""
+    return _init_api(work_dir).forward_file(csv_file_path)
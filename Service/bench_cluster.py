@@ -0,0 +1,220 @@
+"""
+聚类规模基准：比较近似最近邻聚类（/cluster method="ann"）与两两相似度精确检索的耗时与聚类指标。
+
+合成数据（默认 1万 / 10万 / 100万 帖子）：
+    python Service/bench_cluster.py --sizes 10000 100000 1000000
+
+真实数据（需启动聚类服务 8002 且与本脚本在同一台机器上）：从数据根目录按事件顺序取前 N 条帖子，
+写入临时数据根目录（csv 只含所取的行，images 以符号链接提供），再分别以 traditional 与 ann 调用 /cluster，
+对每个规模比较两种方法。两种方法各用一份临时目录，聚类输出的 cluster_events 只写入临时目录，真实数据根目录不被修改：
+    python Service/bench_cluster.py --data-root /data1/yxr/结果文件 --sizes 10000 100000
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import requests
+
+import ann_index
+from event_csv import event_csv_path
+
+CLUSTER_EVENTS_DIR = "cluster_events"
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def make_dataset(n, dim, posts_per_topic, noise, seed):
+    """在单位球面上生成若干话题中心，每条帖子为某个话题中心加噪声"""
+    rng = np.random.default_rng(seed)
+    n_topics = max(1, n // posts_per_topic)
+    centers = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    topics = rng.integers(0, n_topics, size=n)
+    features = centers[topics] + noise * rng.normal(size=(n, dim)).astype(np.float32) / np.sqrt(dim)
+    return features, topics
+
+
+def nmi(labels_true, labels_pred):
+    """归一化互信息（算术平均归一化），噪声帖子各自视为单独的簇"""
+    labels_pred = labels_pred.copy()
+    noise = labels_pred < 0
+    labels_pred[noise] = labels_pred.max() + 1 + np.arange(noise.sum())
+    n = len(labels_true)
+    _, t = np.unique(labels_true, return_inverse=True)
+    _, p = np.unique(labels_pred, return_inverse=True)
+    pairs, joint = np.unique(t.astype(np.int64) * (p.max() + 1) + p, return_counts=True)
+    pt = np.bincount(t) / n
+    pp = np.bincount(p) / n
+    pj = joint / n
+    mi = np.sum(pj * np.log(pj / (pt[pairs // (p.max() + 1)] * pp[pairs % (p.max() + 1)])))
+    ht = -np.sum(pt * np.log(pt))
+    hp = -np.sum(pp * np.log(pp))
+    return float(2 * mi / (ht + hp)) if ht + hp > 0 else 1.0
+
+
+def bench_synthetic(args):
+    backends = [b for b in ann_index.available_backends() if b != "exact"]
+    if not backends:
+        print("[Bench] hnswlib / faiss-cpu 均未安装，ANN 一栏使用精确检索代替")
+        backends = ["exact"]
+    rows = []
+    for n in args.sizes:
+        features, topics = make_dataset(n, args.dim, args.posts_per_topic, args.noise, args.seed)
+        methods = [("ann:" + backends[0], backends[0])]
+        if n <= args.exact_max:
+            methods.append(("pairwise-exact", "exact"))
+        for name, backend in methods:
+            started = time.time()
+            neighbors, sims = ann_index.knn(features, k=args.neighbors, backend=backend)
+            knn_seconds = time.time() - started
+            labels = ann_index.cluster_by_knn(neighbors, sims, args.threshold, min_size=args.min_size)
+            total_seconds = time.time() - started
+            metrics = ann_index.cluster_metrics(features, labels)
+            row = {
+                "n_posts": n,
+                "method": name,
+                "knn_seconds": round(knn_seconds, 3),
+                "total_seconds": round(total_seconds, 3),
+                "n_clusters": metrics["n_clusters"],
+                "noise_posts": metrics["noise_posts"],
+                "mean_cohesion": metrics["mean_cohesion"],
+                "nmi": round(nmi(topics, labels), 4),
+            }
+            rows.append(row)
+            print(json.dumps(row, ensure_ascii=False), flush=True)
+        if n > args.exact_max:
+            print(f"[Bench] n={n} 超过 --exact-max={args.exact_max}，跳过两两精确检索（O(n^2)）", flush=True)
+    return rows
+
+
+def _source_events(data_root):
+    for name in sorted(os.listdir(data_root)):
+        event_dir = os.path.join(data_root, name)
+        if name.startswith(".") or name == CLUSTER_EVENTS_DIR or not os.path.isdir(event_dir):
+            continue
+        if os.path.exists(event_csv_path(event_dir)):
+            yield name, event_dir
+
+
+def count_posts(data_root):
+    total = 0
+    for _, event_dir in _source_events(data_root):
+        with open(event_csv_path(event_dir), "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            total += sum(1 for _ in reader)
+    return total
+
+
+def make_subset_root(data_root, n_posts, work_dir=None):
+    """按事件顺序取前 n_posts 条帖子写入新的临时数据根目录，返回 (目录, 实际帖子数)"""
+    root = tempfile.mkdtemp(prefix="bench_cluster_", dir=work_dir)
+    written = 0
+    for name, event_dir in _source_events(data_root):
+        if written >= n_posts:
+            break
+        target_dir = os.path.join(root, name)
+        os.makedirs(target_dir)
+        images = os.path.join(event_dir, "images")
+        if os.path.isdir(images):
+            os.symlink(os.path.abspath(images), os.path.join(target_dir, "images"))
+        with open(event_csv_path(event_dir), "r", encoding="utf-8-sig", newline="") as src, \
+                open(event_csv_path(target_dir), "w", encoding="utf-8-sig", newline="") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            header = next(reader, None)
+            if header is None:
+                continue
+            writer.writerow(header)
+            for row in reader:
+                if written >= n_posts:
+                    break
+                writer.writerow(row)
+                written += 1
+    return root, written
+
+
+def bench_service(args):
+    """
+    对真实数据的每个规模分别调用 /cluster traditional 与 ann，比较耗时与服务返回的指标。
+    每次调用都使用单独的临时数据根目录，不会覆盖真实数据根目录下的 cluster_events。
+    """
+    total = count_posts(args.data_root)
+    sizes = sorted({min(n, total) for n in args.sizes})
+    print(f"[Bench] 数据根目录共 {total} 条帖子，测试规模: {sizes}", flush=True)
+    rows = []
+    for n in sizes:
+        by_method = {}
+        for method in ("traditional", "ann"):
+            root, n_posts = make_subset_root(args.data_root, n, args.work_dir)
+            try:
+                payload = {
+                    "data_source_path": root,
+                    "method": method,
+                    "similarity_threshold": args.threshold,
+                    "min_posts": args.min_size,
+                }
+                started = time.time()
+                resp = requests.post(args.cluster_url, json=payload, timeout=args.timeout)
+                elapsed = time.time() - started
+            finally:
+                if not args.keep_roots:
+                    shutil.rmtree(root, ignore_errors=True)
+            try:
+                outputs = (resp.json() or {}).get("outputs") or {}
+            except ValueError:
+                outputs = {}
+            row = {
+                "n_posts": n_posts,
+                "method": method,
+                "status_code": resp.status_code,
+                "wall_seconds": round(elapsed, 3),
+                "n_clusters": len(outputs.get("clusters") or []),
+                "metrics": outputs.get("metrics"),
+            }
+            if args.keep_roots:
+                row["data_root"] = root
+            by_method[method] = row
+            rows.append(row)
+            print(json.dumps(row, ensure_ascii=False), flush=True)
+        traditional, ann = by_method["traditional"], by_method["ann"]
+        if traditional["status_code"] == 200 and ann["status_code"] == 200 and ann["wall_seconds"] > 0:
+            print(f"[Bench] n={n}: traditional {traditional['wall_seconds']}s / {traditional['n_clusters']} 簇，"
+                  f"ann {ann['wall_seconds']}s / {ann['n_clusters']} 簇，"
+                  f"加速 {traditional['wall_seconds'] / ann['wall_seconds']:.2f}x", flush=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--posts-per-topic", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.6)
+    parser.add_argument("--neighbors", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--min-size", type=int, default=2)
+    parser.add_argument("--exact-max", type=int, default=100000, help="超过该规模不再运行两两精确检索")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-root", help="真实数据根目录（只读）；指定后改为按 --sizes 取子集调用聚类服务对比 traditional 与 ann")
+    parser.add_argument("--work-dir", help="临时数据根目录的父目录（默认系统临时目录，需聚类服务可访问）")
+    parser.add_argument("--keep-roots", action="store_true", help="保留临时数据根目录（含聚类输出）以便检查")
+    parser.add_argument("--cluster-url", default="http://localhost:8002/cluster")
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--output", help="结果另存为 json 文件")
+    args = parser.parse_args()
+
+    rows = bench_service(args) if args.data_root else bench_synthetic(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import csv
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from event_csv import event_csv_path, index_post_images, post_text, read_event_header, read_event_rows
+
+CLUSTER_EVENTS_DIR = "cluster_events"
+# 增量聚类状态放在数据根目录下的隐藏目录，不会被当作原始事件或聚类事件
+STATE_DIR = ".cluster_state"
+
+_INVALID_NAME_CHARS = re.compile(r'[\\/:*?"<>|\s#@]+')
+
+
+class Post:
+    def __init__(self, post_id, row, fieldnames, text, image_paths):
+        self.id = post_id
+        self.row = row
+        self.fieldnames = fieldnames
+        self.text = text
+        self.image_paths = image_paths
+
+
+def collect_posts(data_source_path, with_images=True):
+    """
+    遍历数据根目录下的原始事件目录（<root>/<事件>/<事件>.csv），返回全部帖子；
+    同一帖子id出现在多个原始事件中时只保留（按目录名排序的）第一条，避免被分配、写入两次。
+    """
+    posts = []
+    seen_ids = set()
+    for name in sorted(os.listdir(data_source_path)):
+        event_dir = os.path.join(data_source_path, name)
+        if name.startswith(".") or name == CLUSTER_EVENTS_DIR or not os.path.isdir(event_dir):
+            continue
+        csv_file_path = event_csv_path(event_dir)
+        if not os.path.exists(csv_file_path):
+            continue
+        fieldnames, rows = read_event_rows(csv_file_path)
+        images = index_post_images(os.path.join(event_dir, "images")) if with_images else {}
+        for row in rows:
+            post_id = str(row.get("id", "")).strip()
+            if not post_id or post_id in seen_ids:
+                continue
+            seen_ids.add(post_id)
+            posts.append(Post(post_id, row, fieldnames, post_text(row), images.get(post_id, [])))
+    return posts
+
+
+class ClusterState:
+    """
+    上一次聚类的结果摘要：每个簇的名称、特征向量和（用于增量更新质心）与帖子数，
+    以及已经参与过聚类的帖子id。
+    """
+
+    def __init__(self, names=None, sums=None, counts=None, seen_ids=None):
+        self.names = names or []
+        self.sums = sums
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.int64)
+        self.seen_ids = seen_ids or set()
+
+    @staticmethod
+    def state_dir(data_source_path):
+        return os.path.join(data_source_path, STATE_DIR)
+
+    @classmethod
+    def load(cls, data_source_path):
+        state_dir = cls.state_dir(data_source_path)
+        meta_path = os.path.join(state_dir, "state.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(state_dir, "centroids.npz"))
+        return cls(meta["names"], arrays["sums"], arrays["counts"], set(meta["seen_ids"]))
+
+    def save(self, data_source_path):
+        state_dir = self.state_dir(data_source_path)
+        os.makedirs(state_dir, exist_ok=True)
+        np.savez(os.path.join(state_dir, "centroids.npz"), sums=self.sums, counts=self.counts)
+        tmp_path = os.path.join(state_dir, "state.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"names": self.names, "seen_ids": sorted(self.seen_ids)}, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(state_dir, "state.json"))
+
+    def centroids(self):
+        norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+        return self.sums / np.maximum(norms, 1e-12)
+
+    def add_cluster(self, name, feature):
+        self.names.append(name)
+        feature = feature.reshape(1, -1)
+        self.sums = feature.copy() if self.sums is None or len(self.sums) == 0 else np.vstack([self.sums, feature])
+        self.counts = np.append(self.counts, 1)
+        return len(self.names) - 1
+
+    def add_to_cluster(self, index, feature):
+        self.sums[index] += feature
+        self.counts[index] += 1
+
+
+def _normalize(features):
+    features = np.asarray(features, dtype=np.float32)
+    return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+
+
+def bootstrap_state(data_source_path, embed_fn, seen_posts):
+    """由一次全量聚类输出的 cluster_events 目录构建初始状态"""
+    cluster_folder = os.path.join(data_source_path, CLUSTER_EVENTS_DIR)
+    state = ClusterState(seen_ids={p.id for p in seen_posts})
+    for name in sorted(os.listdir(cluster_folder)):
+        event_dir = os.path.join(cluster_folder, name)
+        csv_file_path = event_csv_path(event_dir)
+        if name.startswith(".") or not os.path.exists(csv_file_path):
+            continue
+        fieldnames, rows = read_event_rows(csv_file_path)
+        images = index_post_images(os.path.join(event_dir, "images"))
+        posts = []
+        for row in rows:
+            post_id = str(row.get("id", "")).strip()
+            posts.append(Post(post_id, row, fieldnames, post_text(row), images.get(post_id, [])))
+        if not posts:
+            continue
+        features = _normalize(embed_fn(posts))
+        index = state.add_cluster(name, features[0])
+        state.sums[index] = features.sum(axis=0)
+        state.counts[index] = len(posts)
+    return state
+
+
+def _cluster_name(post, existing):
+    base = _INVALID_NAME_CHARS.sub("", post.text)[:20] or f"event_{post.id}"
+    name, suffix = base, 2
+    while name in existing:
+        name, suffix = f"{base}_{suffix}", suffix + 1
+    return name
+
+
+def assign_posts(state, posts, features, threshold):
+    """
+    逐条把新帖子分配到余弦相似度最高且不低于阈值的簇，否则新建簇。
+    质心随分配增量更新，因此同一批中的新帖子也可以聚到新建的簇里。
+    返回每条帖子对应的簇下标。
+    """
+    features = _normalize(features)
+    existing = set(state.names)
+    assignments = []
+    centroids = state.centroids() if state.names else None
+    for post, feature in zip(posts, features):
+        best = -1
+        if centroids is not None and len(centroids):
+            sims = centroids @ feature
+            best = int(np.argmax(sims))
+            if sims[best] < threshold:
+                best = -1
+        if best < 0:
+            name = _cluster_name(post, existing)
+            existing.add(name)
+            best = state.add_cluster(name, feature)
+            centroids = state.centroids()
+        else:
+            state.add_to_cluster(best, feature)
+            centroids[best] = state.sums[best] / max(np.linalg.norm(state.sums[best]), 1e-12)
+        assignments.append(best)
+    return assignments
+
+
+def _count_rows(csv_file_path):
+    with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as f:
+        return max(0, sum(1 for row in csv.reader(f) if row) - 1)
+
+
+def write_assignments(cluster_folder, state, posts, assignments, max_samples_per_event=None):
+    """
+    把新帖子追加写入各自簇的 cluster_events 目录（含配图），只改动受影响的事件目录。
+    与全量聚类一致，每个事件目录最多写入 max_samples_per_event 条帖子，已写满的簇只更新质心不再追加；
+    返回实际有新帖子写入的事件目录。
+    """
+    by_cluster = {}
+    for post, index in zip(posts, assignments):
+        by_cluster.setdefault(state.names[index], []).append(post)
+
+    written = []
+    for name, cluster_posts in sorted(by_cluster.items()):
+        event_dir = os.path.join(cluster_folder, name)
+        csv_file_path = event_csv_path(event_dir)
+        exists = os.path.exists(csv_file_path)
+        if max_samples_per_event:
+            room = max_samples_per_event - (_count_rows(csv_file_path) if exists else 0)
+            cluster_posts = cluster_posts[:max(0, room)]
+        if not cluster_posts:
+            continue
+        image_dir = os.path.join(event_dir, "images")
+        os.makedirs(image_dir, exist_ok=True)
+        if exists:
+            fieldnames = read_event_header(csv_file_path)
+            mode = "a"
+        else:
+            fieldnames = cluster_posts[0].fieldnames
+            mode = "w"
+        with open(csv_file_path, mode, encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore", restval="")
+            if mode == "w":
+                writer.writeheader()
+            for post in cluster_posts:
+                writer.writerow(post.row)
+        for post in cluster_posts:
+            for image_path in post.image_paths:
+                shutil.copy2(image_path, os.path.join(image_dir, os.path.basename(image_path)))
+        written.append(name)
+    return written
+
+
+def write_clusters(data_source_path, posts, features, labels, max_samples_per_event=None):
+    """
+    用一次完整聚类的结果（labels 中 -1 为噪声）重建 cluster_events 目录，
+    并直接由已有特征生成增量聚类状态，后续可在此基础上增量聚类。
+    返回 {簇名: 写入的帖子数}。
+    """
+    cluster_folder = os.path.join(data_source_path, CLUSTER_EVENTS_DIR)
+    tmp_folder = cluster_folder + ".tmp"
+    if os.path.isdir(tmp_folder):
+        shutil.rmtree(tmp_folder)
+    os.makedirs(tmp_folder)
+
+    features = _normalize(features)
+    state = ClusterState(seen_ids={p.id for p in posts})
+    members = {}
+    for i, label in enumerate(labels):
+        if label >= 0:
+            members.setdefault(int(label), []).append(i)
+    existing = set()
+    assignments, written = [], []
+    for label in sorted(members):
+        indices = members[label]
+        name = _cluster_name(posts[indices[0]], existing)
+        existing.add(name)
+        index = state.add_cluster(name, features[indices[0]])
+        state.sums[index] = features[indices].sum(axis=0)
+        state.counts[index] = len(indices)
+        for i in indices[:max_samples_per_event or None]:
+            written.append(posts[i])
+            assignments.append(index)
+    write_assignments(tmp_folder, state, written, assignments)
+
+    # 全部写完后再替换旧目录，避免中途失败留下不完整的事件
+    if os.path.isdir(cluster_folder):
+        shutil.rmtree(cluster_folder)
+    os.replace(tmp_folder, cluster_folder)
+    state.save(data_source_path)
+    counts = {}
+    for index in assignments:
+        counts[state.names[index]] = counts.get(state.names[index], 0) + 1
+    return counts
+
+
+def run_incremental(data_source_path, embed_fn, threshold, full_forward, max_samples_per_event=None):
+    """
+    增量聚类：首次运行（无状态）时执行一次全量聚类并由其输出构建状态；
+    之后只对新出现的帖子提取特征并分配到已有簇或新建簇（每个事件目录最多 max_samples_per_event 条帖子）。
+    返回 (各簇帖子数, 本次受影响的事件目录, 指标)。
+    """
+    cluster_folder = os.path.join(data_source_path, CLUSTER_EVENTS_DIR)
+    posts = collect_posts(data_source_path)
+    state = ClusterState.load(data_source_path)
+
+    if state is None or not os.path.isdir(cluster_folder):
+        result = full_forward()
+        if result is None:
+            raise RuntimeError("cluster forward returned None")
+        state = bootstrap_state(data_source_path, embed_fn, posts)
+        state.save(data_source_path)
+        metrics = {"mode": "full", "total_posts": len(posts), "new_posts": len(posts), "new_clusters": len(state.names)}
+        return dict(zip(state.names, state.counts.tolist())), list(state.names), metrics
+
+    new_posts = [p for p in posts if p.id not in state.seen_ids]
+    affected = []
+    clusters_before = len(state.names)
+    if new_posts:
+        assignments = assign_posts(state, new_posts, embed_fn(new_posts), threshold)
+        affected = write_assignments(cluster_folder, state, new_posts, assignments, max_samples_per_event)
+        state.seen_ids.update(p.id for p in new_posts)
+        state.save(data_source_path)
+    metrics = {
+        "mode": "incremental",
+        "total_posts": len(posts),
+        "new_posts": len(new_posts),
+        "new_clusters": len(state.names) - clusters_before,
+        "affected_clusters": len(affected),
+    }
+    return dict(zip(state.names, state.counts.tolist())), affected, metrics
@@ -0,0 +1,305 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+
+# 可选依赖：安装 pyarrow 后，事件csv首次解析的结果写成 Arrow IPC（Feather v2）旁路文件，
+# 之后各服务进程直接内存映射读取，不再重复解析csv；未安装时每次都解析csv
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+# 帖子正文可能出现的列名（不同站点导出的列名不一致），按优先级排列
+TEXT_COLUMNS = ("微博正文", "正文", "内容", "content", "text", "标题", "title")
+
+# 旁路缓存配置（各服务进程共用同一目录；键 = csv 绝对路径 + mtime + 文件大小）
+EVENT_CSV_CACHE_ENABLED = os.getenv("EVENT_CSV_CACHE_ENABLED", "true").lower() == "true"
+EVENT_CSV_CACHE_DIR = os.getenv(
+    "EVENT_CSV_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "csv_cache")
+)
+# 小文件解析很快，不值得写旁路文件
+EVENT_CSV_CACHE_MIN_BYTES = int(os.getenv("EVENT_CSV_CACHE_MIN_BYTES", str(1024 * 1024)))
+# 旁路目录总大小上限：超过时按最近使用时间（命中时刷新 mtime）淘汰最久未用的文件；0 表示不限制
+EVENT_CSV_CACHE_MAX_BYTES = int(os.getenv("EVENT_CSV_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+# 构建旁路文件时每批转换的行数，峰值内存只与批大小有关
+EVENT_CSV_CACHE_BATCH_ROWS = int(os.getenv("EVENT_CSV_CACHE_BATCH_ROWS", "50000"))
+# 流式分块处理的临时目录前缀（见 event_stream）：块文件用完即删，不写旁路文件
+CHUNK_DIR_PREFIX = "event_chunks_"
+
+_FIELDNAMES_META = b"event_csv.fieldnames"
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "builds": 0, "csv_reads": 0, "evictions": 0}
+
+
+def event_csv_path(event_dir):
+    """事件目录约定：<dir>/<dir名>.csv"""
+    event_dir = event_dir.rstrip("/")
+    return os.path.join(event_dir, os.path.basename(event_dir) + ".csv")
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "enabled": _cache_enabled(),
+        "pyarrow": pa is not None,
+        "dir": EVENT_CSV_CACHE_DIR,
+        "max_bytes": EVENT_CSV_CACHE_MAX_BYTES,
+    })
+    return stats
+
+
+def _cache_enabled():
+    return EVENT_CSV_CACHE_ENABLED and pa is not None
+
+
+def _sidecar_prefix(csv_file_path):
+    return hashlib.sha256(os.path.abspath(csv_file_path).encode("utf-8")).hexdigest()[:24]
+
+
+def _sidecar_path(csv_file_path, st):
+    return os.path.join(
+        EVENT_CSV_CACHE_DIR, f"{_sidecar_prefix(csv_file_path)}-{st.st_mtime_ns}-{st.st_size}.arrow"
+    )
+
+
+def _parse_csv(csv_file_path):
+    """读取事件csv，返回 (表头, 行列表)；兼容带 BOM 的 utf-8 文件"""
+    _count("csv_reads")
+    with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        return list(reader.fieldnames or []), rows
+
+
+def _iter_record_batches(reader, fieldnames, columns, batch_rows):
+    """把 csv.reader 的后续行按批转换为 RecordBatch；取值规则与 csv.DictReader 一致（重名列取最后一列、缺失为 None、跳过空行）"""
+    index = {name: position for position, name in enumerate(fieldnames)}
+    positions = [index[name] for name in columns]
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    batch = []
+    for row in reader:
+        if not row:
+            continue
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield _record_batch(batch, positions, schema)
+            batch = []
+    if batch:
+        yield _record_batch(batch, positions, schema)
+
+
+def _record_batch(rows, positions, schema):
+    arrays = [
+        pa.array([row[position] if position < len(row) else None for row in rows], type=pa.string())
+        for position in positions
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _write_sidecar(csv_file_path, path):
+    """
+    流式读取csv并逐批写入旁路文件，返回表头；所有列按字符串保存（与 csv.DictReader 的结果一致，不做类型推断）。
+    先写临时文件再替换。
+    """
+    _count("csv_reads")
+    os.makedirs(EVENT_CSV_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f)
+            fieldnames = next(reader, None) or []
+            columns = list(dict.fromkeys(fieldnames))
+            schema = pa.schema(
+                [(name, pa.string()) for name in columns],
+                metadata={_FIELDNAMES_META: json.dumps(fieldnames, ensure_ascii=False).encode("utf-8")},
+            )
+            # 不压缩，读取时可直接内存映射而无需解压
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    for batch in _iter_record_batches(reader, fieldnames, columns, max(1, EVENT_CSV_CACHE_BATCH_ROWS)):
+                        writer.write_batch(batch)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    # 同一csv的旧版本旁路文件已失效
+    prefix = os.path.basename(path).split("-", 1)[0] + "-"
+    for name in os.listdir(EVENT_CSV_CACHE_DIR):
+        if name.startswith(prefix) and name.endswith(".arrow") and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(EVENT_CSV_CACHE_DIR, name))
+            except OSError:
+                pass
+    _evict(keep=path)
+    return fieldnames
+
+
+def _evict(keep=None):
+    """旁路目录超过 EVENT_CSV_CACHE_MAX_BYTES 时按 mtime 从旧到新删除（命中时会刷新 mtime，即 LRU）"""
+    if EVENT_CSV_CACHE_MAX_BYTES <= 0:
+        return
+    entries = []
+    for name in os.listdir(EVENT_CSV_CACHE_DIR):
+        if not name.endswith(".arrow"):
+            continue
+        full_path = os.path.join(EVENT_CSV_CACHE_DIR, name)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, full_path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, full_path in sorted(entries):
+        if total <= EVENT_CSV_CACHE_MAX_BYTES:
+            break
+        if full_path == keep:
+            continue
+        # 其他进程正在映射的文件删除后映射仍然有效（POSIX），下次读取时重建
+        try:
+            os.remove(full_path)
+        except OSError:
+            continue
+        total -= size
+        _count("evictions")
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _is_chunk_file(csv_file_path):
+    return any(part.startswith(CHUNK_DIR_PREFIX) for part in os.path.abspath(csv_file_path).split(os.sep))
+
+
+def _open_sidecar(path):
+    """内存映射打开旁路文件，返回 (表头, Arrow 表)；列数据直接引用映射内存，不做拷贝"""
+    # 映射由表中的列缓冲区持有，表释放后自动解除映射
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    metadata = table.schema.metadata or {}
+    fieldnames = json.loads(metadata[_FIELDNAMES_META]) if _FIELDNAMES_META in metadata else table.column_names
+    return fieldnames, table
+
+
+def load_event_table(csv_file_path, build=True):
+    """
+    返回 (表头, Arrow 表)：旁路文件存在且与csv的 mtime/大小一致时直接内存映射读取，
+    否则（build=True 时）流式解析csv并写入旁路文件。未安装 pyarrow、关闭缓存、文件较小、
+    是分块处理的临时块文件或未命中且不构建时返回 None。
+    """
+    if not _cache_enabled() or _is_chunk_file(csv_file_path):
+        return None
+    st = os.stat(csv_file_path)
+    if st.st_size < EVENT_CSV_CACHE_MIN_BYTES:
+        return None
+    path = _sidecar_path(csv_file_path, st)
+    if os.path.exists(path):
+        try:
+            result = _open_sidecar(path)
+            _touch(path)
+            _count("hits")
+            return result
+        except (OSError, pa.ArrowInvalid):
+            pass
+    if not build:
+        return None
+    try:
+        _write_sidecar(csv_file_path, path)
+        _count("builds")
+        return _open_sidecar(path)
+    except (OSError, pa.ArrowInvalid) as exc:
+        print(f"[EventCsv] 写入旁路缓存失败，直接使用csv: {exc}", flush=True)
+        return None
+
+
+def read_event_rows(csv_file_path, build=True):
+    """
+    读取事件csv，返回 (表头, 行列表)；兼容带 BOM 的 utf-8 文件，有旁路缓存时不再解析csv。
+    build=False 时只复用已有的旁路文件，不为本次读取构建（之后不会再读同一文件的调用方使用）。
+    """
+    cached = load_event_table(csv_file_path, build=build)
+    if cached is None:
+        return _parse_csv(csv_file_path)
+    fieldnames, table = cached
+    return fieldnames, table.to_pylist()
+
+
+def read_event_header(csv_file_path):
+    """只读取表头（旁路缓存存在时不读取csv内容，不存在时也不为此构建）"""
+    cached = load_event_table(csv_file_path, build=False)
+    if cached is not None:
+        return cached[0]
+    with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f).fieldnames or [])
+
+
+def read_post_texts(csv_file_path, build=True):
+    """按行返回帖子正文（规则同 post_text）；有旁路缓存时只读取正文相关的列，build 同 read_event_rows"""
+    cached = load_event_table(csv_file_path, build=build)
+    if cached is None:
+        return list(_iter_post_texts(csv_file_path))
+    _, table = cached
+    return _table_post_texts(table)
+
+
+def _table_post_texts(table):
+    # 空字符串视为缺失，按 TEXT_COLUMNS 优先级逐列合并（向量化计算，不逐行构造字典）
+    columns = [
+        pc.if_else(pc.equal(table.column(name), ""), pa.scalar(None, pa.string()), table.column(name))
+        for name in TEXT_COLUMNS if name in table.column_names
+    ]
+    if not columns:
+        return [""] * table.num_rows
+    return pc.fill_null(pc.coalesce(*columns), "").to_pylist()
+
+
+def _iter_post_texts(csv_file_path):
+    """逐行解析csv并返回帖子正文，不保留整表"""
+    _count("csv_reads")
+    with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            yield post_text(row)
+
+
+def read_post_lengths(csv_file_path):
+    """按行返回帖子正文长度：已有旁路文件时只读正文列，否则逐行解析csv，不为此构建旁路文件"""
+    cached = load_event_table(csv_file_path, build=False)
+    if cached is None:
+        return [len(text) for text in _iter_post_texts(csv_file_path)]
+    _, table = cached
+    return [len(text) for text in _table_post_texts(table)]
+
+
+def post_text(row):
+    for column in TEXT_COLUMNS:
+        value = row.get(column)
+        if value:
+            return value
+    return ""
+
+
+def index_post_images(image_dir_path):
+    """帖子配图索引：images/{id}.jpg 以及 images/{id}-0.jpg 等多图，返回 {id: [路径, ...]}"""
+    images = {}
+    if not image_dir_path or not os.path.isdir(image_dir_path):
+        return images
+    for name in sorted(os.listdir(image_dir_path)):
+        stem = os.path.splitext(name)[0]
+        post_id = stem.split("-", 1)[0]
+        images.setdefault(post_id, []).append(os.path.join(image_dir_path, name))
+    return images
@@ -0,0 +1,536 @@
+import csv
+import hashlib
+import math
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from event_csv import CHUNK_DIR_PREFIX, event_csv_path, load_event_table
+
+# 流式分块处理：事件csv行数超过 EVENT_STREAM_ROWS 时，按 EVENT_CHUNK_ROWS 行切块逐块推理再合并部分结果，
+# 同一时刻只有一块数据在内存中，峰值内存与事件大小无关；设为 0 关闭
+EVENT_STREAM_ROWS = int(os.getenv("EVENT_STREAM_ROWS", "200000"))
+EVENT_CHUNK_ROWS = int(os.getenv("EVENT_CHUNK_ROWS", "50000"))
+# 分块csv写入的临时目录（默认系统临时目录），每块处理完立即删除
+EVENT_STREAM_TMP_DIR = os.getenv("EVENT_STREAM_TMP_DIR") or None
+
+# 数值字段合并规则（按键名精确匹配，规则对其下的嵌套字典同样生效）：
+# SUM 为计数，各块求和；MEAN 为比例/均值，按各块行数加权平均。
+# 表中没有的数值字段无法判断含义，取行数最多的一块并打印一次字段名，确认含义后补充到表中
+MERGE_SUM = "sum"
+MERGE_MEAN = "mean"
+FIELD_MERGE_RULES = {
+    # 情感
+    "emotion_counts": MERGE_SUM,
+    "count": MERGE_SUM,
+    "ratio": MERGE_MEAN,
+    "percentage": MERGE_MEAN,
+    # 话题分类
+    "probabilities": MERGE_MEAN,
+    "confidence": MERGE_MEAN,
+    # 价值观（人群画像另按名称对齐合并）
+    "value": MERGE_MEAN,
+    # 基础信息（地域分布、近七天帖子数、总用户数、词云另行处理）
+    "总帖子数": MERGE_SUM,
+    "总互动数": MERGE_SUM,
+    "总用户数": MERGE_SUM,
+    "有定位帖子占比": MERGE_MEAN,
+    "地域分布": MERGE_MEAN,
+    "近七天帖子数": MERGE_SUM,
+}
+# 预警等级从高到低，合并时按行数投票，票数相同时取更严重的等级
+SEVERITY_ORDER = ("严重", "中等", "轻微")
+TYPICAL_POSTS_SORT_KEY = "heat"
+# 帖子发布时间可能出现的列名（按优先级），都不存在时取第一个名称含“时间/日期/date/time”的列
+DATE_COLUMNS = ("发布时间", "datetime", "created_at", "时间", "日期", "date", "time")
+TREND_DAYS = 7
+# 发帖用户可能出现的列名（按优先级），用于跨块统计去重用户数
+USER_COLUMNS = ("用户id", "用户ID", "user_id", "uid", "用户昵称", "用户名", "昵称", "screen_name", "user_name", "author")
+# 去重用户数：不超过该数量时精确计数，超过后转为 HyperLogLog（2^14 个寄存器，标准误差约 0.8%），内存不随用户数增长
+DISTINCT_EXACT_LIMIT = 200000
+HLL_PRECISION = 14
+
+# 单个字段可能很长（正文、图片列表），放宽csv模块的默认字段长度限制
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def count_event_rows(csv_file_path):
+    """事件帖子数：有旁路缓存时直接读取行数，否则逐行流式计数（正确处理带换行的引号字段）"""
+    cached = load_event_table(csv_file_path, build=False)
+    if cached is not None:
+        return cached[1].num_rows
+    with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return sum(1 for _ in reader)
+
+
+def resolve_event_csv(path):
+    """事件级接口的路径参数可能是csv文件，也可能是事件目录（价值观服务），统一解析为事件csv"""
+    return event_csv_path(path) if os.path.isdir(path) else path
+
+
+def should_stream(csv_file_path):
+    if EVENT_STREAM_ROWS <= 0 or not os.path.isfile(csv_file_path):
+        return False
+    # 每行至少一个换行符：文件字节数不超过阈值时行数不可能超过阈值，无需计数
+    if os.path.getsize(csv_file_path) <= EVENT_STREAM_ROWS:
+        return False
+    return count_event_rows(csv_file_path) > EVENT_STREAM_ROWS
+
+
+def iter_event_chunks(csv_file_path, chunk_rows=EVENT_CHUNK_ROWS, on_row=None):
+    """
+    流式切分事件csv，依次产出 (块序号, 块csv路径, 行数)。每块保持事件目录结构
+    part_XXXX/<事件目录名>/<原csv文件名>（原目录下有 images 时以符号链接提供），
+    接收事件目录的服务可直接使用块csv所在目录。调用方处理完当前块后生成器才继续读取下一块，并删除上一块文件。
+    on_row(表头, 行) 在切分的同一遍读取中对每一行调用，用于需要整个文件视角的统计（如按日期计数）。
+    """
+    chunk_rows = max(1, chunk_rows)
+    tmp_dir = tempfile.mkdtemp(prefix=CHUNK_DIR_PREFIX, dir=EVENT_STREAM_TMP_DIR)
+
+    def open_chunk(index):
+        chunk_dir = os.path.join(tmp_dir, f"part_{index:04d}")
+        return (chunk_dir,) + _open_chunk_csv(chunk_dir, csv_file_path, header)
+
+    try:
+        with open(csv_file_path, "r", encoding="utf-8-sig", newline="") as source:
+            reader = csv.reader(source)
+            header = next(reader, None)
+            if header is None:
+                return
+            index, rows = 0, 0
+            chunk_dir, path, f, writer = open_chunk(index)
+            for row in reader:
+                if on_row is not None:
+                    on_row(header, row)
+                writer.writerow(row)
+                rows += 1
+                if rows >= chunk_rows:
+                    f.close()
+                    yield index, path, rows
+                    shutil.rmtree(chunk_dir, ignore_errors=True)
+                    index, rows = index + 1, 0
+                    chunk_dir, path, f, writer = open_chunk(index)
+            f.close()
+            if rows or index == 0:
+                yield index, path, rows
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _open_chunk_csv(chunk_dir, csv_file_path, header):
+    """在 chunk_dir 下按 <事件目录名>/<原csv文件名> 创建块csv并写入表头，原目录下的 images 以符号链接提供"""
+    source_dir = os.path.dirname(os.path.abspath(csv_file_path))
+    source_images = os.path.join(source_dir, "images")
+    event_dir = os.path.join(chunk_dir, os.path.basename(source_dir))
+    os.makedirs(event_dir)
+    if os.path.isdir(source_images):
+        os.symlink(source_images, os.path.join(event_dir, "images"))
+    path = os.path.join(event_dir, os.path.basename(csv_file_path))
+    f = open(path, "w", encoding="utf-8-sig", newline="")
+    writer = csv.writer(f)
+    writer.writerow(header)
+    return path, f, writer
+
+
+def run_chunked(csv_file_path, run_chunk, merge, chunk_rows=EVENT_CHUNK_ROWS, label="event", on_row=None):
+    """
+    逐块调用 run_chunk(块csv路径)，最后用 merge([(部分结果, 行数), ...]) 合并。
+    部分结果是事件级汇总（计数、分布、top-k 帖子），大小与块内行数无关，因此全部保留到最后一次合并。
+    on_row 见 iter_event_chunks。
+    """
+    parts = []
+    source_dir = os.path.dirname(os.path.abspath(csv_file_path))
+    for index, path, rows in iter_event_chunks(csv_file_path, chunk_rows, on_row):
+        print(f"[Stream] {label} 第 {index + 1} 块（{rows} 行）", flush=True)
+        # 块文件在处理完后即被删除，结果中指向块目录的路径改写为原事件目录下的对应路径
+        parts.append((relocate_paths(run_chunk(path), os.path.dirname(path), source_dir), rows))
+    if len(parts) == 1:
+        return parts[0][0]
+    return merge(parts)
+
+
+def relocate_paths(value, chunk_dir, source_dir):
+    """把结果中以块事件目录开头的路径字符串替换为原事件目录（递归处理字典、列表与元组）"""
+    if isinstance(value, str):
+        if value == chunk_dir or value.startswith(chunk_dir + os.sep):
+            return source_dir + value[len(chunk_dir):]
+        return value
+    if isinstance(value, dict):
+        return {key: relocate_paths(item, chunk_dir, source_dir) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(relocate_paths(item, chunk_dir, source_dir) for item in value)
+    return value
+
+
+def _parse_day(value):
+    """帖子时间 -> 日期；支持 2024-01-02[ 12:00:00]、2024/1/2、2024年1月2日 与 10/13 位时间戳，无法解析时返回 None"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if value.isdigit() and len(value) in (10, 13):
+        try:
+            return datetime.fromtimestamp(int(value[:10])).date()
+        except (OverflowError, OSError, ValueError):
+            return None
+    match = re.match(r"(\d{4})[-/年.](\d{1,2})[-/月.](\d{1,2})", value)
+    if match is None:
+        return None
+    try:
+        return date(*(int(part) for part in match.groups()))
+    except ValueError:
+        return None
+
+
+def _find_column(header, names, hints=()):
+    """按 names 的优先级精确匹配列名，都不存在时取第一个名称含 hints 中任一片段（不区分大小写）的列"""
+    for name in names:
+        if name in header:
+            return header.index(name)
+    for position, name in enumerate(header):
+        lowered = name.lower()
+        if any(hint in lowered for hint in hints):
+            return position
+    return None
+
+
+class _ColumnObserver:
+    """on_row 回调的基类：表头变化时重新定位所需的列，取出该列的值交给 observe"""
+
+    def __init__(self):
+        self._header = None
+        self._index = None
+
+    def _column_index(self, header):
+        raise NotImplementedError
+
+    def observe(self, value):
+        raise NotImplementedError
+
+    def __call__(self, header, row):
+        if header is not self._header:
+            self._header, self._index = header, self._column_index(header)
+        if self._index is None or self._index >= len(row):
+            return
+        self.observe(row[self._index])
+
+
+class PostDayCounter(_ColumnObserver):
+    """
+    作为 on_row 回调，在分块的同一遍读取中按发布日期统计整个文件的帖子数。
+    各块的“近七天”以块内最新日期为基准，不能逐键相加；合并时用本计数按整个文件的最新日期重新计算。
+    """
+
+    def __init__(self, date_columns=DATE_COLUMNS):
+        super().__init__()
+        self.date_columns = date_columns
+        self.days = Counter()
+
+    def _column_index(self, header):
+        return _find_column(header, self.date_columns, ("时间", "日期", "date", "time"))
+
+    def observe(self, value):
+        day = _parse_day(value)
+        if day is not None:
+            self.days[day] += 1
+
+    def trend(self, days=TREND_DAYS):
+        """以文件最新日期为第 days 天，返回 {"第1天": 最早一天的帖子数, ..., "第{days}天": 最新一天}；无可用日期时返回 None"""
+        if not self.days:
+            return None
+        latest = max(self.days)
+        return {f"第{i + 1}天": self.days.get(latest - timedelta(days=days - 1 - i), 0) for i in range(days)}
+
+
+class DistinctCounter:
+    """
+    去重计数：不超过 exact_limit 个不同值时精确计数（保存 64 位摘要），
+    超过后转为 HyperLogLog 估计，内存固定为 2^precision 字节
+    """
+
+    def __init__(self, exact_limit=DISTINCT_EXACT_LIMIT, precision=HLL_PRECISION):
+        self.exact_limit = exact_limit
+        self.precision = precision
+        self._exact = set()
+        self._registers = None
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, value):
+        h = self._hash(value)
+        if self._exact is not None:
+            self._exact.add(h)
+            if len(self._exact) > self.exact_limit:
+                self._registers = bytearray(1 << self.precision)
+                for item in self._exact:
+                    self._add_register(item)
+                self._exact = None
+            return
+        self._add_register(h)
+
+    def _add_register(self, h):
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    @property
+    def exact(self):
+        return self._exact is not None
+
+    def count(self):
+        if self._exact is not None:
+            return len(self._exact)
+        m = len(self._registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class UserCounter(_ColumnObserver):
+    """作为 on_row 回调统计整个文件的去重用户数；同一用户出现在多块时只计一次（各块的“总用户数”不能相加）"""
+
+    def __init__(self, user_columns=USER_COLUMNS):
+        super().__init__()
+        self.user_columns = user_columns
+        self.users = DistinctCounter()
+        self.found = False
+
+    def _column_index(self, header):
+        index = _find_column(header, self.user_columns)
+        self.found = self.found or index is not None
+        return index
+
+    def observe(self, value):
+        value = (value or "").strip()
+        if value:
+            self.users.add(value)
+
+    def count(self):
+        """无用户列时返回 None"""
+        return self.users.count() if self.found else None
+
+
+class RowSample:
+    """
+    作为 on_row 回调对整个文件做蓄水池抽样（最多 size 行，保持原有行序），
+    用于词云等无法由各块结果合并、需要在整个事件上重新计算的统计；内存只与 size 有关
+    """
+
+    def __init__(self, size=EVENT_CHUNK_ROWS, seed=0):
+        self.size = max(1, size)
+        self.header = None
+        self.seen = 0
+        self._rows = []
+        self._random = random.Random(seed)
+
+    def __call__(self, header, row):
+        self.header = header
+        if len(self._rows) < self.size:
+            self._rows.append((self.seen, row))
+        else:
+            slot = self._random.randint(0, self.seen)
+            if slot < self.size:
+                self._rows[slot] = (self.seen, row)
+        self.seen += 1
+
+    @contextmanager
+    def event_csv(self, csv_file_path):
+        """把样本写成与块文件相同结构的临时事件csv，退出时删除"""
+        tmp_dir = tempfile.mkdtemp(prefix=CHUNK_DIR_PREFIX, dir=EVENT_STREAM_TMP_DIR)
+        try:
+            path, f, writer = _open_chunk_csv(os.path.join(tmp_dir, "sample"), csv_file_path, self.header or [])
+            with f:
+                writer.writerows(row for _, row in sorted(self._rows, key=lambda item: item[0]))
+            yield path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def observe_rows(*observers):
+    """把多个 on_row 回调合并为一个，在同一遍读取中依次调用"""
+    def on_row(header, row):
+        for observer in observers:
+            observer(header, row)
+    return on_row
+
+
+# ---------- 部分结果合并 ----------
+
+_unknown_fields = set()
+
+
+def _largest(parts):
+    return max(parts, key=lambda part: part[1])[0]
+
+
+def merge_additive(parts, rule=None, key=None):
+    """
+    通用合并：字典按键递归合并，数值按 FIELD_MERGE_RULES 中该键（或上层键）的规则求和或按行数加权平均；
+    没有规则的数值以及列表、字符串等无法合并的值取行数最多的那一块的结果。
+    """
+    parts = [(value, weight) for value, weight in parts if value is not None]
+    if not parts:
+        return None
+    values = [value for value, _ in parts]
+    if all(isinstance(value, dict) for value in values):
+        merged = {}
+        for child in dict.fromkeys(k for value in values for k in value):
+            merged[child] = merge_additive(
+                [(value.get(child), weight) for value, weight in parts if child in value],
+                rule=FIELD_MERGE_RULES.get(child, rule),
+                key=child,
+            )
+        return merged
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        if rule == MERGE_MEAN:
+            total = sum(weight for _, weight in parts) or 1
+            return sum(value * weight for value, weight in parts) / total
+        if rule == MERGE_SUM:
+            return sum(values)
+        if key not in _unknown_fields:
+            _unknown_fields.add(key)
+            print(f"[Stream] 字段 {key!r} 没有合并规则，取行数最多的一块（可在 FIELD_MERGE_RULES 中补充）", flush=True)
+    return _largest(parts)
+
+
+def merge_emotion(parts):
+    """情感：各情绪计数求和，比例类字段按行数加权平均"""
+    return merge_additive(parts)
+
+
+def merge_yuqing(parts):
+    """话题分类：数值字段同通用合并；predicted_label 按各块行数投票，票数相同时取更严重的等级"""
+    merged = merge_additive(parts)
+    votes = {}
+    for value, weight in parts:
+        if isinstance(value, dict) and value.get("predicted_label"):
+            votes[value["predicted_label"]] = votes.get(value["predicted_label"], 0) + weight
+    if votes and isinstance(merged, dict):
+        merged["predicted_label"] = max(
+            votes,
+            key=lambda label: (votes[label], -SEVERITY_ORDER.index(label) if label in SEVERITY_ORDER else -len(SEVERITY_ORDER)),
+        )
+    return merged
+
+
+def _merge_typical_posts(parts):
+    """典型帖子：合并各块候选后按热度保留前 k 条（k 取各块中最长的列表长度）"""
+    lists = [value for value, _ in parts if isinstance(value, list)]
+    if not lists:
+        return _largest(parts)
+    k = max(len(value) for value in lists)
+    candidates = [post for value in lists for post in value]
+
+    def heat(post):
+        try:
+            return float(post.get(TYPICAL_POSTS_SORT_KEY, 0) or 0) if isinstance(post, dict) else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+
+    return sorted(candidates, key=heat, reverse=True)[:k]
+
+
+def _merge_named(parts, children_key=None):
+    """按 name 对齐的列表（人群画像及其价值观）：同名项的数值按行数加权合并"""
+    by_name = {}
+    for value, weight in parts:
+        for item in value or []:
+            if isinstance(item, dict):
+                by_name.setdefault(item.get("name", ""), []).append((item, weight))
+    merged = []
+    for name, items in by_name.items():
+        item = merge_additive([({k: v for k, v in it.items() if k != children_key}, w) for it, w in items], rule=MERGE_MEAN)
+        if children_key is not None:
+            item[children_key] = _merge_named([(it.get(children_key), w) for it, w in items])
+        merged.append(item)
+    return merged
+
+
+def _merge_value_event(parts):
+    merged = merge_additive(parts)
+    if not isinstance(merged, dict):
+        return merged
+    if any("typical_posts" in value for value, _ in parts):
+        # 结构为 [[帖子, ...]]
+        posts = [(value.get("typical_posts", [[]])[0] if value.get("typical_posts") else [], weight)
+                 for value, weight in parts]
+        merged["typical_posts"] = [_merge_typical_posts(posts)]
+    if any("population_composition" in value for value, _ in parts):
+        merged["population_composition"] = _merge_named(
+            [(value.get("population_composition"), weight) for value, weight in parts], "population_values"
+        )
+    return merged
+
+
+def merge_value(parts, source_path=None):
+    """
+    价值观：输出结构为 [文件路径, {事件名: {...}}]，典型帖子按热度取 top-k，人群画像按名称加权合并；
+    给出 source_path 时文件路径取原始输入路径（块文件合并后即被删除）
+    """
+    valid = [(value, weight) for value, weight in parts if isinstance(value, (list, tuple)) and len(value) >= 2]
+    if not valid:
+        return _largest(parts)
+    events = {}
+    for value, weight in valid:
+        if isinstance(value[1], dict):
+            for name, event in value[1].items():
+                events.setdefault(name, []).append((event, weight))
+    first = _largest(valid)
+    path = source_path if source_path is not None else first[0]
+    return [path, {name: _merge_value_event(items) for name, items in events.items()}] + list(first[2:])
+
+
+def merge_baseinfo(parts, day_counter=None, user_counter=None, word_cloud=None):
+    """
+    基础信息：帖子数、互动数求和，有定位帖子占比按行数加权平均。
+    地域分布是各省在有定位帖子中的占比，按各块有定位帖子数（行数 × 有定位帖子占比）加权。
+    近七天帖子数由 day_counter（整个文件按日期计数）重新计算；没有可用的日期列时无法对齐各块的日期，
+    取行数最多的一块的结果。
+    总用户数取 user_counter（整个文件的去重用户数）；没有用户列时只能取各块之和（同一用户会重复计数）。
+    词云编码取 word_cloud（由整个文件的抽样重新生成），未给出时取行数最多的一块。
+    """
+    merged = merge_additive(parts)
+    if not isinstance(merged, dict):
+        return merged
+    dicts = [(value, weight) for value, weight in parts if isinstance(value, dict)]
+    regions = [
+        (value["地域分布"], weight * _as_float(value.get("有定位帖子占比"), 1.0))
+        for value, weight in dicts if isinstance(value.get("地域分布"), dict)
+    ]
+    if regions:
+        merged["地域分布"] = merge_additive(regions, rule=MERGE_MEAN)
+    if "近七天帖子数" in merged:
+        trend = day_counter.trend(len(merged["近七天帖子数"]) or TREND_DAYS) if day_counter is not None else None
+        if trend is None:
+            print("[Stream] baseinfo: 未找到可解析的发布时间列，近七天帖子数取行数最多的一块", flush=True)
+            trend = _largest([(value.get("近七天帖子数"), weight) for value, weight in dicts])
+        merged["近七天帖子数"] = trend
+    if "总用户数" in merged:
+        users = user_counter.count() if user_counter is not None else None
+        if users is None:
+            print("[Stream] baseinfo: 未找到用户列，总用户数为各块之和（同一用户会重复计数）", flush=True)
+        else:
+            merged["总用户数"] = users
+    if word_cloud is not None:
+        merged["词云编码"] = word_cloud
+    return merged
+
+
+def _as_float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+_INITIAL_CAPACITY = 4096
+
+
+def post_content_hash(post):
+    """帖子内容摘要：正文 + 配图文件名与大小（内容变化后特征需要重新计算）"""
+    h = hashlib.sha1(post.text.encode("utf-8"))
+    for image_path in post.image_paths:
+        h.update(os.path.basename(image_path).encode("utf-8"))
+        try:
+            h.update(str(os.path.getsize(image_path)).encode())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+class FeatureStore:
+    """
+    持久化的帖子特征库：特征矩阵存放在 numpy memmap 文件中（float32），
+    sqlite 索引记录 (帖子id, 内容摘要) -> 行号。同一帖子内容变化后覆盖原有的行，
+    行数只随帖子数增长；容量不足时按倍数扩容。
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self.matrix_path = os.path.join(store_dir, "features.f32")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(store_dir, "index.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS features (post_id TEXT, content_hash TEXT, row INTEGER, "
+            "PRIMARY KEY (post_id, content_hash))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.commit()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self.dim = meta.get("dim")
+        self.rows = meta.get("rows", 0)
+        self.capacity = meta.get("capacity", 0)
+        self._matrix = None
+        if self.dim:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def _set_meta(self):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [("dim", self.dim), ("rows", self.rows), ("capacity", self.capacity)],
+        )
+
+    def _ensure_capacity(self, needed, dim):
+        if self.dim is None:
+            self.dim = int(dim)
+        elif dim != self.dim:
+            raise ValueError(f"feature dim changed: {self.dim} -> {dim}, clear {self.store_dir} first")
+        if needed <= self.capacity:
+            return
+        capacity = max(_INITIAL_CAPACITY, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        # 扩大文件后重新映射，已有行保持不变
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def get_or_compute(self, posts, compute_fn):
+        """
+        返回 posts 对应的特征矩阵：已入库的直接读取 memmap，
+        其余帖子一次性交给 compute_fn(posts) 计算后追加入库。
+        """
+        if not posts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        keys = [(post.id, post_content_hash(post)) for post in posts]
+        found = {}
+        cached = None
+        with self._lock:
+            for post_id, content_hash in keys:
+                row = self._conn.execute(
+                    "SELECT row FROM features WHERE post_id = ? AND content_hash = ?", (post_id, content_hash)
+                ).fetchone()
+                if row is not None:
+                    found[(post_id, content_hash)] = row[0]
+            indices = [i for i, key in enumerate(keys) if key in found]
+            # 行可能被同一帖子的新内容覆盖，命中的行在锁内读出
+            if indices:
+                cached = self._matrix[[found[keys[i]] for i in indices]]
+            missing = [i for i, key in enumerate(keys) if key not in found]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        computed = None
+        if missing:
+            computed = np.asarray(compute_fn([posts[i] for i in missing]), dtype=np.float32)
+            with self._lock:
+                self._store(keys, missing, computed)
+
+        dim = self.dim if computed is None else computed.shape[1]
+        result = np.empty((len(posts), dim), dtype=np.float32)
+        if cached is not None:
+            result[indices] = cached
+        if computed is not None:
+            result[missing] = computed
+        return result
+
+    def _store(self, keys, missing, computed):
+        """
+        写入新计算的特征：内容变化的帖子覆盖其原有的行（同一帖子只占一行），
+        新帖子追加到末尾。调用方持有 self._lock。
+        """
+        self._ensure_capacity(self.rows + len(missing), computed.shape[1])
+        rows = {}
+        appended = 0
+        for n, i in enumerate(missing):
+            post_id = keys[i][0]
+            if post_id not in rows:
+                row = self._conn.execute(
+                    "SELECT row FROM features WHERE post_id = ? ORDER BY row LIMIT 1", (post_id,)
+                ).fetchone()
+                if row is None:
+                    row = (self.rows + appended,)
+                    appended += 1
+                rows[post_id] = row[0]
+            self._matrix[rows[post_id]] = computed[n]
+        self._matrix.flush()
+        # 旧内容摘要的索引项随之失效；同一批内同一帖子出现多个版本时以最后写入的为准
+        latest = {keys[i][0]: keys[i][1] for i in missing}
+        self._conn.executemany("DELETE FROM features WHERE post_id = ?", [(post_id,) for post_id in latest])
+        self._conn.executemany(
+            "INSERT INTO features (post_id, content_hash, row) VALUES (?, ?, ?)",
+            [(post_id, content_hash, rows[post_id]) for post_id, content_hash in latest.items()],
+        )
+        self.rows += appended
+        self._set_meta()
+        self._conn.commit()
+
+    def stats(self):
+        return {
+            "path": self.store_dir,
+            "rows": self.rows,
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,8 +1,10 @@
 from flask import Flask, request, jsonify
+from werkzeug.serving import WSGIRequestHandler
 import os
 import json
 import sys
 import threading
+import time
 import importlib.util
 from typing import Any
 
@@ -24,6 +26,16 @@ if CLUSTER_MAIN_DIR not in sys.path:
     sys.path.append(CLUSTER_MAIN_DIR)
 
 from hotPrediction.hot_prediction import predict_single_event, init_predictor
+from result_cache import open_result_cache
+import ann_index
+import cluster_incremental
+from feature_store import FeatureStore
+from event_csv import cache_stats as csv_cache_stats
+from warmup import Warmup, sample_event
+
+# 事件级结果缓存：事件csv与图片未变化时跳过模型推理；升级模型后修改 MODEL_VERSION 使旧缓存失效
+result_cache = open_result_cache("hot_cluster")
+MODEL_VERSION = os.getenv("MODEL_VERSION", "1")
 
 # 模型单例与线程锁
 _predictor_lock = threading.Lock()
@@ -32,6 +44,20 @@ _predictor_instance = None
 _cluster_lock = threading.Lock()
 _cluster_module = None
 
+# 增量聚类：新帖子与已有簇质心的余弦相似度不低于该阈值时并入该簇，否则新建簇
+DEFAULT_SIMILARITY_THRESHOLD = 0.75
+# 持久化的帖子特征库（memmap），按帖子id与内容摘要复用历史特征，只为新帖子提取特征。
+# 仅用于增量聚类与 method="ann"；传统聚类（cluster_module.forward）在聚类模块内部提取特征，不经过特征库
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_store"))
+feature_store = FeatureStore(FEATURE_STORE_DIR)
+
+# method="ann" 时的近邻检索参数：每个帖子取 ANN_NEIGHBORS 个近邻，相似度不低于阈值的近邻连边后取连通分量成簇
+ANN_NEIGHBORS = 10
+ANN_BACKEND = os.getenv("ANN_BACKEND", "auto")
+
+# 同一数据根目录的增量聚类需要串行，避免并发改写状态与事件目录
+_incremental_lock = threading.Lock()
+
 
 def get_predictor():
     """获取全局唯一的预测器实例（懒加载）"""
@@ -75,6 +101,39 @@ def get_cluster_module():
     return _cluster_module
 
 
+def _embed_posts(cluster_module, posts):
+    """返回 (帖子数, 维度) 的特征矩阵：特征库中已有的直接复用，其余调用聚类模块的多模态特征提取"""
+    def extract(new_posts):
+        return cluster_module.extract_features(
+            texts=[post.text for post in new_posts],
+            image_paths=[post.image_paths for post in new_posts],
+        )
+
+    return feature_store.get_or_compute(posts, extract)
+
+
+def _run_ann_cluster(cluster_module, data_source_path, threshold, min_size, max_samples_per_event, neighbors, backend):
+    """基于近似最近邻图的聚类：特征（走特征库）-> kNN -> 相似度阈值连边 -> 连通分量"""
+    started = time.time()
+    posts = cluster_incremental.collect_posts(data_source_path)
+    if not posts:
+        raise ValueError(f"no posts found under: {data_source_path}")
+    features = _embed_posts(cluster_module, posts)
+    embedded = time.time()
+    neighbor_ids, sims = ann_index.knn(features, k=neighbors, backend=backend)
+    labels = ann_index.cluster_by_knn(neighbor_ids, sims, threshold, min_size=min_size)
+    clustered = time.time()
+    clusters = cluster_incremental.write_clusters(data_source_path, posts, features, labels, max_samples_per_event)
+    metrics = ann_index.cluster_metrics(features, labels)
+    metrics.update({
+        "backend": backend if backend != "auto" else ann_index.available_backends()[0],
+        "embed_seconds": round(embedded - started, 3),
+        "cluster_seconds": round(clustered - embedded, 3),
+        "total_seconds": round(time.time() - started, 3),
+    })
+    return {"clusters": clusters, "metrics": metrics, "labels": labels.tolist()}
+
+
 def _jsonable(obj: Any):
     if obj is None:
         return None
@@ -90,7 +149,35 @@ def _jsonable(obj: Any):
     return str(obj)
 
 
+def _warmup_hot(predictor):
+    sample = sample_event()
+    if sample is None:
+        return False
+    event_name, csv_file_path, image_dir_path = sample
+    predict_single_event(
+        event_name=event_name,
+        csv_file_path=csv_file_path,
+        image_dir_path=image_dir_path,
+        predictor=predictor,
+    )
+
+
+def _warmup_cluster(cluster_module):
+    # 聚类模块不提供特征提取时（只能用传统聚类）没有可预热的编码器，记为跳过试推理
+    if not hasattr(cluster_module, "extract_features"):
+        return False
+    # 特征提取与样例事件无关，用固定短文本触发文本编码器的 kernel 编译
+    cluster_module.extract_features(texts=["服务预热", "warmup"], image_paths=[[], []])
+
+
+# 启动预热：热度预测器与聚类特征提取器并行加载
+warmup = Warmup("hot_and_cluster")
+warmup.add("hot", get_predictor, _warmup_hot)
+warmup.add("cluster", get_cluster_module, _warmup_cluster)
+
 app = Flask(__name__)
+# gunicorn 等不执行 __main__ 的部署方式下，第一个请求到达时启动预热
+warmup.attach(app)
 
 # 内部固定参数（不使用环境变量）
 SERVICE_HOST = "0.0.0.0"
@@ -129,6 +216,14 @@ def run_hot_prediction():
         return jsonify({"ok": False, "error": f"image_dir_path not found: {image_dir_path}"}), 400
 
     try:
+        cache_key, cached = None, None
+        if result_cache is not None:
+            cache_key, cached = result_cache.lookup(
+                csv_file_path, image_dir_path, "hot", MODEL_VERSION, event_name=event_name
+            )
+        if cached is not None:
+            return jsonify({"ok": True, "event_name": event_name, "outputs": cached, "cached": True}), 200
+
         # 获取单例模型
         predictor = get_predictor()
 
@@ -141,6 +236,8 @@ def run_hot_prediction():
         )
         with open(output_json_path, "r", encoding="utf-8") as f:
             result_data = json.load(f)
+        if cache_key is not None:
+            result_cache.put(cache_key, "hot", result_data)
         response = {
             "ok": True,
             "event_name": event_name,
@@ -169,12 +266,65 @@ def run_cluster():
     use_prior = bool(payload.get("use_prior", True))
     max_samples_per_event = int(payload.get("max_samples_per_event", 1000))
     min_samples_per_event = int(payload.get("min_samples_per_event", 1))
+    incremental = bool(payload.get("incremental", False))
+    similarity_threshold = float(payload.get("similarity_threshold", DEFAULT_SIMILARITY_THRESHOLD))
 
     if data_source_path is not None and not os.path.exists(data_source_path):
         return jsonify({"ok": False, "error": f"data_source_path not found: {data_source_path}"}), 400
+    if incremental and not data_source_path:
+        return jsonify({"ok": False, "error": "incremental mode requires data_source_path"}), 400
 
     try:
         cluster_module = get_cluster_module()
+        if incremental:
+            if not hasattr(cluster_module, "extract_features"):
+                return jsonify({"ok": False, "error": "Cluster module missing extract_features(texts, image_paths), incremental mode unavailable; use the traditional method"}), 400
+
+            def full_forward():
+                return cluster_module.forward(
+                    data_source_path=data_source_path,
+                    use_saved=False,
+                    method=method,
+                    min_posts=min_posts,
+                    source_site=source_site,
+                    use_prior=use_prior,
+                    max_samples_per_event=max_samples_per_event,
+                    min_samples_per_event=min_samples_per_event,
+                )
+
+            with _incremental_lock:
+                clusters, affected, metrics = cluster_incremental.run_incremental(
+                    data_source_path,
+                    lambda posts: _embed_posts(cluster_module, posts),
+                    similarity_threshold,
+                    full_forward,
+                    max_samples_per_event,
+                )
+            outputs = {
+                "clusters": clusters,
+                "metrics": metrics,
+                "labels": None,
+                "affected_events": affected,
+            }
+            return jsonify({"ok": True, "outputs": outputs}), 200
+
+        if method == "ann":
+            if not data_source_path:
+                return jsonify({"ok": False, "error": "ann method requires data_source_path"}), 400
+            if not hasattr(cluster_module, "extract_features"):
+                return jsonify({"ok": False, "error": "Cluster module missing extract_features(texts, image_paths), ann method unavailable; use the traditional method"}), 400
+            with _incremental_lock:
+                outputs = _run_ann_cluster(
+                    cluster_module,
+                    data_source_path,
+                    similarity_threshold,
+                    max(min_posts, min_samples_per_event),
+                    max_samples_per_event,
+                    int(payload.get("ann_neighbors", ANN_NEIGHBORS)),
+                    payload.get("ann_backend", ANN_BACKEND),
+                )
+            return jsonify({"ok": True, "outputs": outputs}), 200
+
         result = cluster_module.forward(
             data_source_path=data_source_path,
             use_saved=use_saved,
@@ -203,8 +353,21 @@ def health():
         "status": "ok",
         "service": "hot_and_cluster",
         "root": SERVICE_ROOT,
+        "feature_store": feature_store.stats(),
+        "csv_cache": csv_cache_stats(),
+        "warmup": warmup.status(),
     })
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """就绪检查：模型预热完成前返回 503（/health 只表示进程存活）；model_versions 供编排服务构造结果缓存键"""
+    status = dict(warmup.status(), model_versions={"hot": MODEL_VERSION})
+    return jsonify(status), 200 if status["ready"] else 503
+
+
 if __name__ == "__main__":
+    # 使用 HTTP/1.1 以支持编排服务的 keep-alive 连接复用（werkzeug 默认为 HTTP/1.0，每次请求后断开）
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    warmup.start()
     app.run(host=SERVICE_HOST, port=SERVICE_PORT, debug=False)
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# 网关类错误：502/504 时下游可能已经处理了请求，只有幂等请求才重试
+RETRY_STATUS_CODES = (502, 504)
+
+
+def _is_connect_failure(exc):
+    """连接阶段失败（连接超时、连接被拒绝等），请求尚未发出，任何请求都可以安全重试"""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError):
+        return False
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def parse_pool_sizes(spec):
+    """解析 "localhost:8001=8,localhost:8003=4" 形式的按主机连接池大小配置"""
+    sizes = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item or "=" not in item:
+            continue
+        host, size = item.rsplit("=", 1)
+        sizes[host.strip()] = int(size)
+    return sizes
+
+
+class _HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+
+class PooledHttpClient:
+    """
+    按主机复用 keep-alive 连接的 HTTP 客户端。
+    每个 host:port 一个 requests.Session，连接池大小可单独配置；
+    连接阶段失败时按带抖动的指数退避重试；502/504 与请求发出后的连接错误只在 idempotent=True 时重试
+    （否则下游可能已处理，重发会重复执行）。retries 可覆盖单次调用的最大重试次数。
+    """
+
+    def __init__(self, pool_sizes=None, default_pool_size=10, max_retries=2, backoff_base=0.5, backoff_max=8.0):
+        self.pool_sizes = pool_sizes or {}
+        self.default_pool_size = default_pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sessions = {}
+        self._adapters = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                pool_size = self.pool_sizes.get(host, self.default_pool_size)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+                self._adapters[host] = adapter
+                self._stats[host] = _HostStats()
+            return session
+
+    def _backoff(self, attempt):
+        # full jitter：在 [0, min(上限, base * 2^attempt)] 内随机等待
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+
+    def post(self, url, idempotent=False, retries=None, **kwargs):
+        return self._request("POST", url, idempotent, retries, **kwargs)
+
+    def get(self, url, retries=None, **kwargs):
+        """GET 没有副作用，按幂等请求处理"""
+        return self._request("GET", url, True, retries, **kwargs)
+
+    def _request(self, method, url, idempotent, retries, **kwargs):
+        host = urlparse(url).netloc
+        session = self._session_for(host)
+        stats = self._stats[host]
+        max_retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            started = time.time()
+            try:
+                resp = session.request(method, url, **kwargs)
+            except requests.ConnectionError as exc:
+                self._record(stats, time.time() - started, error=True)
+                # 读取超时（ReadTimeout）不是 ConnectionError，直接抛出
+                if attempt >= max_retries or not (idempotent or _is_connect_failure(exc)):
+                    raise
+            except requests.RequestException:
+                self._record(stats, time.time() - started, error=True)
+                raise
+            else:
+                self._record(stats, time.time() - started, error=resp.status_code >= 500)
+                if not idempotent or resp.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    return resp
+                resp.close()
+            with self._lock:
+                stats.retries += 1
+            self._backoff(attempt)
+            attempt += 1
+
+    def _record(self, stats, latency, error=False):
+        with self._lock:
+            stats.requests += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if error:
+                stats.errors += 1
+
+    def stats(self):
+        """按主机返回请求数、重试数、延迟以及连接复用情况"""
+        result = {}
+        with self._lock:
+            for host, stats in self._stats.items():
+                adapter = self._adapters[host]
+                # urllib3 每新建一个连接 num_connections 加一，其余请求均复用了已有连接
+                pools = adapter.poolmanager.pools
+                new_connections = sum(getattr(pools[key], "num_connections", 0) for key in pools.keys())
+                result[host] = {
+                    "pool_size": self.pool_sizes.get(host, self.default_pool_size),
+                    "requests": stats.requests,
+                    "retries": stats.retries,
+                    "errors": stats.errors,
+                    "avg_latency": round(stats.total_latency / stats.requests, 4) if stats.requests else 0.0,
+                    "max_latency": round(stats.max_latency, 4),
+                    "new_connections": new_connections,
+                    "reused_connections": max(0, stats.requests - new_connections),
+                }
+        return result
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+
+class IngestBuffer:
+    """
+    入库缓冲：事件结果先放入缓冲区，攒满 max_batch 条或最早一条等待超过 max_wait 秒时，
+    整批 POST 到数据后台的批量入库接口（一次请求、一次事务），并把这批结果追加写入本地 jsonl 文件。
+    add() 返回该事件的入库结果 Future（result() 为 (是否成功, 错误信息)），事件只有在所在批次返回 2xx 后才算入库成功。
+    数据后台在一个事务内写入整批，返回 4xx 时整批未写入：改为逐个事件重新提交，只有不合法的事件失败。
+    请求异常或 5xx 时无法确定该批是否已提交，为避免重复入库不再重发，整批记为失败（结果仍保留在 jsonl 中）。
+    """
+
+    def __init__(self, http_client, url, max_batch=20, max_wait=5.0, timeout=60, archive_path=None):
+        self.http_client = http_client
+        self.url = url
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.timeout = timeout
+        self.archive_path = archive_path
+        self._lock = threading.Lock()
+        # 同一时刻只允许一个线程发送，保证批次按入队顺序入库
+        self._flush_lock = threading.Lock()
+        self._items = []
+        self._oldest = None
+        self.batches = 0
+        self.events = 0
+        self.failed_batches = 0
+        self.failed_events = 0
+        self._wakeup = threading.Event()
+        self._timer = threading.Thread(target=self._loop, name="ingest-buffer", daemon=True)
+        self._timer.start()
+
+    def add(self, event_name, formatted_result):
+        """放入缓冲区，返回入库结果 Future"""
+        future = Future()
+        with self._lock:
+            self._items.append((event_name, formatted_result, future))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._wakeup.set()
+            full = len(self._items) >= self.max_batch
+        if full:
+            self.flush()
+        return future
+
+    def _take(self):
+        with self._lock:
+            items, self._items = self._items, []
+            self._oldest = None
+            return items
+
+    def flush(self):
+        """立即发送缓冲区中的全部结果，返回本次发送的事件数"""
+        with self._flush_lock:
+            items = self._take()
+            if not items:
+                return 0
+            self._archive(items)
+            names = [name for name, _, _ in items]
+            status, error = self._post([result for _, result, _ in items])
+            if status is not None and 200 <= status < 300:
+                print(f"-----------{len(items)} 个事件数据加入数据库成功----------------")
+                outcomes = [(True, None)] * len(items)
+            elif status is not None and 400 <= status < 500 and len(items) > 1:
+                # 整批在事务中回滚，逐个重新提交，只让不合法的事件失败
+                print(f"Warning: batch ingest rejected ({error}), retrying one by one: {names}")
+                outcomes = []
+                for name, result, _ in items:
+                    single_status, single_error = self._post([result])
+                    ok = single_status is not None and 200 <= single_status < 300
+                    if not ok:
+                        print(f"Warning: ingest failed for {name}: {single_error}")
+                    outcomes.append((ok, None if ok else single_error))
+            else:
+                print(f"Warning: batch ingest failed, events: {names}")
+                outcomes = [(False, error)] * len(items)
+            failed = sum(1 for ok, _ in outcomes if not ok)
+            with self._lock:
+                self.batches += 1
+                self.events += len(items)
+                if failed:
+                    self.failed_batches += 1
+                    self.failed_events += failed
+            for (_, _, future), outcome in zip(items, outcomes):
+                future.set_result(outcome)
+            return len(items)
+
+    def _post(self, results):
+        """提交一批结果，返回 (HTTP 状态码, 错误信息)；请求异常时状态码为 None"""
+        try:
+            # 入库不是幂等操作（重发会重复写入），不做任何重试
+            response = self.http_client.post(self.url, json={"events": results}, timeout=self.timeout, retries=0)
+        except Exception as e:
+            print(f"Error posting {len(results)} events to {self.url}: {e}")
+            return None, f"入库请求失败: {e}"
+        print(f"POST {len(results)} events to {self.url} - Status: {response.status_code}")
+        if response.ok:
+            return response.status_code, None
+        print(f"Response: {response.text}")
+        return response.status_code, f"入库失败: HTTP {response.status_code} {response.text[:200]}"
+
+    def _archive(self, items):
+        if not self.archive_path:
+            return
+        try:
+            with open(self.archive_path, "a", encoding="utf-8") as f:
+                for name, result, _ in items:
+                    f.write(json.dumps({"event_name": name, "result": result}, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Error saving formatted results: {e}")
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    oldest = self._oldest
+                if oldest is None:
+                    break
+                remaining = oldest + self.max_wait - time.monotonic()
+                if remaining > 0:
+                    time.sleep(min(remaining, 0.5))
+                    continue
+                self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "url": self.url,
+                "max_batch": self.max_batch,
+                "max_wait": self.max_wait,
+                "buffered": len(self._items),
+                "batches": self.batches,
+                "events": self.events,
+                "failed_batches": self.failed_batches,
+                "failed_events": self.failed_events,
+            }
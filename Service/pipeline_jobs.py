@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+
+# 任务状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_INGESTING = "ingesting"  # 事件已处理完，结果在入库缓冲区中等待所在批次提交
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+STATUS_INTERRUPTED = "interrupted"  # 进程重启时仍未结束的任务，可恢复
+
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+
+class Job:
+    """一次 whole_service 运行的状态，所有修改都会立即落盘以便重启后恢复"""
+
+    def __init__(self, job_id, payload, state_path):
+        self.id = job_id
+        self.payload = payload
+        self.state_path = state_path
+        self.status = STATUS_PENDING
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # 聚类完成后记录事件目录，恢复时不再重新聚类
+        self.cluster_folder = None
+        self.cluster_elapsed = None
+        # 事件名 -> {"status", "elapsed", "error"}
+        self.events = {}
+        self._lock = threading.RLock()
+        self._cancel = threading.Event()
+
+    # ---------- 运行期更新（由 runner 调用） ----------
+
+    def mark_clustered(self, cluster_folder, elapsed, event_names):
+        """聚类完成：记录事件目录与本次需要处理的事件，恢复时不再重新聚类"""
+        with self._lock:
+            self.cluster_folder = cluster_folder
+            self.cluster_elapsed = round(elapsed, 2)
+            for name in event_names:
+                self.events.setdefault(name, {"status": STATUS_PENDING, "elapsed": None, "error": None})
+            self.save()
+
+    def pending_events(self):
+        """尚未成功处理的事件"""
+        with self._lock:
+            return [name for name, event in self.events.items() if event["status"] != STATUS_SUCCEEDED]
+
+    def update_event(self, name, outcome):
+        with self._lock:
+            self.events[name] = {
+                "status": outcome["status"],
+                "elapsed": outcome.get("elapsed"),
+                "error": outcome.get("error"),
+            }
+            self.save()
+
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    # ---------- 序列化 ----------
+
+    def progress(self):
+        counts = {}
+        for event in self.events.values():
+            counts[event["status"]] = counts.get(event["status"], 0) + 1
+        return {
+            "total_events": len(self.events),
+            "completed_events": counts.get(STATUS_SUCCEEDED, 0),
+            "failed_events": counts.get(STATUS_FAILED, 0),
+            "running_events": counts.get(STATUS_RUNNING, 0),
+            "ingesting_events": counts.get(STATUS_INGESTING, 0),
+        }
+
+    def to_dict(self, include_events=True):
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "payload": self.payload,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "cluster_folder": self.cluster_folder,
+                "cluster_elapsed": self.cluster_elapsed,
+                "progress": self.progress(),
+            }
+            if include_events:
+                data["events"] = dict(self.events)
+            return data
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_path)
+
+    @classmethod
+    def load(cls, state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        job = cls(data["job_id"], data.get("payload") or {}, state_path)
+        job.status = data.get("status", STATUS_PENDING)
+        job.error = data.get("error")
+        job.created_at = data.get("created_at", job.created_at)
+        job.started_at = data.get("started_at")
+        job.finished_at = data.get("finished_at")
+        job.cluster_folder = data.get("cluster_folder")
+        job.cluster_elapsed = data.get("cluster_elapsed")
+        job.events = data.get("events") or {}
+        # 上次运行中断时仍在处理或尚未确认入库的事件需要重跑
+        for event in job.events.values():
+            if event["status"] in (STATUS_RUNNING, STATUS_INGESTING):
+                event["status"] = STATUS_PENDING
+        return job
+
+
+class JobManager:
+    """
+    在后台线程中执行 whole_service 流程的任务管理器。
+    runner(job) 负责实际的聚类与事件处理，并通过 job 上的方法汇报进度。
+    """
+
+    def __init__(self, state_dir, runner, auto_resume=False):
+        self.state_dir = state_dir
+        self.runner = runner
+        self._jobs = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+        os.makedirs(state_dir, exist_ok=True)
+        self._load_jobs()
+        if auto_resume:
+            for job in list(self._jobs.values()):
+                if job.status == STATUS_INTERRUPTED:
+                    self.resume(job.id)
+
+    def _load_jobs(self):
+        for file_name in os.listdir(self.state_dir):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                job = Job.load(os.path.join(self.state_dir, file_name))
+            except (OSError, ValueError, KeyError) as exc:
+                print(f"[Jobs] Failed to load job state {file_name}: {exc}")
+                continue
+            if job.status not in FINISHED_STATUSES:
+                job.status = STATUS_INTERRUPTED
+                job.save()
+            self._jobs[job.id] = job
+
+    def submit(self, payload):
+        job_id = uuid.uuid4().hex
+        job = Job(job_id, payload, os.path.join(self.state_dir, f"{job_id}.json"))
+        job.save()
+        with self._lock:
+            self._jobs[job_id] = job
+            self._start(job)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        """请求取消：已在处理的事件会跑完，尚未开始的事件不再提交"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job._cancel.set()
+        with job._lock:
+            if job.status in (STATUS_PENDING, STATUS_INTERRUPTED):
+                job.status = STATUS_CANCELLED
+                job.finished_at = time.time()
+                job.save()
+        return job
+
+    def resume(self, job_id):
+        """恢复未成功结束的任务：跳过已完成的聚类与已成功的事件"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            thread = self._threads.get(job_id)
+            if thread is not None and thread.is_alive():
+                return job
+            if job.status == STATUS_SUCCEEDED:
+                return job
+            job._cancel.clear()
+            job.error = None
+            job.finished_at = None
+            job.status = STATUS_PENDING
+            job.save()
+            self._start(job)
+        return job
+
+    def _start(self, job):
+        """创建并登记任务线程；调用方持有 self._lock，并发的恢复请求不会为同一任务启动两个线程"""
+        thread = threading.Thread(target=self._run, args=(job,), name=f"job-{job.id}", daemon=True)
+        self._threads[job.id] = thread
+        thread.start()
+
+    def _run(self, job):
+        with job._lock:
+            if job.cancel_requested():
+                return
+            job.status = STATUS_RUNNING
+            job.started_at = time.time()
+            job.save()
+        try:
+            self.runner(job)
+            # runner 返回后仍在处理或等待入库的事件同样视为未成功，避免任务被误记为成功
+            failed = [
+                name for name, e in job.events.items()
+                if e["status"] in (STATUS_FAILED, STATUS_RUNNING, STATUS_INGESTING)
+            ]
+            if job.cancel_requested():
+                status, error = STATUS_CANCELLED, None
+            elif failed:
+                status, error = STATUS_FAILED, f"{len(failed)} 个事件处理失败"
+            else:
+                status, error = STATUS_SUCCEEDED, None
+        except Exception as exc:
+            traceback.print_exc()
+            status, error = STATUS_FAILED, str(exc)
+        with job._lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            job.save()
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 结果缓存配置（编排服务与各算法服务共用，每个进程单独一个 sqlite 文件）
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DIR = os.getenv(
+    "RESULT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "result_cache")
+)
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "1024"))
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class ResultCache:
+    """
+    以事件内容哈希为键的算法结果缓存（sqlite 存储，按总大小做 LRU 淘汰）。
+    键 = sha256(事件csv与图片内容, 服务名, 模型版本)，事件数据不变时直接复用结果。
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, service TEXT, value TEXT, size INTEGER, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+            # 单文件摘要按 (mtime, size) 记忆，避免每次重新读取未变化的大文件与图片
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_digests ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT)"
+            )
+            self._conn.commit()
+
+    # ---------- 键计算 ----------
+
+    def _file_digest(self, path):
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, digest FROM file_digests WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+            return row[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_digests (path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)",
+                (path, st.st_mtime_ns, st.st_size, digest),
+            )
+            self._conn.commit()
+        return digest
+
+    def event_digest(self, csv_file_path, image_dir_path=None):
+        """事件内容摘要：csv 文件 + images 目录下所有图片（按文件名排序）"""
+        if os.path.isdir(csv_file_path):
+            # 价值观服务传入的是事件目录：<dir>/<dir名>.csv 与 <dir>/images
+            event_dir = csv_file_path.rstrip("/")
+            csv_file_path = os.path.join(event_dir, os.path.basename(event_dir) + ".csv")
+            image_dir_path = image_dir_path or os.path.join(event_dir, "images")
+        h = hashlib.sha256()
+        h.update(self._file_digest(csv_file_path).encode())
+        if image_dir_path and os.path.isdir(image_dir_path):
+            for name in sorted(os.listdir(image_dir_path)):
+                image_path = os.path.join(image_dir_path, name)
+                if os.path.isfile(image_path):
+                    h.update(name.encode("utf-8"))
+                    h.update(self._file_digest(image_path).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def make_key(event_digest, service, model_version, event_name=None):
+        """输出中带事件名的服务应传入 event_name：内容相同、名称不同的事件不共用结果"""
+        material = f"{event_digest}|{service}|{model_version}"
+        if event_name is not None:
+            material += f"|{event_name}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    # ---------- 读写 ----------
+
+    def lookup(self, csv_file_path, image_dir_path, service, model_version, event_name=None):
+        """返回 (key, 缓存值)，未命中时缓存值为 None"""
+        key = self.make_key(self.event_digest(csv_file_path, image_dir_path), service, model_version, event_name)
+        return key, self.get(key)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, service, value):
+        text = json.dumps(value, ensure_ascii=False)
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, service, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, service, text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {
+            "enabled": True,
+            "path": self.path,
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def open_result_cache(name):
+    """按进程名称打开结果缓存；RESULT_CACHE_ENABLED=false 时返回 None"""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    return ResultCache(os.path.join(RESULT_CACHE_DIR, f"{name}.sqlite"), int(RESULT_CACHE_MAX_MB * 1024 * 1024))
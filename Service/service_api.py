@@ -1,7 +1,17 @@
 from flask import Flask, request, jsonify
+from werkzeug.serving import WSGIRequestHandler
 import os
 import requests
-import json
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from http_client import PooledHttpClient, parse_pool_sizes
+from ingest_buffer import IngestBuffer
+from pipeline_jobs import JobManager
+from result_cache import ResultCache, open_result_cache
 
 app = Flask(__name__)
 
@@ -14,10 +24,87 @@ SERVICE_URL_VALUE = os.getenv("SERVICE_URL_VALUE", "http://localhost:8003/value"
 SERVICE_URL_BASEINFO = os.getenv("SERVICE_URL_BASEINFO", "http://localhost:8003/baseinfo")
 REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "600"))
 
+# 共享的 keep-alive 连接池客户端（所有算法服务调用与入库请求共用）
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+# 按主机覆盖连接池大小，如 "localhost:8001=8,localhost:8003=4"
+HTTP_POOL_SIZES = parse_pool_sizes(os.getenv("HTTP_POOL_SIZES", ""))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+http_client = PooledHttpClient(
+    pool_sizes=HTTP_POOL_SIZES,
+    default_pool_size=HTTP_POOL_SIZE,
+    max_retries=HTTP_MAX_RETRIES,
+    backoff_base=HTTP_BACKOFF_SECONDS,
+)
+
+# 事件级服务（按原调用顺序）及其中文名称
+EVENT_SERVICE_LABELS = {
+    "hot": "热度预测",
+    "emotion": "情感预测",
+    "yuqing": "舆情预测",
+    "value": "价值观预测",
+    "baseinfo": "基础信息",
+}
+EVENT_SERVICE_KEYS = list(EVENT_SERVICE_LABELS)
+
+# 事件级服务并发调用（设为 false 则按顺序逐个调用）
+AGGREGATE_CONCURRENT = os.getenv("AGGREGATE_CONCURRENT", "true").lower() == "true"
+# 每个服务同时在途的请求数上限，如 SERVICE_CONCURRENCY_VALUE=1
+SERVICE_CONCURRENCY = {
+    key: int(os.getenv(f"SERVICE_CONCURRENCY_{key.upper()}", "2")) for key in EVENT_SERVICE_KEYS
+}
+_service_semaphores = {
+    key: threading.BoundedSemaphore(max(1, limit)) for key, limit in SERVICE_CONCURRENCY.items()
+}
 
-def call_service(url, payload):
+# 同时在途的事件数（/whole_service 可用 event_workers 覆盖）
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", "4"))
+# 每个下游服务进程（8001/8002/8003，按 host:port 区分）同时在途的请求数上限
+HOST_CONCURRENCY = int(os.getenv("HOST_CONCURRENCY", "3"))
+EVENT_SERVICE_URLS = {
+    "hot": SERVICE_URL_HOT,
+    "emotion": SERVICE_URL_EMOTION,
+    "yuqing": SERVICE_URL_YUQING,
+    "value": SERVICE_URL_VALUE,
+    "baseinfo": SERVICE_URL_BASEINFO,
+}
+EVENT_SERVICE_HOSTS = {key: urlparse(url).netloc for key, url in EVENT_SERVICE_URLS.items()}
+_host_semaphores = {
+    host: threading.BoundedSemaphore(max(1, HOST_CONCURRENCY)) for host in set(EVENT_SERVICE_HOSTS.values())
+}
+# 异步任务状态目录（每个任务一个json文件，用于查询进度与重启后恢复）
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs"))
+# 启动时自动恢复上次中断的任务
+JOB_AUTO_RESUME = os.getenv("JOB_AUTO_RESUME", "false").lower() == "true"
+
+# 事件级结果缓存：事件csv与图片未变化时不再调用算法服务
+result_cache = open_result_cache("orchestrator")
+# 缓存键中的模型版本取自各算法服务 GET /ready 返回的 model_versions（服务侧修改 MODEL_VERSION 即可使两侧缓存同时失效），
+# 每个服务进程的版本最多缓存 MODEL_VERSION_TTL_SECONDS 秒；取不到版本时该次调用不使用编排侧缓存
+MODEL_VERSION_TTL_SECONDS = float(os.getenv("MODEL_VERSION_TTL_SECONDS", "60"))
+_model_versions = {}
+_model_versions_lock = threading.Lock()
+
+# 事件结果批量入库：攒满 INGEST_BATCH_SIZE 个事件或等待超过 INGEST_FLUSH_SECONDS 秒后整批提交，
+# 每批结果同时追加到本地 formatted_results.jsonl（每行一个事件）
+INGEST_URL = os.getenv("INGEST_URL", "http://localhost:5000/api/addHotThings")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "20"))
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "5"))
+INGEST_TIMEOUT_SECONDS = float(os.getenv("INGEST_TIMEOUT_SECONDS", "60"))
+ingest_buffer = IngestBuffer(
+    http_client,
+    INGEST_URL,
+    max_batch=INGEST_BATCH_SIZE,
+    max_wait=INGEST_FLUSH_SECONDS,
+    timeout=INGEST_TIMEOUT_SECONDS,
+    archive_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "formatted_results.jsonl"),
+)
+
+
+def call_service(url, payload, idempotent=True):
     try:
-        resp = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT_SECONDS)
+        # 事件级算法服务对同一输入的结果相同（且有结果缓存），重复调用无副作用，可按幂等请求重试
+        resp = http_client.post(url, json=payload, timeout=REQUEST_TIMEOUT_SECONDS, idempotent=idempotent)
         try:
             data = resp.json()
         except ValueError:
@@ -50,7 +137,8 @@ def call_service_yuqing(payload):
 
 
 def call_service_cluster(payload):
-    return call_service(SERVICE_URL_CLUSTER, payload)
+    # 聚类会写入 cluster_events（增量聚类还会追加到已有事件），不能重发
+    return call_service(SERVICE_URL_CLUSTER, payload, idempotent=False)
 
 
 def call_service_hot(payload):
@@ -65,7 +153,7 @@ def call_service_baseinfo(payload):
     return call_service(SERVICE_URL_BASEINFO, payload)
 
 
-def Results_Service_CLUSTER(data_source_path, use_saved=False, method="traditional", min_posts=1, source_site="新浪微博", use_prior=True, max_samples_per_event=1000, min_samples_per_event=1):
+def Results_Service_CLUSTER(data_source_path, use_saved=False, method="traditional", min_posts=1, source_site="新浪微博", use_prior=True, max_samples_per_event=1000, min_samples_per_event=1, incremental=False, similarity_threshold=None):
     payload = {
         "data_source_path": data_source_path,
         "use_saved": use_saved,
@@ -75,7 +163,10 @@ def Results_Service_CLUSTER(data_source_path, use_saved=False, method="tradition
         "use_prior": use_prior,
         "max_samples_per_event": max_samples_per_event,
         "min_samples_per_event": min_samples_per_event,
+        "incremental": incremental,
     }
+    if similarity_threshold is not None:
+        payload["similarity_threshold"] = similarity_threshold
     required_fields = ["data_source_path"]
     missing = [k for k in required_fields if not payload.get(k)]
     if missing:
@@ -321,7 +412,8 @@ def extract_and_format_results(result_emo, result_yuqing, result_hot, result_val
             map_list.append({
                 "province_pid": pid,
                 "province_name": province_name,
-                "color": get_color_by_ratio(ratio)
+                "color": get_color_by_ratio(ratio),
+                "ratio": ratio
             })
 
         # 获取词云
@@ -366,14 +458,22 @@ def pre_service(payload):
     use_prior = bool(payload.get("use_prior", True))
     max_samples_per_event = int(payload.get("max_samples_per_event", 1000))
     min_samples_per_event = int(payload.get("min_samples_per_event", 1))
+    incremental = bool(payload.get("incremental", False))
+    similarity_threshold = payload.get("similarity_threshold")
 
     print("------------调用聚类服务------------")
-    result_cluster = Results_Service_CLUSTER(data_source_path, use_saved, method, min_posts, source_site, use_prior, max_samples_per_event, min_samples_per_event)
+    result_cluster = Results_Service_CLUSTER(data_source_path, use_saved, method, min_posts, source_site, use_prior, max_samples_per_event, min_samples_per_event, incremental, similarity_threshold)
     print("------------聚类完成------------")
     # print(result_cluster)
     if result_cluster.get("data"):
-        if result_cluster["data"]["outputs"].get("clusters"):
-            return jsonify({"INFO": "聚类服务调用成功","Cluster_folder":data_source_path+"/cluster_events"}), 200
+        outputs = result_cluster["data"]["outputs"]
+        if outputs.get("clusters"):
+            return jsonify({
+                "INFO": "聚类服务调用成功",
+                "Cluster_folder": data_source_path + "/cluster_events",
+                # 增量聚类只返回本次新增或追加了帖子的事件，全量聚类时为 None
+                "Affected_events": outputs.get("affected_events"),
+            }), 200
     return jsonify({"INFO": "聚类服务调用失败"}), 500
 
 @app.route("/whole_service", methods=["POST"])  # 等价入口，方便语义清晰
@@ -390,131 +490,274 @@ def ALL_SERVICE():
         print("---------开始获取事件级数据---------")
         
         folder = cluster_result.json["Cluster_folder"]
-        dir_names = [name for name in os.listdir(folder) if os.path.isdir(os.path.join(folder, name))]
-        
-        for dir_name in dir_names:
-            print(f"**********开始处理事件：{dir_name}*************")
-            event_res,stat_code = aggregate(dir_name,folder)
-            if stat_code != 200:
-                print(f"**********事件：{dir_name} 处理失败*************")
-                return jsonify({"INFO": "事件级数据处理失败"}), 500
-            else:
-                print(f"**********事件：{dir_name} 处理成功*************")
+        dir_names = list_event_dirs(folder, cluster_result.json.get("Affected_events"))
+        max_workers = int(payload.get("event_workers", EVENT_WORKERS))
+
+        outcomes = process_events(folder, dir_names, max_workers)
+        failed = {name: o["error"] for name, o in outcomes.items() if not o["ok"]}
+        if failed:
+            return jsonify({
+                "INFO": "部分事件级数据处理失败",
+                "total_events": len(outcomes),
+                "failed_events": failed,
+            }), 500
     
     return jsonify({"INFO": "所有事件及服务处理成功，数据已入库"}), 200
-            
 
 
+def list_event_dirs(folder, only=None):
+    """列出聚类输出的事件目录；only 不为 None 时只保留其中的事件（增量聚类受影响的事件）"""
+    dir_names = [name for name in os.listdir(folder) if os.path.isdir(os.path.join(folder, name))]
+    if only is not None:
+        only = set(only)
+        dir_names = [name for name in dir_names if name in only]
+    return dir_names
 
-def aggregate(event_name,file_path):
-    
-    csv_file_path = file_path +"/"+ event_name + "/" + event_name + ".csv"
-    image_dir_path = file_path + "/" +event_name + "/images"
-    file_path = file_path + "/" + event_name
 
-    all_right_flag = True
+def process_events(folder, dir_names, max_workers=None, on_event_update=None, should_stop=None):
+    """
+    以有界线程池并行处理多个事件目录。
+    单个事件失败只记录在返回结果中，不会中断其余事件。
+    on_event_update(name, outcome) 在事件开始与结束时回调；should_stop() 为真时不再开始新事件。
+    """
+    max_workers = max(1, max_workers or EVENT_WORKERS)
+
+    def _notify(dir_name, outcome):
+        if on_event_update is not None:
+            on_event_update(dir_name, outcome)
+
+    def _run(dir_name):
+        if should_stop is not None and should_stop():
+            return {"ok": False, "status": "pending", "error": None, "elapsed": None}
+        print(f"**********开始处理事件：{dir_name}*************")
+        _notify(dir_name, {"status": "running"})
+        started = time.time()
+        error = None
+        ingest = None
+        try:
+            with app.app_context():
+                _, stat_code, ingest = aggregate(dir_name, folder)
+            if stat_code != 200:
+                error = "事件级数据处理失败"
+        except Exception as exc:
+            traceback.print_exc()
+            error = str(exc)
+        if error:
+            print(f"**********事件：{dir_name} 处理失败*************")
+            outcome = {"ok": False, "status": "failed", "error": error, "elapsed": round(time.time() - started, 2)}
+            _notify(dir_name, outcome)
+            return outcome
+        print(f"**********事件：{dir_name} 处理成功，等待入库*************")
+        # 结果已放入入库缓冲区：所在批次提交成功后事件才记为成功，工作线程不等待，继续处理下一个事件
+        _notify(dir_name, {"status": "ingesting", "elapsed": round(time.time() - started, 2)})
+        ingest.add_done_callback(lambda f: _notify(dir_name, _ingest_outcome(f, started)))
+        return {"ingest": ingest, "started": started}
+
+    def _ingest_outcome(ingest, started):
+        ok, error = ingest.result()
+        return {
+            "ok": ok,
+            "status": "succeeded" if ok else "failed",
+            "error": error,
+            "elapsed": round(time.time() - started, 2),
+        }
 
-    # 调用服务
-    
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_run, name): name for name in dir_names}
+        for future in as_completed(futures):
+            outcomes[futures[future]] = future.result()
+    # 本轮事件全部处理完后立即提交剩余结果，不再等待定时刷新
+    ingest_buffer.flush()
+    for name, outcome in outcomes.items():
+        if "ingest" in outcome:
+            # 缓冲区定时线程可能正在提交包含该事件的批次，等待其完成。
+            # Future 先唤醒等待方再执行回调，返回前在此同步写入最终状态，调用方据此判断任务成败
+            outcomes[name] = _ingest_outcome(outcome["ingest"], outcome["started"])
+            _notify(name, outcomes[name])
+    return outcomes
+
+
+def run_job(job):
+    """后台任务的执行体：聚类（已完成则跳过）后处理尚未成功的事件"""
+    with app.app_context():
+        if not job.cluster_folder:
+            print(f"---------任务 {job.id}：开始聚类---------")
+            started = time.time()
+            cluster_result, state = pre_service(job.payload)
+            if state != 200:
+                body = cluster_result.json or {}
+                raise RuntimeError(body.get("error") or body.get("INFO") or "聚类服务调用失败")
+            folder = cluster_result.json["Cluster_folder"]
+            dir_names = list_event_dirs(folder, cluster_result.json.get("Affected_events"))
+            job.mark_clustered(folder, time.time() - started, dir_names)
+
+        folder = job.cluster_folder
+        pending = job.pending_events()
+        print(f"---------任务 {job.id}：待处理事件 {len(pending)}/{len(job.events)}---------")
+        max_workers = int(job.payload.get("event_workers", EVENT_WORKERS))
+        process_events(folder, pending, max_workers, on_event_update=job.update_event, should_stop=job.cancel_requested)
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """异步提交 whole_service 流程，立即返回任务ID"""
+    if not request.is_json:
+        return jsonify({"error": "request body must be JSON"}), 400
+    payload = request.get_json(silent=True) or {}
+    if not payload.get("data_source_path"):
+        return jsonify({
+            "error": "missing required fields: data_source_path",
+            "required": ["data_source_path"],
+        }), 400
+    job = job_manager.submit(payload)
+    return jsonify({"job_id": job.id, "status": job.status}), 202
 
 
-    print("***************************************")
-    print("------------调用热度预测服务------------")
-    result_hot = Results_Service("hot", event_name, csv_file_path, image_dir_path)
-    print(result_hot)
-    if result_hot["status_code"] != 200:
-        print("--------------热度预测服务调用失败--------------")
-        all_right_flag = False
-    else:
-        print("--------------热度预测服务调用成功--------------")
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": [job.to_dict(include_events=False) for job in job_manager.list()]})
 
 
-        
-    print("------------调用情感预测服务------------")
-    result_emo = Results_Service("emotion", event_name, csv_file_path, image_dir_path)
-    if result_emo["status_code"] != 200:
-        print("--------------情感预测服务调用失败--------------")
-        all_right_flag = False
-    else:
-        print("--------------情感预测服务调用成功--------------")
-    
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"job not found: {job_id}"}), 404
+    return jsonify(job.to_dict())
 
 
-    print("***************************************")
-    print("------------调用舆情预测服务------------")
-    result_yuqing = Results_Service("yuqing", event_name, csv_file_path, image_dir_path)
-    if result_yuqing["status_code"] != 200:
-        print("--------------舆情预测服务调用失败--------------")
-        all_right_flag = False
-    else:
-        print("--------------舆情预测服务调用成功--------------")
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"job not found: {job_id}"}), 404
+    return jsonify({"job_id": job.id, "status": job.status, "cancel_requested": True})
 
 
+@app.route("/jobs/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    job = job_manager.resume(job_id)
+    if job is None:
+        return jsonify({"error": f"job not found: {job_id}"}), 404
+    return jsonify({"job_id": job.id, "status": job.status}), 202
 
 
-    print("***************************************")
-    print("------------调用价值观预测服务------------")
-    result_value = Results_Service("value", event_name, file_path, image_dir_path)
-    if result_value["status_code"] != 200:
-        print("--------------价值观预测服务调用失败--------------")
-        all_right_flag = False
+def _service_model_version(service_key):
+    """从服务的 GET /ready 读取该服务当前的模型版本（未就绪时的 503 响应同样带有版本），失败时返回 None"""
+    host = EVENT_SERVICE_HOSTS[service_key]
+    now = time.monotonic()
+    with _model_versions_lock:
+        entry = _model_versions.get(host)
+    if entry is None or now - entry[0] > MODEL_VERSION_TTL_SECONDS:
+        scheme = urlparse(EVENT_SERVICE_URLS[service_key]).scheme or "http"
+        try:
+            resp = http_client.get(f"{scheme}://{host}/ready", timeout=5)
+            versions = (resp.json() or {}).get("model_versions") or {}
+        except (requests.RequestException, ValueError, AttributeError) as exc:
+            print(f"Warning: cannot read model versions from {host}: {exc}")
+            return None
+        entry = (now, versions)
+        with _model_versions_lock:
+            _model_versions[host] = entry
+    version = entry[1].get(service_key)
+    return None if version is None else str(version)
+
+
+def _call_event_service(service_key, event_name, path, image_dir_path, event_digest=None):
+    """在该服务的并发配额内调用单个事件级服务，事件内容未变化时直接返回缓存结果"""
+    label = EVENT_SERVICE_LABELS[service_key]
+    cache_key = None
+    model_version = _service_model_version(service_key) if event_digest is not None else None
+    if model_version is not None:
+        # 结果中带有事件名，内容相同、名称不同的事件不能共用缓存
+        cache_key = ResultCache.make_key(event_digest, service_key, model_version, event_name)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            print(f"--------------{label}服务命中结果缓存--------------")
+            return cached
+    # 先取服务配额再取下游进程配额，所有线程加锁顺序一致
+    with _service_semaphores[service_key], _host_semaphores[EVENT_SERVICE_HOSTS[service_key]]:
+        print(f"------------调用{label}服务------------")
+        # 工作线程中没有应用上下文，Results_Service 的参数错误分支需要 jsonify
+        with app.app_context():
+            result = Results_Service(service_key, event_name, path, image_dir_path)
+    if result["status_code"] != 200:
+        print(f"--------------{label}服务调用失败--------------")
     else:
-        print("--------------价值观预测服务调用成功--------------")
+        print(f"--------------{label}服务调用成功--------------")
+        if cache_key is not None:
+            result_cache.put(cache_key, service_key, result)
+    return result
+
+
+def aggregate(event_name,file_path):
+    
+    csv_file_path = file_path +"/"+ event_name + "/" + event_name + ".csv"
+    image_dir_path = file_path + "/" +event_name + "/images"
+    file_path = file_path + "/" + event_name
 
+    # 价值观服务接收事件目录，其余服务接收事件csv
+    service_paths = {
+        "hot": csv_file_path,
+        "emotion": csv_file_path,
+        "yuqing": csv_file_path,
+        "value": file_path,
+        "baseinfo": csv_file_path,
+    }
 
+    # 事件内容摘要，五个服务共用，用于查询结果缓存
+    event_digest = None
+    if result_cache is not None:
+        try:
+            event_digest = result_cache.event_digest(csv_file_path, image_dir_path)
+        except OSError as e:
+            print(f"Error hashing event {event_name}: {e}")
 
+    # 调用服务：五个服务互不依赖，默认并发发出，单事件耗时约等于最慢的服务
     print("***************************************")
-    print("------------调用基础信息服务------------")
-    result_baseinfo = Results_Service("baseinfo", event_name, csv_file_path, image_dir_path)
-    if result_baseinfo["status_code"] != 200:
-        print("--------------基础信息服务调用失败--------------")
-        all_right_flag = False
+    results = {}
+    if AGGREGATE_CONCURRENT:
+        with ThreadPoolExecutor(max_workers=len(EVENT_SERVICE_KEYS)) as executor:
+            futures = {
+                key: executor.submit(
+                    _call_event_service, key, event_name, service_paths[key], image_dir_path, event_digest
+                )
+                for key in EVENT_SERVICE_KEYS
+            }
+            for key, future in futures.items():
+                results[key] = future.result()
     else:
-        print("--------------基础信息服务调用成功--------------")
+        for key in EVENT_SERVICE_KEYS:
+            results[key] = _call_event_service(key, event_name, service_paths[key], image_dir_path, event_digest)
     print("***************************************")
 
+    result_hot = results["hot"]
+    result_emo = results["emotion"]
+    result_yuqing = results["yuqing"]
+    result_value = results["value"]
+    result_baseinfo = results["baseinfo"]
+    all_right_flag = all(r["status_code"] == 200 for r in results.values())
+
     if all_right_flag == False:
         print("-----------事件级数据处理失败-----------")
-        return jsonify({"INFO": "事件级数据处理失败"}), 500
+        return jsonify({"INFO": "事件级数据处理失败"}), 500, None
     else:
         print("-----------事件级数据处理成功-----------")
-    # 保存结果到本地json文件
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-
     # 整理并提取结果
     formatted_result = extract_and_format_results(
         result_emo, result_yuqing, result_hot, result_value, result_baseinfo
     )
 
-    # 保存整理后的结果
-    try:
-        formatted_save_path = os.path.join(current_dir, "formatted_results.json")
-        with open(formatted_save_path, "w", encoding="utf-8") as f:
-            json.dump(formatted_result, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Error saving formatted results: {e}")
+    # 整理失败的结果会使整批入库校验失败，单独跳过
+    if "error" in formatted_result:
+        print(f"Warning: skip ingesting {event_name}: {formatted_result['error']}")
+        return jsonify({"INFO": "事件级数据整理失败"}), 500, None
 
-    # 自动POST结果到本地端口8000/addHotThing
-    
-    try:
-        add_hot_thing_url = "http://localhost:5000/api/addHotThing"
-        post_response = requests.post(
-            add_hot_thing_url, 
-            json=formatted_result, 
-            timeout=30
-        )
-        print(f"POST to {add_hot_thing_url} - Status: {post_response.status_code}")
-        if not post_response.ok:
-            print(f"Warning: POST to addHotThing failed with status {post_response.status_code}")
-            print(f"Response: {post_response.text}")
-        else:
-            print("-----------事件级数据加入数据库成功----------------")
-    except requests.RequestException as e:
-        print(f"Error posting to addHotThing: {e}")
-        # 继续执行，不影响主流程
-
-    return jsonify({"INFO": "事件级数据处理成功"}), 200
+    # 放入入库缓冲区，由缓冲区按批保存到本地并POST到数据后台；返回入库结果 Future，由调用方确认是否入库成功
+    ingest = ingest_buffer.add(event_name, formatted_result)
+
+    return jsonify({"INFO": "事件级数据处理成功"}), 200, ingest
 
 
 @app.route("/health", methods=["GET"]) 
@@ -526,8 +769,33 @@ def health():
     })
 
 
+@app.route("/http_stats", methods=["GET"])
+def http_stats():
+    """各下游主机的请求数、重试、延迟与连接复用统计"""
+    return jsonify(http_client.stats())
+
+
+@app.route("/ingest_stats", methods=["GET"])
+def ingest_stats():
+    """批量入库的批次数、事件数与失败统计"""
+    return jsonify(ingest_buffer.stats())
+
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """事件级结果缓存的条目数、占用大小与命中统计"""
+    if result_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(result_cache.stats())
+
+
+# 放在模块末尾创建：自动恢复的任务线程会立即用到上面定义的函数
+job_manager = JobManager(JOB_STATE_DIR, run_job, auto_resume=JOB_AUTO_RESUME)
+
+
 if __name__ == "__main__":
     host = os.getenv("FLASK_HOST", "0.0.0.0")
     port = int(os.getenv("FLASK_PORT", "8080"))
     debug = os.getenv("FLASK_DEBUG", "false").lower() == "true"
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(host=host, port=port, debug=debug) 
@@ -0,0 +1,162 @@
+import csv
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_stream  # noqa: E402
+from event_stream import (  # noqa: E402
+    DistinctCounter,
+    PostDayCounter,
+    RowSample,
+    UserCounter,
+    merge_additive,
+    merge_baseinfo,
+    merge_value,
+    observe_rows,
+    run_chunked,
+)
+
+
+def _write_event(tmp_path, rows, header=("id", "发布时间", "微博正文")):
+    event_dir = tmp_path / "event"
+    event_dir.mkdir()
+    path = event_dir / "event.csv"
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def _chunk_trend(chunk_csv):
+    """模拟基础信息模块：近七天以块内最新日期为基准"""
+    counter = PostDayCounter()
+    with open(chunk_csv, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    for row in rows:
+        counter(header, row)
+    return {"总帖子数": len(rows), "近七天帖子数": counter.trend()}
+
+
+def test_parse_day_formats():
+    assert event_stream._parse_day("2024-03-05 12:00:00") == date(2024, 3, 5)
+    assert event_stream._parse_day("2024/3/5") == date(2024, 3, 5)
+    assert event_stream._parse_day("2024年3月5日 08:00") == date(2024, 3, 5)
+    assert event_stream._parse_day("") is None
+    assert event_stream._parse_day("昨天") is None
+
+
+def test_trend_is_relative_to_latest_date_of_whole_file(tmp_path):
+    # 前一块都是 3 月 1 日，后一块都是 3 月 10 日：逐键相加会把两块的“第7天”叠在一起
+    rows = [[i, "2024-03-01 10:00:00", "a"] for i in range(4)]
+    rows += [[i, "2024-03-10 10:00:00", "b"] for i in range(4, 8)]
+    rows += [[8, "2024-03-09 10:00:00", "c"]]
+    csv_file_path = _write_event(tmp_path, rows)
+
+    counter = PostDayCounter()
+    merged = run_chunked(
+        csv_file_path, _chunk_trend, lambda parts: merge_baseinfo(parts, counter), chunk_rows=4, on_row=counter
+    )
+
+    assert merged["总帖子数"] == 9
+    assert merged["近七天帖子数"] == {
+        "第1天": 0, "第2天": 0, "第3天": 0, "第4天": 0, "第5天": 0, "第6天": 1, "第7天": 4,
+    }
+
+
+def test_trend_falls_back_to_largest_chunk_without_date_column():
+    parts = [
+        ({"总帖子数": 3, "近七天帖子数": {"第1天": 1, "第2天": 2}}, 3),
+        ({"总帖子数": 5, "近七天帖子数": {"第1天": 4, "第2天": 1}}, 5),
+    ]
+    merged = merge_baseinfo(parts, PostDayCounter())
+    assert merged["总帖子数"] == 8
+    assert merged["近七天帖子数"] == {"第1天": 4, "第2天": 1}
+
+
+def test_region_share_is_weighted_by_located_posts():
+    # 块 A：100 行、10% 有定位，全部在北京；块 B：100 行、90% 有定位，全部在上海
+    parts = [
+        ({"总帖子数": 100, "有定位帖子占比": 0.1, "地域分布": {"北京": 1.0, "上海": 0.0}}, 100),
+        ({"总帖子数": 100, "有定位帖子占比": 0.9, "地域分布": {"北京": 0.0, "上海": 1.0}}, 100),
+    ]
+    merged = merge_baseinfo(parts)
+    assert merged["有定位帖子占比"] == 0.5
+    assert abs(merged["地域分布"]["北京"] - 0.1) < 1e-9
+    assert abs(merged["地域分布"]["上海"] - 0.9) < 1e-9
+
+
+def test_value_paths_point_at_source_event(tmp_path):
+    rows = [[i, "2024-03-01", "a"] for i in range(5)]
+    csv_file_path = _write_event(tmp_path, rows)
+    event_dir = os.path.dirname(csv_file_path)
+
+    def run_value(chunk_csv):
+        chunk_dir = os.path.dirname(chunk_csv)
+        posts = [{"heat": 1, "image": os.path.join(chunk_dir, "images", "1.jpg")}]
+        return [chunk_dir, {"event": {"typical_posts": [posts]}}]
+
+    merged = run_chunked(
+        csv_file_path, run_value, lambda parts: merge_value(parts, source_path=event_dir), chunk_rows=2
+    )
+
+    assert merged[0] == event_dir
+    assert merged[1]["event"]["typical_posts"][0][0]["image"] == os.path.join(event_dir, "images", "1.jpg")
+
+
+def test_total_users_are_deduplicated_across_chunks(tmp_path):
+    # 同一用户在两块中都发过帖：逐块相加会得到 4
+    rows = [[0, "2024-03-01", "a", "u1"], [1, "2024-03-01", "b", "u2"],
+            [2, "2024-03-02", "c", "u1"], [3, "2024-03-02", "d", "u2"]]
+    csv_file_path = _write_event(tmp_path, rows, header=("id", "发布时间", "微博正文", "用户id"))
+
+    def run_chunk(chunk_csv):
+        with open(chunk_csv, encoding="utf-8-sig", newline="") as f:
+            chunk_rows = list(csv.DictReader(f))
+        return {"总帖子数": len(chunk_rows), "总用户数": len({row["用户id"] for row in chunk_rows})}
+
+    users = UserCounter()
+    merged = run_chunked(csv_file_path, run_chunk, lambda parts: merge_baseinfo(parts, user_counter=users),
+                         chunk_rows=2, on_row=users)
+    assert merged == {"总帖子数": 4, "总用户数": 2}
+
+
+def test_distinct_counter_switches_to_estimate():
+    counter = DistinctCounter(exact_limit=1000)
+    for i in range(20000):
+        counter.add(f"user{i % 10000}")
+    assert not counter.exact
+    assert abs(counter.count() - 10000) < 500
+
+
+def test_word_cloud_comes_from_whole_file_sample(tmp_path):
+    rows = [[i, "2024-03-01", f"词{i}"] for i in range(10)]
+    csv_file_path = _write_event(tmp_path, rows)
+    sample = RowSample(size=4)
+    seen = []
+
+    def merge(parts):
+        with sample.event_csv(csv_file_path) as sample_csv:
+            assert os.path.basename(sample_csv) == os.path.basename(csv_file_path)
+            with open(sample_csv, encoding="utf-8-sig", newline="") as f:
+                seen.extend(row["id"] for row in csv.DictReader(f))
+        return merge_baseinfo(parts, word_cloud="cloud-of-sample")
+
+    merged = run_chunked(csv_file_path, lambda path: {"总帖子数": 1, "词云编码": path}, merge,
+                         chunk_rows=3, on_row=observe_rows(sample))
+    assert merged["词云编码"] == "cloud-of-sample"
+    # 样本覆盖整个文件而非单独一块，且保持原有行序
+    assert len(seen) == 4 and seen == sorted(seen, key=int)
+    assert sample.seen == 10
+
+
+def test_numbers_without_a_rule_are_not_summed():
+    parts = [({"emotion_counts": {"anger": 2}, "unknown_score": 0.2}, 1),
+             ({"emotion_counts": {"anger": 3}, "unknown_score": 0.9}, 3)]
+    merged = merge_additive(parts)
+    assert merged["emotion_counts"] == {"anger": 5}
+    assert merged["unknown_score"] == 0.9
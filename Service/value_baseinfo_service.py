@@ -1,9 +1,30 @@
 from flask import Flask, request, jsonify
+from werkzeug.serving import WSGIRequestHandler
 import os
 import sys
 import threading
 import json
 import traceback
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import baseinfo_worker
+from result_cache import open_result_cache
+from warmup import Warmup, sample_event
+from event_stream import (
+    PostDayCounter,
+    RowSample,
+    UserCounter,
+    merge_baseinfo,
+    merge_value,
+    observe_rows,
+    resolve_event_csv,
+    run_chunked,
+    should_stream,
+)
 
 # 仅在GPU 3上加载模型 (参考其他服务)
 os.environ["CUDA_VISIBLE_DEVICES"] = "2"
@@ -18,17 +39,24 @@ if os.path.exists(WORK_DIR):
 if WORK_DIR not in sys.path:
     sys.path.append(WORK_DIR)
 
+# 以脚本方式启动时，基础信息进程池的 spawn 子进程会以 __mp_main__ 重新导入本模块；
+# 子进程只运行 baseinfo_worker 中的函数，跳过模型模块导入与结果缓存等开销较大的初始化
+_IS_POOL_CHILD = multiprocessing.parent_process() is not None
+
 # 导入API模块
 _import_error_message = None
-try:
-    import predict_human_value_api
-    import static_analyize_api
-    print("[Service] Modules imported successfully.")
-except ImportError as e:
-    _import_error_message = str(e)
-    print(f"[Service] Error importing modules: {e}")
-    predict_human_value_api = None
-    static_analyize_api = None
+predict_human_value_api = None
+static_analyize_api = None
+if not _IS_POOL_CHILD:
+    try:
+        import predict_human_value_api
+        import static_analyize_api
+        print("[Service] Modules imported successfully.")
+    except ImportError as e:
+        _import_error_message = str(e)
+        print(f"[Service] Error importing modules: {e}")
+        predict_human_value_api = None
+        static_analyize_api = None
 
 app = Flask(__name__)
 
@@ -36,40 +64,213 @@ app = Flask(__name__)
 SERVICE_HOST = "0.0.0.0"
 SERVICE_PORT = 8003
 
-# 初始化状态
+# 事件级结果缓存：事件csv与图片未变化时跳过模型推理；升级模型后修改 MODEL_VERSION 使旧缓存失效
+result_cache = open_result_cache("value_baseinfo") if not _IS_POOL_CHILD else None
+MODEL_VERSION = os.getenv("MODEL_VERSION", "1")
+
+# 初始化状态：两个子服务各自独立初始化，已初始化后的请求不再加锁
 _value_initialized = False
 _baseinfo_initialized = False
-_init_lock = threading.Lock()
-
-def ensure_initialized():
-    """确保模型/服务已初始化"""
-    global _value_initialized, _baseinfo_initialized
-    with _init_lock:
-        if not _value_initialized:
-            if predict_human_value_api:
-                print("[Service] Initializing predict_human_value_api...")
-                try:
-                    predict_human_value_api.init()
-                    _value_initialized = True
-                    print("[Service] predict_human_value_api initialized.")
-                except Exception as e:
-                    print(f"[Service] Failed to initialize predict_human_value_api: {e}")
-                    traceback.print_exc()
-        
-        if not _baseinfo_initialized:
-            if static_analyize_api:
-                print("[Service] Initializing static_analyize_api...")
+_value_lock = threading.Lock()
+_baseinfo_lock = threading.Lock()
+
+# 基础信息统计在独立的进程池中运行（spawn 启动，不继承主进程的 CUDA 上下文），
+# CPU 密集的统计与词云渲染不与 GPU 价值观推理争抢 GIL，多个事件的统计可在多核上并行；设为 0 时在请求线程内运行
+BASEINFO_PROCESSES = int(os.getenv("BASEINFO_PROCESSES", "2"))
+# 进程池启动（全部子进程完成初始化）的总超时（秒），超时后关闭进程池并报错，下一个请求重新创建
+BASEINFO_START_TIMEOUT = float(os.getenv("BASEINFO_START_TIMEOUT", "300"))
+_baseinfo_pool = None
+_baseinfo_pool_pids = []
+_baseinfo_stats_lock = threading.Lock()
+_baseinfo_stats = {"submitted": 0, "completed": 0, "failed": 0, "in_flight": 0, "pool_restarts": 0}
+
+
+def ensure_value_initialized():
+    """确保 predict_human_value_api 已初始化，返回是否可用"""
+    global _value_initialized
+    if _value_initialized:
+        return True
+    with _value_lock:
+        if not _value_initialized and predict_human_value_api:
+            print("[Service] Initializing predict_human_value_api...")
+            try:
+                predict_human_value_api.init()
+                _value_initialized = True
+                print("[Service] predict_human_value_api initialized.")
+            except Exception as e:
+                print(f"[Service] Failed to initialize predict_human_value_api: {e}")
+                traceback.print_exc()
+    return _value_initialized
+
+
+def ensure_baseinfo_initialized():
+    """确保 static_analyize_api 已在本进程初始化（仅 BASEINFO_PROCESSES=0 时使用），返回是否可用"""
+    global _baseinfo_initialized
+    if _baseinfo_initialized:
+        return True
+    with _baseinfo_lock:
+        if not _baseinfo_initialized and static_analyize_api:
+            print("[Service] Initializing static_analyize_api...")
+            try:
+                static_analyize_api.init()
+                _baseinfo_initialized = True
+                print("[Service] static_analyize_api initialized.")
+            except Exception as e:
+                print(f"[Service] Failed to initialize static_analyize_api: {e}")
+                traceback.print_exc()
+    return _baseinfo_initialized
+
+
+def _get_baseinfo_pool():
+    """
+    获取基础信息进程池：首次调用时创建并立即拉起全部子进程（每个子进程在 initializer 中初始化
+    static_analyize_api），之后子进程常驻复用，请求无需再付出进程启动与初始化开销。
+    """
+    global _baseinfo_pool, _baseinfo_pool_pids
+    pool = _baseinfo_pool
+    if pool is None:
+        with _baseinfo_lock:
+            if _baseinfo_pool is None:
+                print(f"[Service] Starting {BASEINFO_PROCESSES} baseinfo worker processes...")
+                ctx = multiprocessing.get_context("spawn")
+                ready_queue = ctx.Queue()
+                pool = ProcessPoolExecutor(
+                    max_workers=BASEINFO_PROCESSES,
+                    mp_context=ctx,
+                    initializer=baseinfo_worker.init_worker,
+                    initargs=(WORK_DIR, ready_queue),
+                )
+                # 进程池按需创建子进程：同时提交与进程数相同的空任务把子进程全部拉起，
+                # 再等待每个子进程在 initializer 中完成初始化并上报 pid（总时长不超过 BASEINFO_START_TIMEOUT）
+                deadline = time.monotonic() + BASEINFO_START_TIMEOUT
                 try:
-                    static_analyize_api.init()
-                    _baseinfo_initialized = True
-                    print("[Service] static_analyize_api initialized.")
-                except Exception as e:
-                    print(f"[Service] Failed to initialize static_analyize_api: {e}")
-                    traceback.print_exc()
+                    for _ in range(BASEINFO_PROCESSES):
+                        pool.submit(baseinfo_worker.ping)
+                    pids = []
+                    while len(pids) < BASEINFO_PROCESSES:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError(
+                                f"baseinfo workers not ready after {BASEINFO_START_TIMEOUT}s "
+                                f"({len(pids)}/{BASEINFO_PROCESSES} initialized)"
+                            )
+                        try:
+                            pids.append(ready_queue.get(timeout=min(1.0, remaining)))
+                        except queue.Empty:
+                            # 子进程初始化失败时进程池已损坏，submit 会直接抛出 BrokenProcessPool
+                            pool.submit(baseinfo_worker.ping)
+                except (BrokenProcessPool, TimeoutError):
+                    _shutdown_pool(pool)
+                    raise
+                _baseinfo_pool_pids = sorted(pids)
+                print(f"[Service] Baseinfo workers ready: {_baseinfo_pool_pids}")
+                _baseinfo_pool = pool
+            pool = _baseinfo_pool
+    return pool
+
+
+def _shutdown_pool(pool):
+    """关闭进程池并结束仍在初始化或运行中的子进程（shutdown 本身不会打断卡住的 initializer）"""
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _count_baseinfo(**deltas):
+    with _baseinfo_stats_lock:
+        for key, delta in deltas.items():
+            _baseinfo_stats[key] += delta
+
+
+def baseinfo_pool_stats():
+    with _baseinfo_stats_lock:
+        stats = dict(_baseinfo_stats)
+    stats.update({
+        "processes": BASEINFO_PROCESSES,
+        "running": _baseinfo_pool is not None,
+        "pids": list(_baseinfo_pool_pids),
+    })
+    return stats
+
+
+def run_baseinfo(csv_file_path):
+    """运行 static_analyize_api.forward_file：默认提交到基础信息进程池，BASEINFO_PROCESSES=0 时在当前线程运行"""
+    global _baseinfo_pool
+    if BASEINFO_PROCESSES <= 0:
+        if not ensure_baseinfo_initialized():
+            raise RuntimeError(f"static_analyize_api not initialized. Import error: {_import_error_message}")
+        return static_analyize_api.forward_file(csv_file_path)
+
+    pool = _get_baseinfo_pool()
+    _count_baseinfo(submitted=1, in_flight=1)
+    try:
+        result = pool.submit(baseinfo_worker.forward_file, WORK_DIR, csv_file_path).result()
+    except BrokenProcessPool:
+        # 子进程异常退出（如内存不足被杀）后进程池不可再用，丢弃后由下一个请求重建
+        _count_baseinfo(failed=1, in_flight=-1)
+        with _baseinfo_lock:
+            if _baseinfo_pool is pool:
+                _baseinfo_pool = None
+                _count_baseinfo(pool_restarts=1)
+        pool.shutdown(wait=False)
+        raise
+    except Exception:
+        _count_baseinfo(failed=1, in_flight=-1)
+        raise
+    _count_baseinfo(completed=1, in_flight=-1)
+    return result
+
+
+def _load_value():
+    if not ensure_value_initialized():
+        raise RuntimeError(f"predict_human_value_api not initialized. Import error: {_import_error_message}")
+    return predict_human_value_api
+
+
+def _load_baseinfo():
+    if static_analyize_api is None:
+        raise RuntimeError(f"static_analyize_api module not loaded. Import error: {_import_error_message}")
+    if BASEINFO_PROCESSES <= 0:
+        if not ensure_baseinfo_initialized():
+            raise RuntimeError("static_analyize_api not initialized.")
+    else:
+        # 预热时拉起全部子进程，/ready 在子进程初始化完成后才返回 200
+        _get_baseinfo_pool()
+    return run_baseinfo
+
+
+def _warmup_value(api):
+    sample = sample_event()
+    if sample is None:
+        return False
+    event_name, csv_file_path, image_dir_path = sample
+    api.forward(
+        event_name=event_name,
+        event_data_csv_path=csv_file_path,
+        event_image_dir=image_dir_path,
+        skip_used=True
+    )
+
+
+def _warmup_baseinfo(run):
+    sample = sample_event()
+    if sample is None:
+        return False
+    run(sample[1])
+
+
+# 启动预热：加载价值观模型与基础信息统计模块，并各做一次试推理
+warmup = Warmup("value_baseinfo_service")
+warmup.add("value", _load_value, _warmup_value)
+warmup.add("baseinfo", _load_baseinfo, _warmup_baseinfo)
+# gunicorn 等不执行 __main__ 的部署方式下，第一个请求到达时启动预热
+warmup.attach(app)
 
 @app.route("/value", methods=["POST"])
 def run_value_prediction():
-    ensure_initialized()
+    ensure_value_initialized()
     if not predict_human_value_api:
         return jsonify({
             "ok": False, 
@@ -102,15 +303,50 @@ def run_value_prediction():
         return jsonify({"ok": False, "error": f"csv_file_path not found: {csv_file_path}"}), 400
 
     try:
+        cache_key, cached = None, None
+        if result_cache is not None:
+            cache_key, cached = result_cache.lookup(
+                csv_file_path, image_dir_path, "value", MODEL_VERSION, event_name=event_name
+            )
+        if cached is not None:
+            return jsonify({
+                "ok": True,
+                "event_name": event_name,
+                "outputs": cached["outputs"],
+                "output_dir": cached["output_dir"],
+                "cached": True,
+            }), 200
+
         # 调用 predict_human_value_api.forward
         print(f"[Service] Calling predict_human_value_api.forward for {event_name}...")
         # import pdb; pdb.set_trace()
-        result, dir_path = predict_human_value_api.forward(
-            event_name=event_name,
-            event_data_csv_path=csv_file_path,
-            event_image_dir=image_dir_path,
-            skip_used=True
-        )
+        def run_value(path):
+            return predict_human_value_api.forward(
+                event_name=event_name,
+                event_data_csv_path=path,
+                event_image_dir=image_dir_path,
+                skip_used=True
+            )
+
+        # 编排服务传入的是事件目录：按目录约定解析出事件csv判断是否分块，块同样以事件目录的形式交给模型
+        event_csv = resolve_event_csv(csv_file_path)
+        input_is_dir = os.path.isdir(csv_file_path)
+        if should_stream(event_csv):
+            # 超大事件：分块推理，典型帖子按热度取 top-k，人群画像按名称加权合并；
+            # 块目录处理完即删除，返回（并写入结果缓存）的路径均为原始输入，不引用块目录
+            result, dir_path = run_chunked(
+                event_csv,
+                lambda chunk_csv: run_value(os.path.dirname(chunk_csv) if input_is_dir else chunk_csv),
+                lambda parts: (
+                    merge_value([(part[0], rows) for part, rows in parts], source_path=csv_file_path),
+                    csv_file_path if input_is_dir else os.path.dirname(os.path.abspath(csv_file_path)),
+                ),
+                label=f"value/{event_name}",
+            )
+        else:
+            result, dir_path = run_value(csv_file_path)
+        if cache_key is not None:
+            result_cache.put(cache_key, "value", {"outputs": result, "output_dir": dir_path})
         
         response = {
             "ok": True,
@@ -129,11 +365,10 @@ def run_value_prediction():
 
 @app.route("/baseinfo", methods=["POST"])
 def run_baseinfo_analysis():
-    ensure_initialized()
     if not static_analyize_api:
         return jsonify({
             "ok": False, 
-            "error": f"static_analyize_api module not loaded. Error: {_baseinfo_import_error}"
+            "error": f"static_analyize_api module not loaded. Error: {_import_error_message}"
         }), 500
 
     if not request.is_json:
@@ -151,11 +386,38 @@ def run_baseinfo_analysis():
         return jsonify({"ok": False, "error": f"path not found: {csv_file_path}"}), 400
 
     try:
+        cache_key, cached = None, None
+        if result_cache is not None:
+            cache_key, cached = result_cache.lookup(csv_file_path, None, "baseinfo", MODEL_VERSION)
+        if cached is not None:
+            return jsonify({"ok": True, "outputs": cached, "cached": True}), 200
+
         # 调用 static_analyize_api.forward
         # 注意：该函数可能期望目录路径，如果传入文件路径可能需要API内部支持或传入父目录
         # 这里直接透传 csv_file_path
         print(f"[Service] Calling static_analyize_api.forward for {csv_file_path}...")
-        result = static_analyize_api.forward_file(csv_file_path)
+        if should_stream(csv_file_path):
+            # 超大事件：逐块统计后合并（计数求和、占比按行数加权），避免子进程一次载入整个事件；
+            # 近七天帖子数与去重用户数需要整个文件的视角，在切分的同一遍读取中计数；
+            # 词云无法由各块合并，对整个文件抽样（不超过一块的行数）后重新生成
+            day_counter, user_counter, sample = PostDayCounter(), UserCounter(), RowSample()
+
+            def merge(parts):
+                with sample.event_csv(csv_file_path) as sample_csv:
+                    word_cloud = (run_baseinfo(sample_csv) or {}).get("词云编码")
+                return merge_baseinfo(parts, day_counter, user_counter, word_cloud)
+
+            result = run_chunked(
+                csv_file_path,
+                run_baseinfo,
+                merge,
+                label=f"baseinfo/{os.path.basename(csv_file_path)}",
+                on_row=observe_rows(day_counter, user_counter, sample),
+            )
+        else:
+            result = run_baseinfo(csv_file_path)
+        if cache_key is not None:
+            result_cache.put(cache_key, "baseinfo", result)
         
         
         response = {
@@ -180,11 +442,21 @@ def health():
             "value": _value_initialized,
             "baseinfo": _baseinfo_initialized
         },
-        "work_dir": os.getcwd()
+        "baseinfo_pool": baseinfo_pool_stats(),
+        "work_dir": os.getcwd(),
+        "warmup": warmup.status()
     })
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """就绪检查：模型预热完成前返回 503（/health 只表示进程存活）；model_versions 供编排服务构造结果缓存键"""
+    status = dict(warmup.status(), model_versions={"value": MODEL_VERSION, "baseinfo": MODEL_VERSION})
+    return jsonify(status), 200 if status["ready"] else 503
+
 if __name__ == "__main__":
     print(f"[Service] Starting service on {SERVICE_HOST}:{SERVICE_PORT}...")
-    # 在主线程中可以预先初始化（可选）
-    # ensure_initialized()
+    # 后台线程预热模型（WARMUP_ON_START=0 时保持懒加载），期间 /ready 返回 503
+    warmup.start()
+    # 使用 HTTP/1.1 以支持编排服务的 keep-alive 连接复用（werkzeug 默认为 HTTP/1.0，每次请求后断开）
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(host=SERVICE_HOST, port=SERVICE_PORT, debug=False)
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# 启动时预热开关与样例事件（事件目录，结构同编排服务：<目录>/<事件名>.csv 与 <目录>/images）
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+WARMUP_SAMPLE_EVENT = os.getenv("WARMUP_SAMPLE_EVENT", "")
+
+
+def sample_event():
+    """返回 WARMUP_SAMPLE_EVENT 对应的 (event_name, csv_file_path, image_dir_path)，未配置或不存在时返回 None"""
+    if not WARMUP_SAMPLE_EVENT:
+        return None
+    event_dir = os.path.abspath(WARMUP_SAMPLE_EVENT.rstrip("/"))
+    event_name = os.path.basename(event_dir)
+    csv_file_path = os.path.join(event_dir, event_name + ".csv")
+    if not os.path.exists(csv_file_path):
+        print(f"[Warmup] 样例事件 csv 不存在，跳过试推理: {csv_file_path}", flush=True)
+        return None
+    return event_name, csv_file_path, os.path.join(event_dir, "images")
+
+
+class Warmup:
+    """
+    服务启动预热：各模型的加载函数在线程池中并行执行，加载完成后可选地跑一次试推理
+    （触发 CUDA kernel / JIT 编译与显存分配），记录各阶段耗时。
+    加载函数应复用服务的懒加载单例（带锁），预热期间到达的请求会等待同一次加载而不会重复加载。
+    start() 只生效一次：服务以脚本启动时在 app.run 前调用；在 gunicorn 等 WSGI 服务器下由 attach(app)
+    注册的 before_request 钩子在每个 worker 收到第一个请求（通常是 /ready 探测）时启动。
+    """
+
+    def __init__(self, service, enabled=WARMUP_ON_START):
+        self.service = service
+        self.enabled = enabled
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._status = {}
+        self._started_at = None
+        self._finished_at = None
+        self._done = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def add(self, name, load, dummy=None):
+        """load() 返回模型实例；dummy(instance) 用样例数据做一次推理，失败只记录、不影响就绪"""
+        self._tasks.append((name, load, dummy))
+        self._status[name] = {"state": "pending"}
+
+    def attach(self, app):
+        """在 Flask 应用上注册 before_request 钩子：本进程收到第一个请求时启动预热（已启动时不做任何事）"""
+        app.before_request(self.start)
+
+    def start(self, background=True):
+        if self._started_at is not None:
+            return
+        with self._start_lock:
+            if self._started_at is not None:
+                return
+            self._started_at = time.time()
+        if not self.enabled:
+            # 关闭预热时保持懒加载，服务启动即视为就绪
+            for name, _, _ in self._tasks:
+                self._set(name, state="skipped")
+            self._finished_at = self._started_at
+            self._done.set()
+            return
+        if not background:
+            self._run_all()
+            return
+        threading.Thread(target=self._run_all, name=f"{self.service}-warmup", daemon=True).start()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _run_all(self):
+        print(f"[Warmup] {self.service}: 并行加载 {', '.join(name for name, _, _ in self._tasks)}", flush=True)
+        if self._tasks:
+            with ThreadPoolExecutor(max_workers=len(self._tasks), thread_name_prefix=f"{self.service}-warmup") as pool:
+                list(pool.map(lambda task: self._run_task(*task), self._tasks))
+        self._finished_at = time.time()
+        self._done.set()
+        print(f"[Warmup] {self.service}: 预热结束，耗时 {self._finished_at - self._started_at:.2f}s，"
+              f"就绪={self.ready}", flush=True)
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def _run_task(self, name, load, dummy):
+        self._set(name, state="loading")
+        started = time.time()
+        try:
+            instance = load()
+        except Exception as exc:
+            traceback.print_exc()
+            self._set(name, state="failed", error=str(exc), load_seconds=round(time.time() - started, 3))
+            return
+        self._set(name, state="loaded", load_seconds=round(time.time() - started, 3))
+        print(f"[Warmup] {self.service}/{name}: 模型加载 {time.time() - started:.2f}s", flush=True)
+        if dummy is None:
+            self._set(name, state="ready")
+            return
+
+        started = time.time()
+        try:
+            ran = dummy(instance)
+        except Exception as exc:
+            traceback.print_exc()
+            self._set(name, state="ready", dummy_error=str(exc), dummy_seconds=round(time.time() - started, 3))
+            return
+        if ran is False:
+            self._set(name, state="ready", dummy_skipped=True)
+            return
+        self._set(name, state="ready", dummy_seconds=round(time.time() - started, 3))
+        print(f"[Warmup] {self.service}/{name}: 试推理 {time.time() - started:.2f}s", flush=True)
+
+    @property
+    def ready(self):
+        """所有模型均已加载（试推理失败不影响就绪）；关闭预热时启动即就绪"""
+        with self._lock:
+            return self._done.is_set() and all(s["state"] in ("ready", "skipped") for s in self._status.values())
+
+    def status(self):
+        with self._lock:
+            tasks = {name: dict(s) for name, s in self._status.items()}
+        finished = self._done.is_set()
+        elapsed = None
+        if self._started_at is not None:
+            elapsed = round((self._finished_at if finished else time.time()) - self._started_at, 3)
+        return {
+            "service": self.service,
+            "ready": finished and all(s["state"] in ("ready", "skipped") for s in tasks.values()),
+            "enabled": self.enabled,
+            "started": self._started_at is not None,
+            "finished": finished,
+            "elapsed_seconds": elapsed,
+            "tasks": tasks,
+        }
@@ -1,6 +1,12 @@
 from flask import Flask, request, jsonify
+from werkzeug.serving import WSGIRequestHandler
+import csv
+import inspect
 import os
+import shutil
+import tempfile
 import threading
+import time
 from typing import Optional
 
 # 仅在GPU 3上加载模型
@@ -15,6 +21,12 @@ except Exception as exc:
 else:
 	_import_error = None
 
+from result_cache import open_result_cache
+from adaptive_batch import AdaptiveBatchSizer, is_out_of_memory
+from event_csv import post_text, read_event_rows, read_post_lengths, cache_stats as csv_cache_stats
+from warmup import Warmup, sample_event
+from event_stream import merge_emotion, merge_yuqing, run_chunked, should_stream
+
 # 引入yuqing话题分类推理类（通过追加路径方式加载）
 import sys
 _YUQING_DIR = "/home/yxr/Yuqing-Project/Service/yuqing-module"
@@ -41,6 +53,21 @@ DEFAULT_OPENAI_PORT = 30000
 DEFAULT_YUQING_MODEL_PATH = "/home/yxr/Yuqing-Project/Service/yuqing-module/topic_model/transformer_best.pt"
 DEFAULT_YUQING_BATCH_SIZE = 4
 
+# yuqing自适应批大小：按帖子长度（P90 字符数，近似 token 数）分桶，桶内按实测吞吐择优，OOM 时减半重试
+YUQING_ADAPTIVE_BATCH = os.getenv("YUQING_ADAPTIVE_BATCH", "1") == "1"
+YUQING_MAX_BATCH_SIZE = int(os.getenv("YUQING_MAX_BATCH_SIZE", "64"))
+# 推理前按帖子长度排序，减少同一批内的 padding（排序后的 csv 副本写入临时目录，原文件不变）。
+# 默认关闭：TopicClassifier（yuqing-module，不在本仓库中）是否只按事件整体汇总、与行顺序及csv所在目录无关无法在此确认，
+# 例如按行序取前若干条帖子、或按csv目录查找附属文件时，排序副本会改变结果；确认无关后再开启
+YUQING_SORT_BY_LENGTH = os.getenv("YUQING_SORT_BY_LENGTH", "0") == "1"
+
+# 事件级结果缓存：事件csv与图片未变化时跳过模型推理；升级模型后修改 MODEL_VERSION 使旧缓存失效
+result_cache = open_result_cache("emotion_yuqing")
+MODEL_VERSION = os.getenv("MODEL_VERSION", "1")
+# 各模型的缓存版本（模型路径 + 版本号），同时经 /ready 提供给编排服务
+EMOTION_MODEL_VERSION = f"{DEFAULT_MODEL_PATH}@{MODEL_VERSION}"
+YUQING_MODEL_VERSION = f"{DEFAULT_YUQING_MODEL_PATH}@{MODEL_VERSION}"
+
 # 推理器单例与线程锁
 _infer_lock = threading.Lock()
 _infer_instance: Optional[EmotionInference] = None
@@ -50,6 +77,7 @@ _infer_initialized: bool = False
 _yuqing_lock = threading.Lock()
 _yuqing_instance: Optional[TopicClassifier] = None
 _yuqing_initialized: bool = False
+_yuqing_batch_sizer = AdaptiveBatchSizer(max_batch_size=YUQING_MAX_BATCH_SIZE)
 
 
 def get_infer_instance(model_path: Optional[str], batch_size: int, openai_port: int) -> EmotionInference:
@@ -91,6 +119,140 @@ def get_yuqing_instance(model_path: Optional[str], batch_size: int) -> TopicClas
 	return _yuqing_instance
 
 
+def _load_emotion():
+	"""按内部固定默认参数获取推理实例（请求与预热共用）"""
+	return get_infer_instance(
+		model_path=DEFAULT_MODEL_PATH,
+		batch_size=DEFAULT_BATCH_SIZE,
+		openai_port=DEFAULT_OPENAI_PORT,
+	)
+
+
+def _load_yuqing():
+	return get_yuqing_instance(
+		model_path=DEFAULT_YUQING_MODEL_PATH,
+		batch_size=DEFAULT_YUQING_BATCH_SIZE,
+	)
+
+
+def _run_emotion(event):
+	"""运行情感推理（推理实例按内部固定默认参数初始化）"""
+	return _load_emotion().forward(**event)
+
+
+def _sorted_csv_copy(csv_file_path, fieldnames, rows, lengths):
+	"""按帖子长度升序写出 csv 副本，返回 (临时目录, 副本路径)；文件名保持不变"""
+	tmp_dir = tempfile.mkdtemp(prefix="yuqing_sorted_")
+	sorted_path = os.path.join(tmp_dir, os.path.basename(csv_file_path))
+	order = sorted(range(len(rows)), key=lambda i: lengths[i])
+	with open(sorted_path, "w", encoding="utf-8-sig", newline="") as f:
+		writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+		writer.writeheader()
+		writer.writerows(rows[i] for i in order)
+	return tmp_dir, sorted_path
+
+
+def _forward_accepts_batch_size(classifier):
+	"""TopicClassifier.forward 是否显式接受 batch_size 参数（批大小只在构造时设置的版本无法逐次调整）"""
+	try:
+		return "batch_size" in inspect.signature(classifier.forward).parameters
+	except (TypeError, ValueError):
+		return False
+
+
+def _adaptive_batch_enabled(classifier):
+	return YUQING_ADAPTIVE_BATCH and _forward_accepts_batch_size(classifier)
+
+
+def _run_yuqing_forward(classifier, event_name, csv_file_path, image_dir_path):
+	"""
+	以自适应批大小运行话题分类：按长度桶与历史吞吐选择 batch_size 并随本次 forward 传入，
+	出现显存/内存不足时清理缓存并减半重试，直到批大小为 1 仍失败才向上抛出。
+	forward 不接受 batch_size 参数时按构造时的批大小直接推理。
+	"""
+	if not _adaptive_batch_enabled(classifier):
+		return classifier.forward(
+			event_name=event_name,
+			csv_file_path=csv_file_path,
+			image_dir_path=image_dir_path,
+		)
+
+	tmp_dir, input_path = None, csv_file_path
+	if YUQING_SORT_BY_LENGTH:
+		# TopicClassifier 随后按路径自行解析csv，这里只复用已有的旁路文件，不为此构建
+		fieldnames, rows = read_event_rows(csv_file_path, build=False)
+		lengths = [len(post_text(row)) for row in rows]
+		if len(rows) > 1:
+			tmp_dir, input_path = _sorted_csv_copy(csv_file_path, fieldnames, rows, lengths)
+	else:
+		# 不排序时只需要正文长度（逐行解析，不保留整表；已有旁路文件时只读取正文列）
+		lengths = read_post_lengths(csv_file_path)
+	bucket = _yuqing_batch_sizer.bucket_for(lengths)
+
+	try:
+		# 批大小只随本次调用传入，不修改共享的实例属性，并发请求无需串行
+		batch_size = _yuqing_batch_sizer.choose(bucket)
+		while True:
+			started = time.time()
+			try:
+				event_results = classifier.forward(
+					event_name=event_name,
+					csv_file_path=input_path,
+					image_dir_path=image_dir_path,
+					batch_size=batch_size,
+				)
+			except Exception as exc:
+				if not is_out_of_memory(exc) or batch_size <= 1:
+					raise
+				smaller = _yuqing_batch_sizer.record_oom(bucket, batch_size)
+				print(f"[Yuqing] {event_name} batch_size={batch_size} 内存不足，降为 {smaller} 重试")
+				_release_cuda_cache()
+				batch_size = smaller
+				continue
+			_yuqing_batch_sizer.record(bucket, batch_size, len(lengths), time.time() - started)
+			return event_results
+	finally:
+		if tmp_dir is not None:
+			shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _release_cuda_cache():
+	try:
+		import torch
+		if torch.cuda.is_available():
+			torch.cuda.empty_cache()
+	except Exception:
+		pass
+
+
+def _warmup_emotion(inference):
+	sample = sample_event()
+	if sample is None:
+		return False
+	event_name, csv_file_path, image_dir_path = sample
+	_run_emotion({
+		"event_name": event_name,
+		"csv_file_path": csv_file_path,
+		"image_dir_path": image_dir_path,
+	})
+
+
+def _warmup_yuqing(classifier):
+	sample = sample_event()
+	if sample is None:
+		return False
+	event_name, csv_file_path, image_dir_path = sample
+	_run_yuqing_forward(classifier, event_name, csv_file_path, image_dir_path)
+
+
+# 启动预热：情感与话题分类模型并行加载
+warmup = Warmup("emotion_yuqing")
+warmup.add("emotion", _load_emotion, _warmup_emotion)
+warmup.add("yuqing", _load_yuqing, _warmup_yuqing)
+# gunicorn 等不执行 __main__ 的部署方式下，第一个请求到达时启动预热
+warmup.attach(app)
+
+
 @app.route("/emotion", methods=["POST"])
 def run_emotion_inference():
 	if not request.is_json:
@@ -125,18 +287,29 @@ def run_emotion_inference():
 		return jsonify({"ok": False, "error": f"image_dir_path not found: {image_dir_path}"}), 400
 
 	try:
-		# 仅使用内部固定默认参数初始化（只在首次创建时进行init）
-		inference = get_infer_instance(
-			model_path=DEFAULT_MODEL_PATH,
-			batch_size=DEFAULT_BATCH_SIZE,
-			openai_port=DEFAULT_OPENAI_PORT,
-		)
+		cache_key, cached = None, None
+		if result_cache is not None:
+			cache_key, cached = result_cache.lookup(
+				csv_file_path, image_dir_path, "emotion", EMOTION_MODEL_VERSION, event_name=event_name
+			)
+		if cached is not None:
+			return jsonify({"ok": True, "event_name": event_name, "outputs": cached, "cached": True}), 200
+
 		# 运行算法
-		event_summary = inference.forward(
-			event_name=event_name,
-			csv_file_path=csv_file_path,
-			image_dir_path=image_dir_path,
-		)
+		def run_emotion(path):
+			return _run_emotion({
+				"event_name": event_name,
+				"csv_file_path": path,
+				"image_dir_path": image_dir_path,
+			})
+
+		if should_stream(csv_file_path):
+			# 超大事件：分块推理后合并各块的情绪计数，峰值内存与事件大小无关
+			event_summary = run_chunked(csv_file_path, run_emotion, merge_emotion, label=f"emotion/{event_name}")
+		else:
+			event_summary = run_emotion(csv_file_path)
+		if cache_key is not None:
+			result_cache.put(cache_key, "emotion", event_summary)
 		response = {
 			"ok": True,
 			"event_name": event_name,
@@ -187,16 +360,27 @@ def run_yuqing_inference():
 	# 	return jsonify({"ok": False, "error": f"image_dir_path not found: {image_dir_path}"}), 400
 
 	try:
-		classifier = get_yuqing_instance(
-			model_path=DEFAULT_YUQING_MODEL_PATH,
-			batch_size=DEFAULT_YUQING_BATCH_SIZE,
-		)
-		# 运行yuqing话题分类forward
-		event_results = classifier.forward(
-			event_name=event_name,
-			csv_file_path=csv_file_path,
-			image_dir_path=image_dir_path,
-		)
+		cache_key, cached = None, None
+		if result_cache is not None:
+			cache_key, cached = result_cache.lookup(
+				csv_file_path, image_dir_path, "yuqing", YUQING_MODEL_VERSION, event_name=event_name
+			)
+		if cached is not None:
+			return jsonify({"ok": True, "event_name": event_name, "outputs": cached, "cached": True}), 200
+
+		classifier = _load_yuqing()
+		# 运行yuqing话题分类forward（自适应批大小，OOM 时自动降批）；超大事件分块推理后合并
+		if should_stream(csv_file_path):
+			event_results = run_chunked(
+				csv_file_path,
+				lambda path: _run_yuqing_forward(classifier, event_name, path, image_dir_path),
+				merge_yuqing,
+				label=f"yuqing/{event_name}",
+			)
+		else:
+			event_results = _run_yuqing_forward(classifier, event_name, csv_file_path, image_dir_path)
+		if cache_key is not None:
+			result_cache.put(cache_key, "yuqing", event_results)
 		response = {
 			"ok": True,
 			"event_name": event_name,
@@ -221,9 +405,17 @@ def health():
 			"batch_size": DEFAULT_BATCH_SIZE,
 			"openai_port": DEFAULT_OPENAI_PORT,
 		},
+		"warmup": warmup.status(),
 	})
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+	"""就绪检查：情感与话题分类模型预热完成前返回 503（/health 只表示进程存活）；model_versions 供编排服务构造结果缓存键"""
+	status = dict(warmup.status(), model_versions={"emotion": EMOTION_MODEL_VERSION, "yuqing": YUQING_MODEL_VERSION})
+	return jsonify(status), 200 if status["ready"] else 503
+
+
 @app.route("/yuqing/health", methods=["GET"])
 def yuqing_health():
 	return jsonify({
@@ -234,8 +426,17 @@ def yuqing_health():
 			"model_path": DEFAULT_YUQING_MODEL_PATH,
 			"batch_size": DEFAULT_YUQING_BATCH_SIZE,
 		},
+		"adaptive_batch": YUQING_ADAPTIVE_BATCH,
+		# 已加载的 TopicClassifier.forward 是否接受 batch_size（不接受时自适应批大小不生效）
+		"forward_accepts_batch_size": _forward_accepts_batch_size(_yuqing_instance) if _yuqing_instance is not None else None,
+		"sort_by_length": YUQING_SORT_BY_LENGTH,
+		"batch_sizer": _yuqing_batch_sizer.stats(),
+		"csv_cache": csv_cache_stats(),
 	})
 
 
 if __name__ == "__main__":
+	# 使用 HTTP/1.1 以支持编排服务的 keep-alive 连接复用（werkzeug 默认为 HTTP/1.0，每次请求后断开）
+	WSGIRequestHandler.protocol_version = "HTTP/1.1"
+	warmup.start()
 	app.run(host=SERVICE_HOST, port=SERVICE_PORT, debug=False)